@@ -1,23 +1,26 @@
 # Core Flask imports for web framework functionality
-from flask import Flask, render_template, request, redirect, url_for, make_response, jsonify, session, flash, json
+from flask import Flask, Response, render_template, request, redirect, url_for, make_response, jsonify, session, flash, json, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash
 import secrets
 from extensions import db
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from dateutil.relativedelta import relativedelta  # For handling recurring events with months/years
 from sqlalchemy import or_, and_
 from sqlalchemy.exc import SQLAlchemyError
-from flask_migrate import Migrate
 import uuid
-import requests
 import os
-# Google API imports for AI summarization feature
-from google.oauth2 import service_account
-import google.auth.transport.requests
-from flask_mail import Message
-from flask_login import current_user, LoginManager
-from utils.email_utils import send_email, init_mail
+from utils.email_utils import init_mail
+from utils.db_engine import init_database
+from utils.schema import init_schema
+from utils.summariser import init_summariser, SummariserBusy, SummariserTimeout
+from utils.password_hashing import init_password_hashing, HashingBusy
+from utils.metrics import init_metrics
+from utils.slow_query_log import init_slow_query_log, slow_query_log
+from auth.identity import (
+    init_auth, current_identity, current_user, identity_for_user, load_identity,
+    invalidate_identity, can_modify_event
+)
 # Custom security validation utilities
 from utils.input_validation import (
     validate_email, validate_password, sanitize_string, validate_role,
@@ -30,14 +33,33 @@ def create_app():
     Application factory function that creates and configures the Flask app
     """
     app = Flask(__name__)
-    # Database configuration - using SQLite for development
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///app.db"
+    # Database configuration - using SQLite for development unless DATABASE_URL is set
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv('DATABASE_URL', "sqlite:///app.db")
     # Secret key for session management and security
     app.secret_key = 'insanely-secret-key'
 
-    # Initialize database and migration support
-    db.init_app(app)
-    migrate = Migrate(app, db)
+    # SQLite engine profile (WAL, pragmas, pool) - see utils.db_engine.DB_ENGINE_DEFAULTS
+    app.config['SQLITE_PROFILE'] = os.getenv('SQLITE_PROFILE', 'production')
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 10))
+
+    # Initialize the database; the schema itself comes from the migrations (flask db upgrade)
+    # and startup only checks its version - see utils.schema.SCHEMA_DEFAULTS
+    app.config['SCHEMA_CHECK'] = os.getenv('SCHEMA_CHECK', 'error')
+    init_database(app)
+    init_schema(app)
+
+    # Per-endpoint latency and SQL accounting at /metrics - see utils.metrics.METRICS_DEFAULTS
+    # Registered before every other request hook so the timings include them
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'True') == 'True'
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+    init_metrics(app)
+
+    # Opt-in slow query log - see utils.slow_query_log.SLOW_QUERY_DEFAULTS
+    # SLOW_QUERY_LOG_MS=<threshold> turns it on
+    if os.getenv('SLOW_QUERY_LOG_MS'):
+        app.config['SLOW_QUERY_LOG_ENABLED'] = True
+        app.config['SLOW_QUERY_THRESHOLD_MS'] = float(os.getenv('SLOW_QUERY_LOG_MS'))
+    init_slow_query_log(app)
 
     # Mail configuration - loads from environment variables for security
     app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER')
@@ -49,19 +71,93 @@ def create_app():
     if app.config['MAIL_PASSWORD'] is not None:
         app.config['MAIL_PASSWORD'] = app.config['MAIL_PASSWORD'].replace('\xa0', ' ').strip()
     app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
+    # Outbox delivery tuning - see utils.email_utils.OUTBOX_DEFAULTS for the remaining settings
+    app.config['OUTBOX_WORKERS'] = int(os.getenv('OUTBOX_WORKERS', 4))
+    app.config['OUTBOX_RATE_LIMIT'] = float(os.getenv('OUTBOX_RATE_LIMIT', 0))  # Messages per second, 0 = unlimited
 
     # Initialize Flask-Mail extension
     init_mail(app)
 
-    # Import models BEFORE creating tables
-    from models.event import Event
+    # Shared client for /api/summarise - see utils.summariser.SUMMARISER_DEFAULTS
+    init_summariser(app)
+
+    # Password hashes are computed on a process pool - see utils.password_hashing.PASSWORD_HASHING_DEFAULTS
+    if os.getenv('PASSWORD_HASH_WORKERS'):
+        app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS'))
+    if os.getenv('PASSWORD_HASH_METHOD'):
+        app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD')
+    init_password_hashing(app)
+
+    # Resolve the signed-in user once per request into flask.g
+    init_auth(app)
+
+    # Models and helpers used by the routes below
+    from models.event import Event, feed_query
     from models.user import User
     from models.event_exceptions import EventExceptions
-    from models.notifications import Notification
-
-    # Create database tables within app context
-    with app.app_context():
-        db.create_all()
+    from models.tags import EventTag, split_tags, sync_event_tags, sync_user_tags
+    from models.tombstone import deleted_event_ids, tombstone_horizon
+    from models.user_session import create_session, revoke_session, revoke_user_sessions
+    from models.summary import event_summary, init_summary_cache
+    from models.inbox import init_inbox, inbox_page, unread_count, mark_read, fan_out_user
+    from models.calendar_feed import create_feed_token, revoke_feed_token, feed_token_user, init_calendar_feed
+    from models.series import series_event_ids, delete_events, delete_series, update_series, set_series_silenced
+    from utils.feed_sync import sync_scope, make_cursor, parse_cursor, part_validators, feed_etag, calendar_validators
+    from utils.feed_cache import feed_cache, init_feed_cache
+    from utils.event_stream import event_bus, init_event_stream, publish_to_user, stream_messages, StreamFull
+    from utils.ical import calendar_stream
+    from models.recurrence import (
+        FREQUENCIES, WEEKDAY_CODES, build_rule, is_series, expand_events, window_filter,
+        occurrence_on, split_series, truncate_series
+    )
+
+    # Cache rendered feed windows per visibility scope; committed event writes invalidate them
+    init_feed_cache(app)
+
+    # Stored AI summaries - see models.summary.SUMMARY_CACHE_DEFAULTS
+    init_summary_cache(app)
+
+    # Committed event changes fan out to the users' notification inboxes
+    init_inbox(app)
+
+    # ...and are pushed to open /api/stream connections - see utils.event_stream.STREAM_DEFAULTS
+    app.config['STREAM_MAX_CONNECTIONS'] = int(os.getenv('STREAM_MAX_CONNECTIONS', 50))  # Per worker process
+    init_event_stream(app)
+
+    # Token-authenticated .ics subscriptions - see models.calendar_feed.CALENDAR_FEED_DEFAULTS
+    init_calendar_feed(app)
+
+    def set_session_cookie(response, token):
+        """Attach the session_token cookie of a new session to a response"""
+        response.set_cookie('session_token', token, httponly=True, secure=False, samesite='Strict',
+                            max_age=app.config['SESSION_LIFETIME_HOURS'] * 60 * 60)
+
+    def serialize_occurrence(occurrence):
+        """
+        Serialise one calendar occurrence for the events API
+        Works on feed_query() rows as well as Event instances
+        """
+        event = occurrence.event
+        creator_role = getattr(event, 'creator_role', None)
+        event_data = {
+            'id': event.id,
+            'title': occurrence.title,
+            'description': occurrence.description,
+            'priority': occurrence.priority,
+            'tags': occurrence.tags,
+            'start_time': occurrence.start_time.isoformat(),
+            'end_time': occurrence.end_time.isoformat(),
+            'creator_id': event.creator_id,
+            'creator_role': creator_role or 'unknown',
+            'is_recurring': bool(event.is_recurring),
+            'notifications_silenced': bool(event.notifications_silenced)
+        }
+        if event.is_recurring:
+            event_data['recurrence_group_id'] = event.recurrence_group_id
+            event_data['occurrence_date'] = occurrence.original_date.isoformat()
+            if occurrence.exception:
+                event_data['is_exception'] = True
+        return event_data
 
     # Route definitions start here
     @app.route('/')
@@ -86,8 +182,7 @@ def create_app():
                 return jsonify({'redirectTo': url_for('unauthorised')})
             return redirect(url_for('unauthorised'))
 
-        from models.user import User
-        user = db.session.get(User, session['user_id'])
+        user = current_identity()
 
         # Validate user exists in database
         if not user:
@@ -142,33 +237,45 @@ def create_app():
 
             # Look up user and verify password
             user = User.query.filter_by(email=validated_email).first()
+            if user:
+                # Verifying takes far longer than the lookup: detach the user and end the read
+                # transaction, so its pooled connection serves other requests meanwhile
+                db.session.expunge(user)
+                db.session.rollback()
             if user and user.check_password(password):
                 try:
-                    # Generate new session tokens for security
-                    user.regenerate_tokens()
+                    db.session.add(user)  # Also saves a hash upgraded by check_password
+                    # A new session row for this device; the user row is only written for a rehash
+                    token = create_session(user.id, request.headers.get('User-Agent'))
                     db.session.commit()
                     # Store user info in session
                     session['user_id'] = user.id
                     session['user_role'] = user.role
-                    # Create response with secure session cookie
-                    response = make_response()
-                    response.set_cookie('session_token', user.session_token, httponly=True, secure=False, samesite='Strict', max_age=2 * 60 * 60)
+                    identity_for_user(user)
                     if request.is_json:
                         # JSON response for AJAX requests
-                        response.set_data(json.dumps({'message': 'Login successful', 'role': user.role}))
-                        response.headers['Content-Type'] = 'application/json'
-                        return response
+                        response = jsonify({'message': 'Login successful', 'role': user.role})
                     else:
                         # Redirect for form submissions
-                        return redirect(url_for('dashboard'))
+                        response = redirect(url_for('dashboard'))
+                    # Secure session cookie, on either kind of response
+                    set_session_cookie(response, token)
+                    return response
                 except SQLAlchemyError:
                     return handle_db_error("login")
             return jsonify({'error': 'Invalid credentials'}), 401
+        except HashingBusy:
+            response = jsonify({'error': 'Too many sign-ins at once, please try again in a moment.'})
+            response.headers['Retry-After'] = '2'
+            return response, 503
         except Exception:
             return jsonify({'error': 'Oops! Something went wrong.'}), 500
 
     @app.route('/logout', methods=['POST', 'GET'])
     def logout():
+        # Ends this device's session only; other devices stay signed in
+        revoke_session(request.cookies.get('session_token'))
+        db.session.commit()
         response = make_response(redirect(url_for('login')))
         response.set_cookie('session_token', '', expires=0)
         session.clear()
@@ -218,16 +325,25 @@ def create_app():
 
             if User.query.filter_by(email=validated_email).first():
                 return jsonify({'error': 'Email already exists'}), 409
+            # Release the pooled connection while the new password is hashed
+            db.session.rollback()
 
             try:
                 new_user = User(email=validated_email, password=password, role=role)
                 db.session.add(new_user)
+                sync_user_tags(new_user)
+                fan_out_user(new_user.id)
+                token = create_session(new_user.id, request.headers.get('User-Agent'))
                 db.session.commit()
                 response = jsonify({'message': 'User created successfully', 'role': new_user.role})
-                response.set_cookie('session_token', new_user.session_token, httponly=True, secure=False, samesite='Strict', max_age=7200)
+                set_session_cookie(response, token)
                 return response
             except SQLAlchemyError:
                 return handle_db_error("registration")
+        except HashingBusy:
+            response = jsonify({'error': 'Too many sign-ups at once, please try again in a moment.'})
+            response.headers['Retry-After'] = '2'
+            return response, 503
         except Exception:
             return jsonify({'error': 'Oops! Something went wrong.'}), 500
 
@@ -280,7 +396,7 @@ def create_app():
                     start_time = datetime.fromisoformat(data['start_time']).time()
                     end_time = datetime.fromisoformat(data['end_time']).time()
                     interval = int(data['rec_interval'])  # How often to repeat
-                    unit = data['rec_unit']  # daily, weekly, monthly, yearly
+                    unit = data['rec_unit']  # daily, weekly or monthly
                     weekdays_list = data.get('rec_weekdays', [])  # For weekly recurrence
                 except Exception as e:
                     return jsonify({'error': f'Invalid recurring event format: {str(e)}'}), 400
@@ -294,45 +410,47 @@ def create_app():
                 if end_date > limit_date:
                     return jsonify({'error': 'Recurring events cannot extend more than 2 years.'}), 400
 
-                # Generate unique ID to group all instances of this recurring event
-                recurrence_group_id = str(uuid.uuid4())
-                weekday_map = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
-                current = start_date
-                while current <= end_date:
-                    if unit == 'weekly' and weekdays_list:
-                        current_weekday_code = weekday_map[current.weekday()]
-                        if current_weekday_code not in weekdays_list:
-                            current += timedelta(days=1)
-                            continue
-                    start_dt = datetime.combine(current, start_time)
-                    end_dt = datetime.combine(current, end_time)
-                    # Validate priority
-                    priority = data.get('priority', 0)
-                    if not validate_priority(priority):
-                        priority = 0
+                # Validate the recurrence rule itself
+                if unit not in FREQUENCIES:
+                    return jsonify({'error': 'Invalid recurrence unit'}), 400
+                if interval < 1:
+                    return jsonify({'error': 'Recurrence interval must be at least 1.'}), 400
+                if not isinstance(weekdays_list, list) or any(code not in WEEKDAY_CODES for code in weekdays_list):
+                    return jsonify({'error': 'Invalid recurrence weekdays'}), 400
 
-                    event = Event(
-                        title=title,
-                        description=description,
-                        priority=int(priority),
-                        tags=tags,
-                        start_time=start_dt,
-                        end_time=end_dt,
-                        is_recurring=True,
-                        recurrence_group_id=recurrence_group_id,
-                        creator_id=session['user_id']
-                    )
-                    db.session.add(event)
-                    if unit == 'daily':
-                        current += timedelta(days=interval)
-                    elif unit == 'weekly':
-                        current += timedelta(days=1)
-                    elif unit == 'monthly':
-                        current += relativedelta(months=interval)
-                    else:
-                        return jsonify({'error': 'Invalid recurrence unit'}), 400
+                # Validate priority
+                priority = data.get('priority', 0)
+                if not validate_priority(priority):
+                    priority = 0
+
+                # The series is stored as a single master row holding the rule,
+                # whose start/end times are those of the first occurrence
+                rule = build_rule(unit, interval, weekdays_list, datetime.combine(start_date, start_time), end_date.date())
+                first_start = next(iter(rule), None)
+                if first_start is None:
+                    return jsonify({'error': 'The recurrence rule has no occurrences in the selected range.'}), 400
+
+                event = Event(
+                    title=title,
+                    description=description,
+                    priority=int(priority),
+                    tags=tags,
+                    start_time=first_start,
+                    end_time=datetime.combine(first_start.date(), end_time),
+                    is_recurring=True,
+                    # Generate unique ID to group the series (and any later splits of it)
+                    recurrence_group_id=str(uuid.uuid4()),
+                    recurrence_unit=unit,
+                    recurrence_interval=interval,
+                    recurrence_weekdays=','.join(code for code in WEEKDAY_CODES if code in weekdays_list) or None,
+                    recurrence_until=end_date.date(),
+                    creator_id=session['user_id']
+                )
 
                 try:
+                    db.session.add(event)
+                    db.session.flush()
+                    sync_event_tags([event.id])
                     db.session.commit()
                     return jsonify({'message': 'Recurring events created successfully'}), 200
                 except SQLAlchemyError:
@@ -376,6 +494,8 @@ def create_app():
                         creator_id=session['user_id']
                     )
                     db.session.add(event)
+                    db.session.flush()
+                    sync_event_tags([event.id])
                     db.session.commit()
                     return jsonify({'message': 'Event created successfully', 'event_id': event.id}), 200
                 except SQLAlchemyError:
@@ -387,22 +507,14 @@ def create_app():
     @app.route('/event/edit/<int:event_id>', methods=['GET'])
     def edit_event_page(event_id):
         from models.event import Event
-        from models.user import User
-        if 'user_id' not in session:
+        user = current_identity()
+        if not user:
             return redirect(url_for('login'))
-        user = db.session.get(User, session['user_id'])
         event = db.session.get(Event, event_id)
         if not event:
             flash('Event not found.', 'error')
             return redirect(url_for('dashboard'))
-        can_edit = False
-        if user.role == 'admin':
-            can_edit = True
-        elif user.role == 'teacher' and event.creator.role != 'student':
-            can_edit = True
-        elif user.role == 'student' and event.creator_id == user.id:
-            can_edit = True
-        if not can_edit:
+        if not can_modify_event(user, event):
             flash('You do not have permission to edit this event.', 'error')
             return redirect(url_for('dashboard'))
         return render_template('edit_event.html', event_id=event_id, user_role=user.role)
@@ -410,41 +522,47 @@ def create_app():
     @app.route('/api/event/<int:event_id>', methods=['GET', 'POST', 'DELETE'])
     def handle_event(event_id):
         from models.event import Event
-        from models.user import User
         from models.event_exceptions import EventExceptions
         
-        if 'user_id' not in session:
+        user = current_identity()
+        if not user:
             return jsonify({'error': 'Unauthorised'}), 401
             
-        user = db.session.get(User, session['user_id'])
         event = db.session.get(Event, event_id)
         
         if not event:
             return jsonify({'error': 'Event not found'}), 404
-            
-        can_modify = False
-        if user.role == 'admin':
-            can_modify = True
-        elif user.role == 'teacher' and event.creator.role != 'student':
-            can_modify = True
-        elif user.role == 'student' and event.creator_id == user.id:
-            can_modify = True
-
-        if not can_modify:
+
+        if not can_modify_event(user, event):
             return jsonify({'error': 'Forbidden'}), 403
 
         if request.method == 'GET':
-            return jsonify({
+            # For a series master, describe the occurrence picked on the calendar
+            occurrence = None
+            if is_series(event) and request.args.get('date'):
+                try:
+                    occurrence_date = datetime.strptime(request.args['date'], '%Y-%m-%d').date()
+                except ValueError:
+                    return jsonify({'error': 'Invalid date format'}), 400
+                occurrence = occurrence_on(event, occurrence_date)
+                if occurrence is None:
+                    return jsonify({'error': 'Event not found'}), 404
+
+            source = occurrence or event
+            event_data = {
                 'id': event.id,
-                'title': event.title,
-                'description': event.description,
-                'priority': event.priority,
-                'tags': event.tags,
-                'start_time': event.start_time.isoformat(),
-                'end_time': event.end_time.isoformat(),
+                'title': source.title,
+                'description': source.description,
+                'priority': source.priority,
+                'tags': source.tags,
+                'start_time': source.start_time.isoformat(),
+                'end_time': source.end_time.isoformat(),
                 'is_recurring': event.is_recurring,
                 'recurrence_group_id': event.recurrence_group_id
-            })
+            }
+            if occurrence:
+                event_data['occurrence_date'] = occurrence.original_date.isoformat()
+            return jsonify(event_data)
 
         if request.method == 'POST':
             try:
@@ -471,7 +589,11 @@ def create_app():
 
                         # For 'all' or 'future' scopes, only allow time changes, not date changes
                         if edit_scope in ['all', 'future']:
-                            if new_start.date() != event.start_time.date() or new_end.date() != event.end_time.date():
+                            current = event
+                            if is_series(event):
+                                original_date = datetime.strptime(data['original_date'], '%Y-%m-%d').date()
+                                current = occurrence_on(event, original_date) or event
+                            if new_start.date() != current.start_time.date() or new_end.date() != current.end_time.date():
                                 return jsonify({'error': 'For recurring events, you can only change the time, not the date.'}), 400
 
                         if edit_scope == 'this':
@@ -492,48 +614,43 @@ def create_app():
                                 exception.tags = data.get('tags', '')
                             exception.start_time = new_start
                             exception.end_time = new_end
+                            sync_event_tags([event.id])
                             
                             db.session.commit()
                             return jsonify({'message': 'This occurrence was updated successfully!'})
-                    
-                        else: # 'all' or 'future'
-                            events_to_update_query = Event.query.filter_by(recurrence_group_id=event.recurrence_group_id)
+
+                        else: # 'all' or 'future': one UPDATE over the rows of the series
+                            # A series master keeps its rule on one row ('future' first splits it
+                            # at the selected occurrence); older series have one row per occurrence
+                            from_time = None
                             if edit_scope == 'future':
                                 original_date = datetime.strptime(data['original_date'], '%Y-%m-%d').date()
-                                events_to_update_query = events_to_update_query.filter(Event.start_time >= datetime.combine(original_date, datetime.min.time()))
-                            
-                            # Store the original times before updating
-                            original_start = event.start_time
-                            original_end = event.end_time
-                            
-                            # Calculate the time difference between old and new times
-                            # We only care about time difference, not date difference
-                            time_delta = timedelta(
-                                hours=new_start.hour - original_start.hour,
-                                minutes=new_start.minute - original_start.minute,
-                                seconds=new_start.second - original_start.second
-                            )
-                            
-                            end_time_delta = timedelta(
-                                hours=new_end.hour - original_end.hour,
-                                minutes=new_end.minute - original_end.minute,
-                                seconds=new_end.second - original_end.second
-                            )
-                            
-                            for e in events_to_update_query.all():
-                                e.title = data.get('title')
-                                e.description = data.get('description')
-                                e.priority = int(data.get('priority', 0))
-                                if user.role in ['teacher', 'admin']:
-                                    e.tags = data.get('tags', '')
-                                
-                                # Apply the time shifts to each event (keeping the same date)
-                                new_start_time = datetime.combine(e.start_time.date(), datetime.min.time()) + time_delta
-                                new_end_time = datetime.combine(e.end_time.date(), datetime.min.time()) + end_time_delta
-                                
-                                e.start_time = new_start_time
-                                e.end_time = new_end_time
-                            
+                                from_time = datetime.combine(original_date, datetime.min.time())
+                                if is_series(event):
+                                    target = split_series(event, original_date)
+                                    if target is None:
+                                        return jsonify({'error': 'There are no occurrences from that date onwards.'}), 400
+                                    from_time = target.start_time
+                                    sync_event_tags({event.id, target.id})
+
+                            values = {
+                                'title': data.get('title'),
+                                'description': data.get('description'),
+                                'priority': int(data.get('priority', 0))
+                            }
+                            if user.role in ['teacher', 'admin']:
+                                values['tags'] = data.get('tags', '')
+
+                            # Keep each row's date, only move the time of day
+                            if event.recurrence_group_id:
+                                update_series(event.recurrence_group_id, values, new_start.time(), new_end.time(), from_time)
+                            else:
+                                for field, value in values.items():
+                                    setattr(event, field, value)
+                                event.start_time = datetime.combine(event.start_time.date(), new_start.time())
+                                event.end_time = datetime.combine(event.end_time.date(), new_end.time())
+                                sync_event_tags([event.id])
+
                             db.session.commit()
                             return jsonify({'message': 'The event series was updated successfully!'})
                     except (KeyError, ValueError) as e:
@@ -552,6 +669,7 @@ def create_app():
                     new_end = datetime.fromisoformat(data['end_time'])
                     event.start_time = new_start
                     event.end_time = new_end
+                    sync_event_tags([event.id])
 
                     db.session.commit()
                     return jsonify({'message': 'Event updated successfully.'})
@@ -560,31 +678,38 @@ def create_app():
 
         if request.method == 'DELETE':
             scope = request.args.get('scope', 'single')
-            print(f"DELETE request received for event {event_id}, scope: {scope}")
+            app.logger.debug("DELETE request received for event %s, scope: %s", event_id, scope)
             
             if event.is_recurring and scope == 'all':
-                # Get the recurrence_group_id from the event
-                group_id = event.recurrence_group_id
-                print(f"This is a recurring event with group_id: {group_id}")
-                
-                if group_id:
-                    # Find and delete all events with this recurrence_group_id
-                    events_to_delete = Event.query.filter_by(recurrence_group_id=group_id).all()
-                    count = len(events_to_delete)
-                    print(f"Found {count} events to delete with recurrence_group_id {group_id}")
-                    
-                    for e in events_to_delete:
-                        print(f"Deleting event {e.id} with title '{e.title}'")
-                        db.session.delete(e)
-                    
-                    db.session.commit()
-                    return jsonify({'message': f'All {count} occurrences of the recurring event were deleted successfully.'})
+                # The whole series with its exceptions and reminders, in one DELETE per table
+                if event.recurrence_group_id:
+                    delete_series(event.recurrence_group_id)
                 else:
-                    # If somehow the event is marked recurring but has no group_id
-                    db.session.delete(event)
-                    db.session.commit()
-                    return jsonify({'message': 'Event deleted successfully.'})
-            
+                    delete_events([event.id])
+                db.session.commit()
+                # A series is one rule-based row, so a row count says nothing about its occurrences
+                return jsonify({'message': 'The recurring event and all its occurrences were deleted successfully.'})
+
+            elif event.is_recurring and scope == 'future':
+                try:
+                    from_date = datetime.fromisoformat(request.args.get('original_date', '')).date()
+                except ValueError:
+                    return jsonify({'error': 'Invalid date format'}), 400
+                from_time = datetime.combine(from_date, datetime.min.time())
+
+                # Rows starting later - masters split off before, or per-occurrence rows
+                later_ids = set(series_event_ids(event.recurrence_group_id, from_time)) if event.recurrence_group_id else set()
+                if is_series(event):
+                    # End the series the day before; if nothing is left, drop the master
+                    if truncate_series(event, from_date):
+                        later_ids.discard(event.id)
+                        sync_event_tags([event.id])
+                    else:
+                        later_ids.add(event.id)
+                delete_events(later_ids)
+                db.session.commit()
+                return jsonify({'message': 'This and all future occurrences of the event were deleted.'})
+
             elif event.is_recurring and scope == 'this':
                 original_date = event.start_time.date()
                 if request.args.get('original_date'):
@@ -606,13 +731,14 @@ def create_app():
                 exception.tags = None
                 exception.start_time = None
                 exception.end_time = None
+                sync_event_tags([event.id])
                 
                 db.session.commit()
                 return jsonify({'message': 'This occurrence of the event was deleted.'})
             
             else:
                 try:
-                    db.session.delete(event)
+                    delete_events([event.id])
                     db.session.commit()
                     return jsonify({'message': 'Event deleted successfully.'})
                 except SQLAlchemyError:
@@ -621,39 +747,70 @@ def create_app():
     @app.route('/api/event/<int:event_id>/toggle-notifications', methods=['POST'])
     def toggle_event_notifications(event_id):
         from models.event import Event
-        from models.user import User
 
-        if 'user_id' not in session:
+        user = current_identity()
+        if not user:
             return jsonify({'error': 'Unauthorised'}), 401
 
-        user = db.session.get(User, session['user_id'])
         event = db.session.get(Event, event_id)
 
         if not event:
             return jsonify({'error': 'Event not found'}), 404
 
         # Check permissions (same logic as event editing)
-        can_modify = False
-        if user.role == 'admin':
-            can_modify = True
-        elif user.role == 'teacher' and event.creator.role != 'student':
-            can_modify = True
-        elif user.role == 'student' and event.creator_id == user.id:
-            can_modify = True
-
-        if not can_modify:
+        if not can_modify_event(user, event):
             return jsonify({'error': 'Forbidden'}), 403
 
-        # Toggle the notifications_silenced flag
-        event.notifications_silenced = not event.notifications_silenced
+        # Toggle the notifications_silenced flag - for every row of the series with scope 'all'
+        silenced = not event.notifications_silenced
+        data = request.get_json(silent=True) or {}
+        if data.get('scope') == 'all' and event.recurrence_group_id:
+            set_series_silenced(event.recurrence_group_id, silenced)
+            target = 'this series'
+        else:
+            event.notifications_silenced = silenced
+            target = 'this event'
         db.session.commit()
 
-        status = "silenced" if event.notifications_silenced else "enabled"
+        status = "silenced" if silenced else "enabled"
         return jsonify({
-            'message': f'Notifications {status} for this event',
-            'notifications_silenced': event.notifications_silenced
+            'message': f'Notifications {status} for {target}',
+            'notifications_silenced': silenced
         })
 
+    def own_events_condition(user):
+        """
+        The private part of a student's (or other non-teacher's) feed: their own untagged
+        events, and their own series, which can have untagged occurrences through exceptions
+        """
+        return and_(Event.creator_id == user.id, or_(Event.tags == '', Event.tags == None, Event.is_recurring == True))
+
+    def visible_feed_query(user):
+        """
+        feed_query() narrowed to the events a user may see - shared by /api/events and the .ics feed
+        Teachers see all events EXCEPT those created by students (events whose creator no longer
+        exists stay visible); students and other roles see their own_events_condition() events plus
+        events carrying one of their tags, found through the event_tags index
+        """
+        if user.role == 'teacher':
+            # The creator's role is already joined in, so filter on it in SQL
+            return feed_query().filter(or_(User.role == None, User.role != 'student'))
+        tagged_event_ids = db.session.query(EventTag.event_id).filter(EventTag.tag.in_(user.tags))
+        return feed_query().filter(or_(own_events_condition(user), Event.id.in_(tagged_event_ids)))
+
+    def occurrence_visible(user, tags, creator_id):
+        """
+        Whether a user may see an occurrence of a recurring event that ends up with these tags
+        event_tags also indexes exception tags, so visible_feed_query() matches whole series
+        of which only some occurrences are visible
+        """
+        if user.role == 'teacher':
+            return True
+        occurrence_tags = split_tags(tags)
+        if not occurrence_tags:
+            return creator_id == user.id
+        return not user.tags.isdisjoint(occurrence_tags)
+
     @app.route('/api/events')
     def get_events():
         """
@@ -664,30 +821,35 @@ def create_app():
         if 'user_id' not in session:
             return jsonify({'error': 'Unauthorised'}), 401
 
-        user = db.session.get(User, session['user_id'])
+        user = current_identity()
         if not user:
             return jsonify({'error': 'User not found'}), 401
 
         # Role-based event filtering
-        if user.role == 'teacher':
-            # Teachers see all events EXCEPT those created by students
-            student_ids = [u.id for u in User.query.filter_by(role='student').all()]
-            query = Event.query.filter(~Event.creator_id.in_(student_ids)) if student_ids else Event.query
+        # shared_query finds the events everyone with this role and these tags can see,
+        # private_query the user's own untagged events; validator_query matches both and
+        # part_conditions pick each part out of it for the validators
+        user_tags = set(user.tags)
+        filter_by_tags = user.role != 'teacher'
+        query = visible_feed_query(user)
+        if not filter_by_tags:
+            shared_query = validator_query = query
+            private_query = None
+            part_conditions = (None,)
+            shared_scope, scope_tags = 'teacher', None
         else:
-            # Students and other roles see events based on tags
-            user_tags = user.tags
-            private_event_condition = and_(
-                Event.creator_id == user.id,
-                or_(Event.tags == '', Event.tags == None)
-            )
-            filter_conditions = [private_event_condition]
-            if user_tags:
-                for tag in user_tags:
-                    filter_conditions.append(Event.tags.like(f'%{tag}%'))
-            query = Event.query.filter(or_(*filter_conditions))
+            tagged_event_ids = db.session.query(EventTag.event_id).filter(EventTag.tag.in_(user_tags))
+            shared_condition = Event.id.in_(tagged_event_ids)
+            private_condition = own_events_condition(user)
+            shared_query = feed_query().filter(shared_condition)
+            private_query = feed_query().filter(private_condition)
+            validator_query = feed_query().filter(or_(shared_condition, private_condition))
+            part_conditions = (shared_condition, private_condition)
+            shared_scope, scope_tags = f"{user.role}:{','.join(sorted(user_tags))}", frozenset(user_tags)
 
         range_type = request.args.get('range', 'month')
         start_str = request.args.get('start') or request.args.get('date')
+        start = end = None
         if start_str:
             try:
                 start = datetime.fromisoformat(start_str)
@@ -697,81 +859,155 @@ def create_app():
                     end = start + timedelta(days=7)
                 else:
                     end = start + relativedelta(months=1)
-                query = query.filter(
-                    Event.start_time < end,
-                    Event.end_time > start
-                )
+                window = window_filter(start, end)
+                query = query.filter(window)
+                shared_query = shared_query.filter(window)
+                validator_query = validator_query.filter(window)
+                if private_query is not None:
+                    private_query = private_query.filter(window)
             except Exception:
                 return jsonify({'error': 'Invalid date format'}), 400
 
-        events = query.all()
+        def visible_events(rows, part=None):
+            # Expand series masters into the occurrences inside the window, apply
+            # exceptions and serialise what the user may see. part='shared' keeps
+            # only tagged occurrences and part='private' only untagged ones.
+            final_events = []
+            for occurrence in expand_events(rows, start, end):
+                # Single events were matched on their own tags in SQL already
+                if occurrence.event.is_recurring:
+                    if not occurrence_visible(user, occurrence.tags, occurrence.event.creator_id):
+                        continue
+                    if part and filter_by_tags and bool(split_tags(occurrence.tags)) != (part == 'shared'):
+                        continue
+                final_events.append(serialize_occurrence(occurrence))
+            return final_events
+
+        # Taken before any query runs so no change committed meanwhile is skipped
+        scope = sync_scope(user)
+        cursor = make_cursor(scope)
+
+        # Delta mode: only events changed or deleted since the client's cursor
+        if 'since' in request.args:
+            since = parse_cursor(request.args['since'], scope)
+            if since is None or since < tombstone_horizon():
+                # Unknown, foreign or expired cursor - the client must start over
+                return jsonify({'cursor': cursor, 'reset': True, 'events': visible_events(query.all()), 'removed': []})
+
+            # Plain row tuples: the creator's role is joined in, so there is nothing to lazy-load
+            final_events = visible_events(query.filter(Event.updated_at > since).all())
+
+            # Changed events of this user's scope without a visible occurrence here were moved
+            # out of the window or cut short, so the client drops them along with the deleted ones.
+            # Not windowed: the client may hold an event that has since moved elsewhere
+            changed_ids = {event_id for (event_id,) in validator_query.with_entities(Event.id).filter(Event.updated_at > since)}
+            removed = (changed_ids - {event['id'] for event in final_events}) | set(deleted_event_ids(since))
+            return jsonify({'cursor': cursor, 'reset': False, 'events': final_events, 'removed': sorted(removed)})
+
+        # Full mode: answer repeat requests from the validators alone
+        validators = part_validators(validator_query, *part_conditions)
+        etag = feed_etag(scope, validators, range_type, start_str)
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            # The shared part is rendered once per scope and window and reused across users
+            # for as long as its rows keep the validator it was rendered under
+            cache_key = (shared_scope, range_type, start_str)
+            body = feed_cache.get(cache_key, validators[0])
+            cache_status = 'hit' if body is not None else 'miss'
+            if body is None:
+                body = app.json.dumps(visible_events(shared_query.all(), 'shared')).encode()
+                feed_cache.put(cache_key, body, validators[0], scope_tags, start, end)
+
+            private_events = visible_events(private_query.all(), 'private') if private_query is not None else []
+            if private_events:
+                merged = json.loads(body) + private_events
+                merged.sort(key=lambda event: event['start_time'])
+                body = app.json.dumps(merged).encode()
+            response = app.response_class(body, mimetype='application/json')
+            response.headers['X-Feed-Cache'] = cache_status
+        response.set_etag(etag)
+        response.headers['X-Sync-Cursor'] = cursor
+        # Cached copies must be revalidated, which is what the ETag makes cheap
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
 
-        # Process events and exceptions
-        final_events = []
-        processed_exceptions = set()
-        event_ids = [e.id for e in events if e.is_recurring]
-        exceptions = EventExceptions.query.filter(EventExceptions.original_event_id.in_(event_ids)).all() if event_ids else []
-        exception_map = {}
-        for exc in exceptions:
-            key = (exc.original_event_id, exc.exception_date)
-            exception_map[key] = exc
+    @app.route('/api/calendar-feed', methods=['POST', 'DELETE'])
+    def calendar_feed_token():
+        """
+        Create (POST) or revoke (DELETE) the signed-in user's calendar subscription URL
+        Only a hash of the token is kept, so the URL is shown once; creating a new one revokes the old one
+        """
+        if 'user_id' not in session:
+            return jsonify({'error': 'Unauthorised'}), 401
 
-        for event in events:
-            try:
-                if event.is_recurring:
-                    exception = exception_map.get((event.id, event.start_time.date()))
-                    if exception:
-                        processed_exceptions.add(exception.id)
-                        if exception.title is None:
-                            continue  # Deleted occurrence
-                        final_events.append({
-                            'id': event.id,
-                            'title': exception.title,
-                            'description': exception.description,
-                            'priority': exception.priority,
-                            'tags': exception.tags,
-                            'start_time': exception.start_time.isoformat(),
-                            'end_time': exception.end_time.isoformat(),
-                            'creator_id': event.creator_id,
-                            'creator_role': event.creator.role if event.creator else 'unknown',
-                            'is_recurring': True,
-                            'recurrence_group_id': event.recurrence_group_id,
-                            'is_exception': True,
-                            'notifications_silenced': event.notifications_silenced
-                        })
-                    else:
-                        final_events.append({
-                            'id': event.id,
-                            'title': event.title,
-                            'description': event.description,
-                            'priority': event.priority,
-                            'tags': event.tags,
-                            'start_time': event.start_time.isoformat(),
-                            'end_time': event.end_time.isoformat(),
-                            'creator_id': event.creator_id,
-                            'creator_role': event.creator.role if event.creator else 'unknown',
-                            'is_recurring': True,
-                            'recurrence_group_id': event.recurrence_group_id,
-                            'notifications_silenced': event.notifications_silenced
-                        })
-                else:
-                    final_events.append({
-                        'id': event.id,
-                        'title': event.title,
-                        'description': event.description,
-                        'priority': event.priority,
-                        'tags': event.tags,
-                        'start_time': event.start_time.isoformat(),
-                        'end_time': event.end_time.isoformat(),
-                        'creator_id': event.creator_id,
-                        'creator_role': event.creator.role if event.creator else 'unknown',
-                        'is_recurring': False,
-                        'notifications_silenced': event.notifications_silenced
-                    })
-            except Exception as e:
-                print(f"Error processing event ID {event.id}: {e}")
-
-        return jsonify(final_events)
+        user = current_identity()
+        if not user:
+            return jsonify({'error': 'User not found'}), 401
+
+        try:
+            if request.method == 'DELETE':
+                revoke_feed_token(user.id)
+                db.session.commit()
+                return jsonify({'message': 'Your calendar subscription URL has been revoked.'})
+            token = create_feed_token(user.id)
+            db.session.commit()
+        except SQLAlchemyError:
+            return handle_db_error("calendar feed token")
+        return jsonify({'url': url_for('calendar_feed', token=token, _external=True)}), 201
+
+    @app.route('/calendar/<token>.ics')
+    def calendar_feed(token):
+        """
+        iCalendar subscription of every event the token's user can see, for calendar apps
+        The token in the URL stands in for a session (see models.calendar_feed). Series are
+        sent as recurrence rules and the body is streamed from the database cursor in batches;
+        polls of an unchanged calendar are answered with 304 after one aggregate query.
+        """
+        user_id = feed_token_user(token)
+        user = load_identity(user_id) if user_id is not None else None
+        if user is None:
+            return jsonify({'error': 'Unknown calendar feed'}), 404
+
+        # Whole days, so the validators only move with the window once a day
+        horizon = (datetime.now() - timedelta(days=app.config['CALENDAR_FEED_PAST_DAYS'])).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        query = visible_feed_query(user).add_columns(Event.updated_at).filter(or_(
+            Event.end_time >= horizon,
+            and_(Event.recurrence_unit != None, Event.recurrence_until >= horizon.date())
+        ))
+
+        etag, last_modified = calendar_validators(query, sync_scope(user), 'ics', horizon.date())
+        if last_modified is not None:
+            last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+        # If-None-Match wins when both are sent; Last-Modified does not cover tag changes
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            not_modified = (last_modified is not None and request.if_modified_since is not None
+                            and last_modified <= request.if_modified_since)
+
+        if not_modified:
+            response = make_response('', 304)
+        else:
+            batch_size = app.config['CALENDAR_FEED_BATCH_SIZE']
+            refresh_minutes = app.config['CALENDAR_FEED_REFRESH_MINUTES']
+
+            def body():
+                # Runs while the response is sent; stream_with_context keeps the session open until it ends
+                result = db.session.execute(query.order_by(Event.id).statement.execution_options(yield_per=batch_size))
+                yield from calendar_stream(
+                    result, lambda tags, creator_id: occurrence_visible(user, tags, creator_id),
+                    refresh_minutes=refresh_minutes
+                )
+
+            response = Response(stream_with_context(body()), mimetype='text/calendar')
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
 
     @app.route('/profile/info')
     def profile_info():
@@ -779,8 +1015,7 @@ def create_app():
         if 'user_id' not in session:
             return redirect(url_for('login'))
 
-        from models.user import User
-        user = db.session.get(User, session['user_id'])
+        user = current_user()
 
         if not user:
             session.clear()
@@ -796,24 +1031,20 @@ def create_app():
     @app.route('/profile/preferences')
     def preferences():
         """User preferences page - shows saved tags and settings"""
-        from models.user import User
-        user_id = session.get('user_id')
-        if not user_id:
+        user = current_user()
+        if not user:
             return redirect(url_for('login'))
         
-        user = db.session.get(User, user_id)
         # Pass the user's saved tags to the template
         return render_template('profile/preferences.html', current_tags=user.profile_tags or '')
 
     @app.route('/api/profile/tags', methods=['POST'])
     def update_profile_tags():
-        from models.user import User
-
         if 'user_id' not in session:
             return jsonify({'error': 'Unauthorised'}), 401
 
         try:
-            user = db.session.get(User, session['user_id'])
+            user = current_user()
             if not user:
                 return jsonify({'error': 'User not found'}), 401
 
@@ -826,7 +1057,14 @@ def create_app():
 
             try:
                 user.profile_tags = new_tags
+                sync_user_tags(user)
+                fan_out_user(user.id)
                 db.session.commit()
+                # The new identity carries the new feed scope, so cached feed windows of
+                # the old scope stay valid for the other users who still share it
+                invalidate_identity(user.id)
+                # Open streams still filter on the old tags; make them reconnect and resync
+                publish_to_user(user.id, 'resync', {'reconnect': True})
                 return jsonify({'message': 'Your tags have been updated successfully!'}), 200
             except SQLAlchemyError:
                 return handle_db_error("profile tags update")
@@ -852,167 +1090,168 @@ def create_app():
             end_time = sanitize_string(data.get('end_time', ''), 50)
             title = sanitize_string(data.get('title', ''), 200)
 
-            # Extract "items to bring" if mentioned (basic heuristic)
-            items_to_bring = []
-            description_lines = event_description.splitlines()
-            for line in description_lines:
-                if 'bring' in line.lower():
-                    parts = line.lower().split('bring', 1)[1].strip()
-                    items_to_bring = [item.strip() for item in parts.split(',') if item.strip()]
-                    break
-
-            prompt_text = f"""
-            Please summarise the following event, formatting your response using markdown.
-            Use bold headings for the Title and Time and Date sections.
-            List the items to bring as bullet points under an 'Items to bring' heading.
-
-            **Title:** {title}
-
-            **Time and Date:**
-            Start: {start_time}
-            End: {end_time}
-
-            **Description:**
-            {event_description}
-
-            """
-
-            if items_to_bring:
-                prompt_text += "**Items to bring:**\n"
-                for item in items_to_bring:
-                    prompt_text += f"- {item}\n"
-            else:
-                prompt_text += "**Items to bring:** None specified\n"
-
-            SERVICE_ACCOUNT_FILE = 'secrets/gemkey.json'
-            SCOPES = ['https://www.googleapis.com/auth/generative-language']
-            # Get bearer token from service account
-            credentials = service_account.Credentials.from_service_account_file(
-                SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-            auth_req = google.auth.transport.requests.Request()
-            credentials.refresh(auth_req)
-            access_token = credentials.token
-
-            headers = {
-                'Authorization': f'Bearer {access_token}',
-                'Content-Type': 'application/json'
-            }
-
-            payload = {
-                "model": "models/gemini-1.5-flash",  # or gemini-1.5-pro
-                "contents": [{
-                    "parts": [{
-                        "text": prompt_text
-                    }]
-                }]
-            }
-
-            response = requests.post(
-                "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent",
-                headers=headers,
-                json=payload
-            )
-
-            if response.status_code == 200:
-                candidates = response.json().get("candidates", [])
-                summary = candidates[0]["content"]["parts"][0]["text"] if candidates else "No summary available."
-                return jsonify({'summary': summary})
-            else:
-                return jsonify({'error': 'Oops! Something went wrong.'}), 500
+            # Summaries are shared by everyone viewing the same event text (see models.summary)
+            try:
+                summary = event_summary(title, event_description, start_time, end_time)
+            except SummariserBusy:
+                response = jsonify({'error': 'The summariser is busy, please try again shortly.'})
+                response.headers['Retry-After'] = '5'
+                return response, 503
+            except SummariserTimeout:
+                return jsonify({'error': 'The summariser took too long to respond.'}), 504
+            return jsonify({'summary': summary})
 
         except Exception:
             return jsonify({'error': 'Oops! Something went wrong.'}), 500
 
+    def serialize_inbox_item(item):
+        """Convert an InboxItem to the JSON shape the notification list renders"""
+        return {
+            "id": item.event_id,
+            "item_id": item.id,
+            "occurrence_date": item.occurrence_date.isoformat(),
+            "title": item.title,
+            "time": item.start_time.strftime("%A, %B %d at %I:%M %p"),
+            "description": item.description or "",
+            "priority": item.priority or 0,
+            "read": item.read_at is not None
+        }
+
+    def inbox_response(user_id):
+        """
+        One page of the signed-in user's inbox as JSON
+        ?after= is the opaque cursor from the previous page, ?limit= the page size (max 200)
+        """
+        after = None
+        if request.args.get('after'):
+            try:
+                start_str, item_id = request.args['after'].rsplit('_', 1)
+                after = (datetime.fromisoformat(start_str), int(item_id))
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+        limit = request.args.get('limit', 50)
+        if not validate_integer(limit, 1, 200):
+            return jsonify({'error': 'Invalid limit'}), 400
+
+        items, next_key = inbox_page(user_id, after, int(limit))
+        return jsonify({
+            'items': [serialize_inbox_item(item) for item in items],
+            'unread': unread_count(user_id),
+            'next': f"{next_key[0].isoformat()}_{next_key[1]}" if next_key else None
+        })
+
     @app.route('/notifications', methods=['GET'])
     def notifications():
         """
         Notifications page - shows upcoming events as notifications
-        Displays events happening in the next 7 days
+        Displays the first page of the user's inbox (events in the next 7 days)
         """
         if 'user_id' not in session:
             return redirect(url_for('unauthorized'))
 
-        from models.user import User
-        from models.event import Event
-        from models.notifications import Notification
-        from datetime import datetime, timedelta
-
-        user = db.session.get(User, session['user_id'])
+        user = current_identity()
         if not user:
             return redirect(url_for('unauthorized'))
 
-        # Get upcoming events in the next 7 days for notifications
-        now = datetime.utcnow()
-        week_from_now = now + timedelta(days=7)
-
-        upcoming_events = Event.query.filter(
-            Event.start_time >= now,
-            Event.start_time <= week_from_now,
-            Event.notifications_silenced == False
-        ).order_by(Event.start_time).all()
-
-        # Filter events based on user permissions
-        user_events = []
-        for event in upcoming_events:
-            # Include events created by the user or events they can see based on tags
-            if (event.creator_id == user.id or
-                (hasattr(user, 'tags') and user.tags and
-                 any(tag in (event.tags or '') for tag in user.tags.split(',')))):
-                user_events.append(event)
-
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            return jsonify([
-                {
-                    "id": event.id,
-                    "title": event.title,
-                    "time": event.start_time.strftime("%A, %B %d at %I:%M %p"),
-                    "description": event.description or "",
-                    "priority": event.priority or 0
-                } for event in user_events
-            ])
+            return inbox_response(user.id)
 
         # Fallback: for direct page loads
-        return render_template("notifications.html", events=user_events)
+        items, _ = inbox_page(user.id)
+        return render_template("notifications.html", events=items)
 
     @app.route('/api/notifications', methods=['GET'])
     def api_notifications():
         if 'user_id' not in session:
             return jsonify({'error': 'Unauthorized'}), 401
 
-        from models.user import User
-        from models.event import Event
-        from datetime import datetime, timedelta
+        user = current_identity()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        return inbox_response(user.id)
 
-        user = db.session.get(User, session['user_id'])
+    @app.route('/api/notifications/read', methods=['POST'])
+    def read_notifications():
+        """Mark inbox items read: {"ids": [item_id, ...]}, or every item when ids is omitted"""
+        if 'user_id' not in session:
+            return jsonify({'error': 'Unauthorized'}), 401
+
+        user = current_identity()
         if not user:
             return jsonify({'error': 'User not found'}), 404
 
-        # Get upcoming events in the next 7 days for notifications
-        now = datetime.utcnow()
-        week_from_now = now + timedelta(days=7)
-
-        upcoming_events = Event.query.filter(
-            Event.start_time >= now,
-            Event.start_time <= week_from_now,
-            Event.notifications_silenced == False
-        ).order_by(Event.start_time).all()
-
-        # Filter events based on user permissions
-        user_events = []
-        for event in upcoming_events:
-            # Include events created by the user or events they can see based on tags
-            if (event.creator_id == user.id or
-                (hasattr(user, 'tags') and user.tags and
-                 any(tag in (event.tags or '') for tag in user.tags.split(',')))):
-                user_events.append({
-                    "id": event.id,
-                    "title": event.title,
-                    "time": event.start_time.strftime("%A, %B %d at %I:%M %p"),
-                    "description": event.description or "",
-                    "priority": event.priority or 0
-                })
-
-        return jsonify(user_events)
+        data = safe_get_json(request) or {}
+        item_ids = data.get('ids')
+        if item_ids is not None and not (
+            isinstance(item_ids, list) and all(validate_integer(item_id, 1) for item_id in item_ids)
+        ):
+            return jsonify({'error': 'Invalid ids'}), 400
+
+        try:
+            mark_read(user.id, [int(item_id) for item_id in item_ids] if item_ids is not None else None)
+            db.session.commit()
+        except SQLAlchemyError:
+            return handle_db_error("marking notifications read")
+        return jsonify({'unread': unread_count(user.id)})
+
+    @app.route('/api/stream')
+    def event_stream():
+        """
+        Server-Sent Events stream of live calendar changes for the signed-in user
+        Sends 'calendar' messages ({"events": [id, ...]}) naming changed events the user
+        can see, and 'resync' when the client fell behind or its tags changed. Each open
+        stream holds a request thread, so at most STREAM_MAX_CONNECTIONS are served per
+        worker process; beyond that the endpoint answers 503 and the client polls instead.
+        """
+        if 'user_id' not in session:
+            return jsonify({'error': 'Unauthorized'}), 401
+
+        user = current_identity()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+
+        try:
+            subscription = event_bus.subscribe(user)
+        except StreamFull:
+            response = jsonify({'error': 'Too many live connections, please try again later.'})
+            response.headers['Retry-After'] = '60'
+            return response, 503
+
+        # The generator outlives the request context on purpose: it never touches the
+        # database, and the session's pooled connection is released when the request ends
+        config = app.config
+        messages = stream_messages(
+            subscription, config['STREAM_HEARTBEAT_SECONDS'], config['STREAM_MAX_SECONDS'], config['STREAM_RETRY_MS']
+        )
+        response = Response(messages, mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Stop nginx from buffering the stream
+        })
+        # A generator closed before its first frame never runs its finally block
+        response.call_on_close(lambda: event_bus.unsubscribe(subscription))
+        return response
+
+    @app.route('/admin/slow-queries')
+    def slow_queries():
+        """
+        Admin summary of the statements this process logged as slow since startup
+        ?limit= caps the number of statements (max 200), worst total time first
+        """
+        if 'user_id' not in session:
+            return jsonify({'error': 'Unauthorized'}), 401
+        if session.get('user_role') != 'admin':
+            return jsonify({'error': 'Unauthorised'}), 403
+        if not app.config['SLOW_QUERY_LOG_ENABLED']:
+            return jsonify({'error': 'The slow query log is disabled (set SLOW_QUERY_LOG_MS)'}), 404
+
+        limit = request.args.get('limit', 20)
+        if not validate_integer(limit, 1, 200):
+            return jsonify({'error': 'Invalid limit'}), 400
+        return jsonify({
+            'since': slow_query_log.started_at.isoformat(),
+            'threshold_ms': app.config['SLOW_QUERY_THRESHOLD_MS'],
+            'statements': slow_query_log.top(int(limit))
+        })
 
     @app.route('/profile/change-password', methods=['POST'])
     def change_password():
@@ -1020,15 +1259,13 @@ def create_app():
         Password change functionality with validation
         Requires current password verification before allowing change
         """
-        from models.user import User
-
         # Authentication check
         if 'user_id' not in session:
             flash("You must be logged in to change your password.", "error")
             return redirect(url_for('login'))
 
         try:
-            user = db.session.get(User, session['user_id'])
+            user = current_user()
             if not user:
                 flash("User not found.", "error")
                 return redirect(url_for('login'))
@@ -1062,6 +1299,8 @@ def create_app():
 
             try:
                 user.set_password(new_password)
+                # Sign out every other device; this one keeps its session
+                revoke_user_sessions(user.id, keep_token=request.cookies.get('session_token'))
                 db.session.commit()
                 flash("Password successfully changed.", "success")
                 return redirect(url_for('profile_privacy'))
@@ -1069,19 +1308,16 @@ def create_app():
                 flash("Oops! Something went wrong.", "error")
                 return redirect(url_for('profile_privacy'))
 
+        except HashingBusy:
+            flash("The server is busy, please try again in a moment.", "error")
+            return redirect(url_for('profile_privacy'))
         except Exception:
             flash("Oops! Something went wrong.", "error")
             return redirect(url_for('profile_privacy'))
 
     return app
 
-from scheduler import start_scheduler
-
 if __name__ == "__main__":
+    # Background jobs run in their own process: python -m worker
     app = create_app()
-    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
-        print(f"Password: {repr(app.config['MAIL_PASSWORD'])}")
-        start_scheduler(app)
-        print("✅ Scheduler started")
-
     app.run(host='127.0.0.1', port=5001, debug=True)
@@ -5,6 +5,8 @@ from flask import session, request
 from werkzeug.security import generate_password_hash
 from extensions import db
 from models.user import User
+from auth.identity import current_user, identity_for_user
+from models.user_session import create_session, revoke_session
 
 class AuthService:
     """
@@ -16,19 +18,20 @@ class AuthService:
     def login_user(email, password):
         """
         Authenticate user with email and password
-        Returns User object if successful, None if authentication fails
-        Regenerates security tokens and creates session on successful login
+        Returns (User, session token) if successful, (None, None) if authentication fails
+        Starts a new device session on successful login; the caller sets the session_token cookie
         """
         user = User.query.filter_by(email=email).first()
         if user and user.check_password(password):
-            # Regenerate tokens for security on each login
-            user.regenerate_tokens()
+            # One session row per device; the user row is left alone
+            token = create_session(user.id, request.headers.get('User-Agent'))
             db.session.commit()
             # Create session for authenticated user
             session['user_id'] = user.id
             session['user_role'] = user.role
-            return user
-        return None
+            identity_for_user(user)
+            return user, token
+        return None, None
 
     @staticmethod
     def register_user(email, password, username):
@@ -79,29 +82,21 @@ class AuthService:
         Log out current user by clearing session and invalidating tokens
         Ensures secure logout by removing session token from database
         """
-        user = AuthService.get_current_user()
-        if user:
-            # Invalidate session token for security
-            user.session_token = None
-            db.session.commit()
+        # Invalidate this device's session token for security
+        revoke_session(request.cookies.get('session_token'))
+        db.session.commit()
         # Clear all session data
         session.clear()
 
     @staticmethod
     def get_current_user():
         """
-        Get currently authenticated user from session or cookie token
-        Checks both cookie-based and session-based authentication
+        Get currently authenticated user from the session_token cookie
         Returns User object or None if not authenticated
         """
-        # First try cookie-based authentication
-        token = request.cookies.get('session_token')
-        if token:
-            return User.query.filter_by(session_token=token).first()
-        # Fall back to session-based authentication
-        elif 'user_id' in session:
-            return User.query.get(session['user_id'])
-        return None
+        # The session_token cookie was validated (through the session cache) before the
+        # request, and the user resolved once into the request context
+        return current_user()
 
     @staticmethod
     def validate_csrf(user, token):
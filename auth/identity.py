@@ -0,0 +1,171 @@
+# Request-scoped identity resolution with a shared identity cache
+# The signed-in user is resolved once per request into flask.g from the session_token
+# cookie (see models.user_session), and the (role, tags) of any user is served from a
+# small TTL/LRU cache across requests
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import g, request, session
+from extensions import db
+from models.user import User
+from models.tags import split_tags
+from models.user_session import flush_last_seen, init_sessions, last_seen_buffer, validate_token
+
+# What most routes need to know about a user, without loading the ORM object
+# tags is a frozenset of normalised tags (see models.tags.split_tags)
+Identity = namedtuple('Identity', ['id', 'email', 'role', 'tags'])
+
+class IdentityCache:
+    """
+    Thread-safe LRU cache of user identities with a time-to-live
+    Entries are invalidated explicitly when a user's role or profile tags change;
+    the TTL bounds staleness across processes that cannot see each other's invalidations
+    """
+
+    def __init__(self, max_size=2048, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return the cached Identity for a user, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            identity, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return identity
+
+    def put(self, identity):
+        """Store an Identity, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[identity.id] = (identity, time.monotonic() + self.ttl)
+            self._entries.move_to_end(identity.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Drop a user's entry, e.g. after their role or profile tags changed"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Shared by all requests handled by this process
+identity_cache = IdentityCache()
+
+def _make_identity(user_id, email, role, profile_tags):
+    # Same tag set as User.tags: public, the role and any profile tags
+    tags = frozenset(split_tags(','.join(['public', role, profile_tags or ''])))
+    return Identity(user_id, email, role, tags)
+
+def identity_for_user(user):
+    """Build (and cache) the Identity of a loaded User"""
+    identity = _make_identity(user.id, user.email, user.role, user.profile_tags)
+    identity_cache.put(identity)
+    return identity
+
+def load_identities(user_ids):
+    """
+    Return {user_id: Identity} for the given users
+    Cache misses are loaded together in one column-only query
+    """
+    identities = {}
+    missing = []
+    for user_id in set(user_ids):
+        if user_id is None:
+            continue
+        identity = identity_cache.get(user_id)
+        if identity is None:
+            missing.append(user_id)
+        else:
+            identities[user_id] = identity
+
+    if missing:
+        rows = db.session.query(User.id, User.email, User.role, User.profile_tags).filter(User.id.in_(missing))
+        for row in rows:
+            identity = _make_identity(*row)
+            identity_cache.put(identity)
+            identities[identity.id] = identity
+    return identities
+
+def load_identity(user_id):
+    """Return the Identity of one user, or None if the user does not exist"""
+    return load_identities([user_id]).get(user_id)
+
+def invalidate_identity(user_id):
+    """Forget a cached identity; call after changing a user's role or profile tags"""
+    identity_cache.invalidate(user_id)
+
+def current_identity():
+    """Identity of the signed-in user for this request, or None"""
+    return g.get('identity')
+
+def current_user():
+    """
+    Full User row of the signed-in user, loaded at most once per request
+    Only needed by routes that read or write columns beyond Identity
+    """
+    if 'current_user' not in g:
+        identity = current_identity()
+        g.current_user = db.session.get(User, identity.id) if identity else None
+    return g.current_user
+
+def can_modify_event(identity, event):
+    """
+    Check whether a user may edit, delete or silence an event
+    Admins may modify anything, teachers anything not created by a student,
+    students only their own events. The creator's role comes from the identity cache.
+    """
+    if identity is None:
+        return False
+    if identity.role == 'admin':
+        return True
+    if identity.role == 'teacher':
+        creator = load_identity(event.creator_id)
+        return creator is None or creator.role != 'student'
+    if identity.role == 'student':
+        return event.creator_id == identity.id
+    return False
+
+def init_auth(app):
+    """
+    Register the request hooks that resolve the signed-in user into flask.g
+    After resolve_identity runs, g.identity is an Identity or None. The session_token
+    cookie is authoritative: without a live session the Flask session is cleared, so
+    logging out or revoking a device takes effect on its next request.
+    """
+    init_sessions(app)
+
+    @app.before_request
+    def resolve_identity():
+        g.identity = None
+        if request.endpoint == 'static':
+            return
+        user_id = validate_token(request.cookies.get('session_token'))
+        identity = load_identity(user_id) if user_id is not None else None
+        if identity is None:
+            if 'user_id' in session:
+                session.clear()
+            return
+        if session.get('user_id') != identity.id:
+            session['user_id'] = identity.id
+            session['user_role'] = identity.role
+        g.identity = identity
+
+    @app.after_request
+    def write_last_seen(response):
+        # One batched UPDATE per interval for every session seen by this process
+        if last_seen_buffer.due():
+            try:
+                flush_last_seen()
+            except Exception as e:
+                print(f"❌ Could not record session activity: {e}")
+        return response
@@ -0,0 +1,35 @@
+# Performance benchmarks for EventEase
+# Each module seeds a throwaway SQLite database and can be run with: python -m benchmarks.<module>
+# benchmarks.suite runs the main paths at several scales and writes results for benchmarks.compare
+
+def sign_in(app, client, user_id):
+    """Give a test client a live session for a user, as /login would, without hashing a password"""
+    from extensions import db
+    from models.user_session import create_session
+
+    with app.app_context():
+        token = create_session(user_id)
+        db.session.commit()
+    client.set_cookie('session_token', token)
+
+def create_app():
+    """app.create_app() on a fresh throwaway database, migrated to head first"""
+    import contextlib
+    import io
+    import os
+    import app as application
+    from utils.schema import upgrade_schema
+
+    # The database is empty until the migrations below run
+    previous = os.environ.get('SCHEMA_CHECK')
+    os.environ['SCHEMA_CHECK'] = 'off'
+    try:
+        app = application.create_app()
+    finally:
+        if previous is None:
+            os.environ.pop('SCHEMA_CHECK')
+        else:
+            os.environ['SCHEMA_CHECK'] = previous
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        upgrade_schema(app)
+    return app
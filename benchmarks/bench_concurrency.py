@@ -0,0 +1,126 @@
+# Benchmark for calendar reads running while the reminder job writes
+# Seeds a throwaway SQLite database per engine profile (see utils.db_engine), then runs
+# reader threads against /api/events while a writer thread repeats send_event_reminders
+# Usage: python -m benchmarks.bench_concurrency [--profiles legacy,production] [--readers 8] [--seconds 10]
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import delete
+
+from benchmarks import sign_in
+from benchmarks.bench_reminders import seed
+
+def reader(app, user_id, stop, latencies, errors):
+    """Request the current month view as one student until stopped"""
+    client = app.test_client()
+    sign_in(app, client, user_id)
+    start = date.today().replace(day=1).isoformat()
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            response = client.get(f"/api/events?range=month&start={start}")
+            if response.status_code != 200:
+                errors.append(f"HTTP {response.status_code}")
+                continue
+        except Exception as e:
+            errors.append(str(e).splitlines()[0])
+            continue
+        latencies.append(time.perf_counter() - started)
+
+def writer(app, stop, durations, errors):
+    """Queue the day's reminders, clear them and queue them again until stopped"""
+    from extensions import db
+    from models.notifications import Notification, send_event_reminders
+    from models.outbox import OutboxMessage
+
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            send_event_reminders(app)
+            durations.append(time.perf_counter() - started)
+            with app.app_context():
+                db.session.execute(delete(Notification))
+                db.session.execute(delete(OutboxMessage))
+                db.session.commit()
+        except Exception as e:
+            errors.append(str(e).splitlines()[0])
+
+def run_profile(profile, users, events, readers, seconds):
+    """Return a dict of reader and writer statistics for one engine profile"""
+    from benchmarks import create_app
+    from extensions import db
+    from auth.identity import identity_cache
+    from utils.feed_cache import feed_cache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ['SQLITE_PROFILE'] = profile
+        app = create_app()
+        identity_cache.clear()
+        feed_cache.clear()
+        # Every read goes to the database; the cache would hide the lock contention
+        feed_cache.max_bytes = 0
+
+        with app.app_context():
+            seed(db, users, events, random.Random(42))
+            journal_mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+            engine = db.engine
+
+        stop = threading.Event()
+        latencies, read_errors, write_durations, write_errors = [], [], [], []
+        # Users 1-9 are students (every tenth user is a teacher)
+        threads = [
+            threading.Thread(target=reader, args=(app, n % 9 + 1, stop, latencies, read_errors))
+            for n in range(readers)
+        ]
+        threads.append(threading.Thread(target=writer, args=(app, stop, write_durations, write_errors)))
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    latencies.sort()
+    return {
+        'journal_mode': journal_mode,
+        'reads': len(latencies),
+        'reads_per_second': len(latencies) / seconds,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+        'max_ms': latencies[-1] * 1000 if latencies else 0,
+        'read_errors': read_errors,
+        'writes': len(write_durations),
+        'write_ms': statistics.median(write_durations) * 1000 if write_durations else 0,
+        'write_errors': write_errors
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark calendar reads against a concurrent reminder writer')
+    parser.add_argument('--profiles', default='legacy,production', help='Comma-separated SQLITE_PROFILE names')
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--events', type=int, default=2500)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.users} users, {args.events} events, {args.readers} readers + 1 reminder writer, {args.seconds:g}s per profile")
+    print(f"{'profile':>12} {'journal':>8} {'reads/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'errors':>7} {'writes':>7} {'write ms':>9} {'w.errors':>9}")
+    for profile in args.profiles.split(','):
+        result = run_profile(profile, args.users, args.events, args.readers, args.seconds)
+        print(f"{profile:>12} {result['journal_mode']:>8} {result['reads_per_second']:>8.1f} {result['p50_ms']:>8.1f} "
+              f"{result['p95_ms']:>8.1f} {result['max_ms']:>8.1f} {len(result['read_errors']):>7} "
+              f"{result['writes']:>7} {result['write_ms']:>9.0f} {len(result['write_errors']):>9}")
+        for error in sorted(set(result['read_errors'] + result['write_errors']))[:3]:
+            print(f"{'':>12} {error}")
+
+if __name__ == '__main__':
+    main()
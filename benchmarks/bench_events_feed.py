@@ -0,0 +1,115 @@
+# Benchmark for the calendar feed (/api/events)
+# Seeds a month with many events from many creators and checks that a month view
+# costs a constant number of queries however many events, creators and students it contains
+# Usage: python -m benchmarks.bench_events_feed [--events 500,2000,8000] [--students 5000]
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event as sa_event, insert
+
+from benchmarks import sign_in
+
+MONTH_START = datetime(2030, 3, 1)
+
+def seed(db, events, students, rng):
+    """
+    Insert 50 teachers, `students` students and `events` events in March 2030 with Core inserts
+    Every event is tagged year-12 so the first student sees all of them; one in ten is a weekly
+    series and one in five is created by a student, which hides it from teachers
+    """
+    from models.user import User
+    from models.event import Event
+    from models.tags import EventTag, UserTag
+
+    teachers = 50
+    user_rows = [{'id': n, 'email': f'teacher{n}@example.com', 'password_hash': 'x', 'role': 'teacher'} for n in range(1, teachers + 1)]
+    student_id = teachers + 1
+    user_rows.extend({'id': student_id + n, 'email': f'student{n}@example.com', 'password_hash': 'x', 'role': 'student',
+                      'profile_tags': 'year-12'} for n in range(max(1, students)))
+    user_tag_rows = [{'user_id': student_id, 'tag': tag} for tag in ('public', 'student', 'year-12')]
+
+    event_rows = []
+    for event_id in range(1, events + 1):
+        start = MONTH_START + timedelta(days=rng.randint(0, 27), hours=rng.randint(8, 16))
+        row = {
+            'id': event_id, 'title': f'Event {event_id}', 'description': 'Synthetic event', 'priority': rng.randint(0, 2),
+            'tags': 'year-12', 'start_time': start, 'end_time': start + timedelta(hours=1), 'is_recurring': False,
+            'notifications_silenced': False,
+            'creator_id': rng.randint(student_id, student_id + max(1, students) - 1) if event_id % 5 == 0 else rng.randint(1, teachers),
+            'recurrence_group_id': None, 'recurrence_unit': None, 'recurrence_interval': None,
+            'recurrence_weekdays': None, 'recurrence_until': None
+        }
+        if event_id % 10 == 0:
+            row.update(is_recurring=True, recurrence_group_id=f'group-{event_id}', recurrence_unit='weekly',
+                       recurrence_interval=1, recurrence_until=(start + timedelta(days=60)).date())
+        event_rows.append(row)
+    event_tag_rows = [{'event_id': row['id'], 'tag': 'year-12'} for row in event_rows]
+
+    for model, rows in ((User, user_rows), (UserTag, user_tag_rows), (Event, event_rows), (EventTag, event_tag_rows)):
+        db.session.execute(insert(model), rows)
+    db.session.commit()
+    return student_id, 1
+
+def run_scale(events, students, repeats=5):
+    """
+    Return {role: (occurrences, queries per request, cold seconds, warm seconds)} for a month view
+    The first request renders the window; repeats are served from the feed cache
+    """
+    from benchmarks import create_app
+    from extensions import db
+    from auth.identity import identity_cache
+    from utils.feed_cache import feed_cache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app = create_app()
+        identity_cache.clear()
+        feed_cache.clear()
+
+        with app.app_context():
+            student_id, teacher_id = seed(db, events, students, random.Random(42))
+            engine = db.engine
+
+        query_count = [0]
+        def count_query(*args):
+            query_count[0] += 1
+        sa_event.listen(engine, 'before_cursor_execute', count_query)
+
+        results = {}
+        for role, user_id in (('student', student_id), ('teacher', teacher_id)):
+            client = app.test_client()
+            sign_in(app, client, user_id)
+
+            timings, queries, occurrences = [], [], 0
+            for _ in range(repeats):
+                query_count[0] = 0
+                started = time.perf_counter()
+                response = client.get(f"/api/events?range=month&start={MONTH_START.date().isoformat()}")
+                timings.append(time.perf_counter() - started)
+                queries.append(query_count[0])
+                occurrences = len(response.get_json())
+            results[role] = (occurrences, max(queries), timings[0], statistics.median(timings[1:]))
+
+        sa_event.remove(engine, 'before_cursor_execute', count_query)
+        engine.dispose()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the /api/events month view')
+    parser.add_argument('--events', type=lambda v: [int(n) for n in v.split(',')], default=[500, 2000, 8000])
+    parser.add_argument('--students', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"{'events':>8} {'view':>8} {'occurrences':>12} {'queries':>8} {'cold ms':>9} {'warm ms':>9}")
+    for events in args.events:
+        for role, (occurrences, queries, cold, warm) in run_scale(events, args.students).items():
+            print(f"{events:>8} {role:>8} {occurrences:>12} {queries:>8} {cold * 1000:>9.1f} {warm * 1000:>9.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# Benchmark for the materialized notification inbox (models.inbox)
+# Seeds a throwaway SQLite database, fills every inbox with one refresh, then times
+# inbox reads against the per-request scan they replace and the fan-out cost of edits
+# Usage: python -m benchmarks.bench_inbox [--users 5000] [--events 2500]
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event as sa_event
+
+from benchmarks.bench_reminders import seed
+
+def scan_notifications(user):
+    """The per-request scan /api/notifications did before the inbox, for comparison"""
+    from models.event import Event
+    from models.recurrence import expand_events, window_filter
+    from models.tags import split_tags
+
+    now = datetime.utcnow()
+    week_from_now = now + timedelta(days=7)
+    events = Event.query.filter(window_filter(now, week_from_now), Event.notifications_silenced == False).all()
+    user_tags = set(user.tags)
+    return [
+        occurrence for occurrence in expand_events(events, now, week_from_now)
+        if occurrence.start_time >= now and (
+            occurrence.event.creator_id == user.id or not user_tags.isdisjoint(split_tags(occurrence.tags)))
+    ]
+
+def timed(function, repeats):
+    """Median seconds of `repeats` calls"""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the notification inbox')
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--events', type=int, default=2500)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    from benchmarks import create_app
+    from extensions import db
+    from auth.identity import identity_cache, load_identity
+    from models.event import Event
+    from models.inbox import InboxItem, inbox_page, refresh_inbox, unread_count
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app = create_app()
+        identity_cache.clear()
+
+        with app.app_context():
+            seed(db, args.users, args.events, random.Random(42))
+
+        started = time.perf_counter()
+        refresh_inbox(app)  # Empty inbox: reconciles the whole horizon
+        full_refresh = time.perf_counter() - started
+        started = time.perf_counter()
+        refresh_inbox(app)
+        hourly_refresh = time.perf_counter() - started
+
+        with app.app_context():
+            rows = db.session.query(InboxItem).count()
+            query_count = [0]
+            def count_query(*_):
+                query_count[0] += 1
+            sa_event.listen(db.engine, 'before_cursor_execute', count_query)
+
+            user = load_identity(1)
+            scan = timed(lambda: scan_notifications(user), args.repeats)
+            query_count[0] = 0
+            inbox = timed(lambda: (inbox_page(user.id), unread_count(user.id)), args.repeats)
+            inbox_queries = query_count[0] // args.repeats
+
+            # Fan-out on write: retitle a class event and a public one
+            def edit(tag):
+                event = Event.query.filter(Event.tags == tag, Event.start_time > datetime.utcnow()).first()
+                event.title = f'{event.title}!'
+                db.session.commit()
+            class_tag = db.session.query(Event.tags).filter(Event.tags.like('class-%')).first()[0]
+            class_edit = timed(lambda: edit(class_tag), 5)
+            public_edit = timed(lambda: edit('public'), 5)
+
+        print(f"{args.users} users, {args.events} events: {rows} inbox rows")
+        print(f"{'first (full) refresh':>28} {full_refresh * 1000:>9.1f} ms")
+        print(f"{'hourly refresh':>28} {hourly_refresh * 1000:>9.1f} ms")
+        print(f"{'read (scan, before)':>28} {scan * 1000:>9.1f} ms")
+        print(f"{'read (inbox page + unread)':>28} {inbox * 1000:>9.1f} ms  ({inbox_queries} queries)")
+        print(f"{'edit class event':>28} {class_edit * 1000:>9.1f} ms")
+        print(f"{'edit public event':>28} {public_edit * 1000:>9.1f} ms")
+
+if __name__ == '__main__':
+    main()
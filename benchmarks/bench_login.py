@@ -0,0 +1,133 @@
+# Benchmark for a login burst against password hashing on the request threads vs the pool
+# Seeds a throwaway SQLite database, then fires --concurrency logins at once through the
+# test client while a probe keeps requesting a cheap page, and reports login throughput,
+# login latency percentiles, shed logins (503) and the probe's latency during the burst.
+# Usage: python -m benchmarks.bench_login [--concurrency 200] [--method scrypt:32768:8:1]
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def burst(app, users, probe_path):
+    """
+    Log every user in at once; returns (wall seconds, [(status, seconds)], [probe seconds])
+    """
+    results = [None] * len(users)
+    start_gate = threading.Barrier(len(users) + 1)
+    done = threading.Event()
+
+    def login(index, email):
+        client = app.test_client()
+        start_gate.wait()
+        started = time.perf_counter()
+        response = client.post('/login', json={'email': email, 'password': 'Password123'})
+        results[index] = (response.status_code, time.perf_counter() - started)
+
+    probes = []
+    def probe():
+        client = app.test_client()
+        start_gate.wait()
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get(probe_path)
+            probes.append(time.perf_counter() - started)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=login, args=(index, email)) for index, email in enumerate(users)]
+    probe_thread = threading.Thread(target=probe)
+    probe_thread.start()
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    done.set()
+    probe_thread.join()
+    return wall, results, probes
+
+def run(mode, args):
+    """Seed a fresh database and time one burst with the given hashing setup"""
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from benchmarks import create_app
+    from extensions import db
+    from models.user import User
+    from utils.password_hashing import password_hasher
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app = create_app()
+        if mode == 'inline':
+            # What the handlers did before: hash on the request thread, no queue limit
+            app.config.update(PASSWORD_HASH_WORKERS=0, PASSWORD_HASH_MAX_PENDING=10 ** 6)
+        app.config['PASSWORD_HASH_METHOD'] = args.method
+        password_hasher.configure(app.config)
+
+        # Every user shares one precomputed hash; verifying still costs the full hash
+        password_hash = generate_password_hash('Password123', method=args.method)
+        emails = [f'user{n}@example.com' for n in range(args.concurrency)]
+        with app.app_context():
+            db.session.execute(insert(User), [
+                {'email': email, 'password_hash': password_hash, 'role': 'student'} for email in emails
+            ])
+            db.session.commit()
+
+        password_hasher.hash('warm-up')  # Start the pool outside the timed burst
+        wall, results, probes = burst(app, emails, '/login')
+        password_hasher.shutdown()
+
+    ok = [seconds for status, seconds in results if status == 200]
+    shed = sum(1 for status, _ in results if status == 503)
+    failed = len(results) - len(ok) - shed
+    line = f"{mode:>7} {len(ok) / wall:>9.1f}/s"
+    line += f" {percentile(ok, 0.5) * 1000:>8.0f} {percentile(ok, 0.99) * 1000:>8.0f}" if ok else f" {'-':>8} {'-':>8}"
+    line += f" {shed:>6} {failed:>6} {percentile(probes, 0.5) * 1000:>8.1f} {max(probes) * 1000:>8.1f}"
+    print(line)
+
+def check_rehash(args):
+    """A hash made with other parameters is replaced on the next successful login"""
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from benchmarks import create_app
+    from extensions import db
+    from models.user import User
+    from utils.password_hashing import password_hasher
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'rehash.db')}"
+        app = create_app()
+        app.config['PASSWORD_HASH_METHOD'] = args.method
+        password_hasher.configure(app.config)
+        with app.app_context():
+            db.session.execute(insert(User), [{'email': 'old@example.com', 'role': 'student',
+                                               'password_hash': generate_password_hash('Password123', method='pbkdf2:sha256:1000')}])
+            db.session.commit()
+        status = app.test_client().post('/login', json={'email': 'old@example.com', 'password': 'Password123'}).status_code
+        with app.app_context():
+            stored = db.session.query(User.password_hash).scalar()
+        password_hasher.shutdown()
+    upgraded = stored.split('$', 1)[0] == args.method
+    print(f"rehash on login: HTTP {status}, stored hash now {stored.split('$', 1)[0]} ({'ok' if upgraded else 'NOT upgraded'})")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark a login burst')
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--method', default='scrypt:32768:8:1', help='werkzeug hash method to benchmark')
+    args = parser.parse_args()
+
+    print(f"{args.concurrency} concurrent logins, {args.method}, {os.cpu_count()} CPU(s)")
+    print(f"{'mode':>7} {'logins':>11} {'p50 ms':>8} {'p99 ms':>8} {'shed':>6} {'failed':>6} {'probe p50':>9} {'probe max':>9}")
+    run('inline', args)
+    run('pool', args)
+    check_rehash(args)
+
+if __name__ == '__main__':
+    main()
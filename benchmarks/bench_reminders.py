@@ -0,0 +1,102 @@
+# Benchmark for the batched reminder engine (models.notifications.send_event_reminders)
+# Seeds a throwaway SQLite database with synthetic users and events and times one reminder run
+# Usage: python -m benchmarks.bench_reminders [--scales 1000x500,5000x2500,10000x5000]
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event as sa_event, insert
+
+def parse_scales(value):
+    """Parse 'USERSxEVENTS,...' into a list of (users, events) tuples"""
+    return [tuple(int(n) for n in scale.split('x')) for scale in value.split(',')]
+
+def seed(db, users, events, rng):
+    """
+    Insert synthetic users and events with Core inserts (no password hashing)
+    Students belong to one year group and four classes; events spread over the next 30 days
+    """
+    from models.user import User
+    from models.event import Event
+    from models.tags import EventTag, UserTag
+
+    class_tags = [f'class-{n}' for n in range(max(users // 50, 1))]
+    year_tags = [f'year-{n}' for n in range(7, 13)]
+
+    user_rows, user_tag_rows = [], []
+    for user_id in range(1, users + 1):
+        role = 'teacher' if user_id % 10 == 0 else 'student'
+        tags = {'public', role, rng.choice(year_tags), *rng.sample(class_tags, min(4, len(class_tags)))}
+        user_rows.append({'id': user_id, 'email': f'user{user_id}@example.com', 'password_hash': 'x', 'role': role})
+        user_tag_rows.extend({'user_id': user_id, 'tag': tag} for tag in tags)
+
+    event_rows, event_tag_rows = [], []
+    today = date.today()
+    for event_id in range(1, events + 1):
+        roll = rng.random()
+        if roll < 0.01:
+            tag = 'public'
+        elif roll < 0.11:
+            tag = rng.choice(year_tags)
+        elif roll < 0.85:
+            tag = rng.choice(class_tags)
+        else:
+            tag = ''  # Personal event
+        start = datetime.combine(today + timedelta(days=rng.randint(1, 30)), datetime.min.time()) + timedelta(hours=rng.randint(8, 16))
+        event_rows.append({
+            'id': event_id, 'title': f'Event {event_id}', 'description': 'Synthetic event', 'priority': rng.randint(0, 2),
+            'tags': tag, 'start_time': start, 'end_time': start + timedelta(hours=1), 'is_recurring': False,
+            'notifications_silenced': False, 'creator_id': rng.randint(1, users)
+        })
+        if tag:
+            event_tag_rows.append({'event_id': event_id, 'tag': tag})
+
+    for model, rows in ((User, user_rows), (UserTag, user_tag_rows), (Event, event_rows), (EventTag, event_tag_rows)):
+        db.session.execute(insert(model), rows)
+    db.session.commit()
+
+def run_scale(users, events, seed_value=42):
+    """Seed a fresh database, run send_event_reminders once and return (seconds, queries, queued)"""
+    # Reminders are only queued in the outbox, so no SMTP server is involved
+    import models.notifications as notifications
+    from benchmarks import create_app
+    from extensions import db
+    from models.notifications import Notification
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app = create_app()
+
+        with app.app_context():
+            seed(db, users, events, random.Random(seed_value))
+            query_count = [0]
+            def count_query(*args):
+                query_count[0] += 1
+            sa_event.listen(db.engine, 'before_cursor_execute', count_query)
+
+            started = time.perf_counter()
+            notifications.send_event_reminders(app)
+            elapsed = time.perf_counter() - started
+
+            sa_event.remove(db.engine, 'before_cursor_execute', count_query)
+            sent = db.session.query(Notification).count()
+            db.session.remove()
+            db.engine.dispose()
+    return elapsed, query_count[0], sent
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark send_event_reminders at several scales')
+    parser.add_argument('--scales', type=parse_scales, default=parse_scales('1000x500,5000x2500,10000x5000'))
+    args = parser.parse_args()
+
+    print(f"{'users':>8} {'events':>8} {'reminders':>10} {'queries':>8} {'seconds':>9}")
+    for users, events in args.scales:
+        elapsed, queries, sent = run_scale(users, events)
+        print(f"{users:>8} {events:>8} {sent:>10} {queries:>8} {elapsed:>9.2f}")
+
+if __name__ == '__main__':
+    main()
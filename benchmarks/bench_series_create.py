@@ -0,0 +1,122 @@
+# Benchmark for creating a recurring series
+# Compares the original per-occurrence ORM loop, a chunked Core insert of the same rows and
+# the current single master row (POST /event/create), for a daily series over two years
+# Usage: python -m benchmarks.bench_series_create [--days 730] [--repeats 5]
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import event as sa_event, insert
+
+from benchmarks import sign_in
+
+SERIES_START = datetime(2030, 1, 1, 9, 0)
+CHUNK_SIZE = 500
+
+def per_row_orm(db, days, creator_id):
+    """The original create_event loop: one ORM Event per occurrence through the unit of work"""
+    from models.event import Event
+
+    group_id = str(uuid.uuid4())
+    current = SERIES_START
+    while current < SERIES_START + timedelta(days=days):
+        db.session.add(Event(
+            title='Daily', description='Per-row ORM', priority=0, tags='year-12',
+            start_time=current, end_time=current + timedelta(hours=1),
+            is_recurring=True, recurrence_group_id=group_id, creator_id=creator_id
+        ))
+        current += timedelta(days=1)
+    db.session.commit()
+    return days
+
+def per_row_core(db, days, creator_id):
+    """The same rows from the rule generator, written with chunked executemany inserts"""
+    from models.event import Event
+    from models.recurrence import build_rule
+
+    group_id = str(uuid.uuid4())
+    until = (SERIES_START + timedelta(days=days - 1)).date()
+    rows = (
+        {'title': 'Daily', 'description': 'Per-row Core', 'priority': 0, 'tags': 'year-12',
+         'start_time': start, 'end_time': start + timedelta(hours=1), 'is_recurring': True,
+         'notifications_silenced': False, 'recurrence_group_id': group_id, 'creator_id': creator_id}
+        for start in build_rule('daily', 1, [], SERIES_START, until)
+    )
+    written = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            db.session.execute(insert(Event), chunk)
+            written += len(chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(insert(Event), chunk)
+        written += len(chunk)
+    db.session.commit()
+    return written
+
+def master_row(client, days):
+    """The current path: POST /event/create stores the rule on one master row"""
+    until = (SERIES_START + timedelta(days=days - 1)).date()
+    response = client.post('/event/create', json={
+        'title': 'Daily', 'description': 'Master row', 'event_type': 'recurring', 'tags': 'year-12',
+        'start_time': SERIES_START.isoformat(), 'end_time': (SERIES_START + timedelta(hours=1)).isoformat(),
+        'rec_start_date': SERIES_START.date().isoformat(), 'rec_ends': until.isoformat(),
+        'rec_interval': 1, 'rec_unit': 'daily'
+    })
+    assert response.status_code == 200, response.get_json()
+    return 1
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark recurring series creation')
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        from benchmarks import create_app
+        from extensions import db
+        from models.user import User
+
+        app = create_app()
+        with app.app_context():
+            db.session.execute(insert(User), [{'id': 1, 'email': 'teacher@example.com', 'password_hash': 'x', 'role': 'teacher'}])
+            db.session.commit()
+            engine = db.engine
+
+        client = app.test_client()
+        sign_in(app, client, 1)
+
+        query_count = [0]
+        def count_query(*args):
+            query_count[0] += 1
+        sa_event.listen(engine, 'before_cursor_execute', count_query)
+
+        strategies = (
+            ('per-row ORM (before)', lambda: per_row_orm(db, args.days, 1)),
+            ('per-row Core insert', lambda: per_row_core(db, args.days, 1)),
+            ('series master (after)', lambda: master_row(client, args.days)),
+        )
+        print(f"{'strategy':<24} {'rows':>6} {'queries':>8} {'ms':>9}")
+        for name, create in strategies:
+            timings = []
+            for _ in range(args.repeats):
+                with app.app_context():
+                    query_count[0] = 0
+                    started = time.perf_counter()
+                    rows = create()
+                    timings.append(time.perf_counter() - started)
+            print(f"{name:<24} {rows:>6} {query_count[0]:>8} {statistics.median(timings) * 1000:>9.1f}")
+
+        sa_event.remove(engine, 'before_cursor_execute', count_query)
+        engine.dispose()
+
+if __name__ == '__main__':
+    main()
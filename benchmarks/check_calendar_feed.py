@@ -0,0 +1,202 @@
+# Check of the .ics calendar subscriptions (models.calendar_feed, utils.ical)
+# Seeds a calendar with benchmarks.generator, subscribes a student and a teacher, expands
+# each feed's recurrence rules, EXDATEs and RECURRENCE-ID overrides with dateutil and
+# compares the occurrences with what /api/events returns for the same month. Then checks
+# that the body is streamed in batches, that polls of an unchanged calendar get a 304 from
+# either validator, that edits and deletions move them, that a student's own series keeps
+# its untagged occurrences in both feeds, and that revoked tokens stop working.
+# Exits non-zero if any check fails.
+# Usage: python -m benchmarks.check_calendar_feed
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+from dateutil.relativedelta import relativedelta
+from dateutil.rrule import rrulestr
+from sqlalchemy import event as sa_event
+
+from benchmarks import sign_in
+from benchmarks.generator import generate
+
+def parse_events(body):
+    """VEVENTs of an iCalendar body as lists of (name, value) properties"""
+    lines = []
+    for line in body.split('\r\n'):
+        if line.startswith(' '):
+            lines[-1] += line[1:]
+        elif line:
+            lines.append(line)
+    events, current = [], None
+    for line in lines:
+        if line == 'BEGIN:VEVENT':
+            current = []
+        elif line == 'END:VEVENT':
+            events.append(current)
+            current = None
+        elif current is not None:
+            name, _, value = line.partition(':')
+            current.append((name.split(';')[0], value))
+    return events
+
+def unescape(value):
+    return value.replace('\\n', '\n').replace('\\,', ',').replace('\\;', ';').replace('\\\\', '\\')
+
+def feed_occurrences(body, window_start, window_end):
+    """{(event id, title, start)} of the feed's occurrences overlapping the window, as a calendar app expands them"""
+    parse = lambda value: datetime.strptime(value, '%Y%m%dT%H%M%S')
+    series, overrides = {}, []
+    for properties in parse_events(body):
+        fields = dict(properties)
+        event_id = int(fields['UID'].split('@')[0].split('-')[1])
+        start, end = parse(fields['DTSTART']), parse(fields['DTEND'])
+        entry = (event_id, unescape(fields['SUMMARY']), start, end)
+        if 'RRULE' in fields:
+            lines = [f"DTSTART:{fields['DTSTART']}", f"RRULE:{fields['RRULE']}"]
+            lines += [f'EXDATE:{value}' for name, value in properties if name == 'EXDATE']
+            series[fields['UID']] = (entry, rrulestr('\n'.join(lines), forceset=True), set())
+        elif 'RECURRENCE-ID' in fields:
+            overrides.append((fields['UID'], parse(fields['RECURRENCE-ID']), entry))
+        else:
+            overrides.append((None, None, entry))
+
+    occurrences = set()
+    for uid, recurrence_id, entry in overrides:
+        if uid is not None:
+            series[uid][2].add(recurrence_id)
+        if entry[2] < window_end and entry[3] > window_start:
+            occurrences.add(entry[:3])
+    for (event_id, title, start, end), rule, replaced in series.values():
+        duration = end - start
+        for occurrence_start in rule.between(window_start - duration, window_end, inc=True):
+            if occurrence_start not in replaced and occurrence_start < window_end and occurrence_start + duration > window_start:
+                occurrences.add((event_id, title, occurrence_start))
+    return occurrences
+
+def api_occurrences(client, window_start):
+    events = client.get(f'/api/events?range=month&start={window_start.date().isoformat()}').get_json()
+    return {(event['id'], event['title'], datetime.fromisoformat(event['start_time'])) for event in events}
+
+def main():
+    failures = []
+    def check(name, ok, detail):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}: {detail}")
+        if not ok:
+            failures.append(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'check.db')}"
+        from benchmarks import create_app
+        from extensions import db
+
+        app = create_app()
+        with contextlib.redirect_stdout(io.StringIO()):
+            dataset = generate(app, 'small')
+        app.config['CALENDAR_FEED_BATCH_SIZE'] = 100
+
+        feeds = {}
+        for role, user_id in (('student', dataset['student_id']), ('teacher', dataset['teacher_id'])):
+            client = app.test_client()
+            sign_in(app, client, user_id)
+            created = client.post('/api/calendar-feed')
+            feed_url = created.get_json()['url'].replace('http://localhost', '')
+            feeds[role] = (client, feed_url)
+
+            started = time.perf_counter()
+            response = client.get(feed_url)
+            chunks = list(response.response)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            body = b''.join(chunk if isinstance(chunk, bytes) else chunk.encode() for chunk in chunks).decode()
+
+            # Every occurrence of this month and the next two, as the app and a calendar app see them
+            month = datetime.combine(date.today().replace(day=1), datetime.min.time())
+            mismatches, compared = 0, 0
+            for offset in range(3):
+                window_start = month + relativedelta(months=offset)
+                expected = api_occurrences(client, window_start)
+                found = feed_occurrences(body, window_start, window_start + relativedelta(months=1))
+                mismatches += len(expected ^ found)
+                compared += len(expected)
+            vevents = parse_events(body)
+            rules = sum(1 for properties in vevents if 'RRULE' in dict(properties))
+            check(f'{role} occurrences match /api/events', created.status_code == 201 and mismatches == 0 and compared > 0,
+                  f'{compared} occurrences over 3 months, {mismatches} differ; {len(vevents)} VEVENTs, {rules} with an RRULE')
+
+            long_lines = [line for line in body.split('\r\n') if len(line.encode()) > 75]
+            check(f'{role} feed streamed', response.is_streamed and len(chunks) > 3 and not long_lines,
+                  f'{len(chunks)} chunks, {len(body) / 1024:.0f} KiB in {elapsed_ms:.0f} ms, {len(long_lines)} lines over 75 octets')
+
+        client, feed_url = feeds['student']
+        first = client.get(feed_url)
+        first.get_data()
+        with app.app_context():
+            engine = db.engine
+        executed = [0]
+        def count_query(*args):
+            executed[0] += 1
+        sa_event.listen(engine, 'before_cursor_execute', count_query)
+        by_etag = client.get(feed_url, headers={'If-None-Match': first.headers['ETag']})
+        sa_event.remove(engine, 'before_cursor_execute', count_query)
+        by_date = client.get(feed_url, headers={'If-Modified-Since': first.headers['Last-Modified']})
+        check('unchanged feed', by_etag.status_code == 304 and by_date.status_code == 304 and executed[0] <= 2,
+              f'HTTP {by_etag.status_code} by ETag after {executed[0]} queries, {by_date.status_code} by Last-Modified')
+
+        # An edit the student can see moves the ETag; a deletion (a tombstone) moves Last-Modified too
+        time.sleep(1)
+        admin = app.test_client()
+        sign_in(app, admin, 201)  # Every 200th user after the first is an admin
+        single = next(fields for fields in map(dict, parse_events(first.get_data(as_text=True)))
+                      if 'RRULE' not in fields and 'RECURRENCE-ID' not in fields and fields['UID'].count('-') == 1)
+        event_id = int(single['UID'].split('@')[0].split('-')[1])
+        times = {key: datetime.strptime(single[name], '%Y%m%dT%H%M%S').isoformat()
+                 for key, name in (('start_time', 'DTSTART'), ('end_time', 'DTEND'))}
+        edited = admin.post(f'/api/event/{event_id}', json={'title': 'Renamed for the feed check', **times}).status_code
+        after_edit = client.get(feed_url, headers={'If-None-Match': first.headers['ETag']})
+        renamed = 'SUMMARY:Renamed for the feed check' in after_edit.get_data(as_text=True)
+        time.sleep(1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            deleted = admin.delete(f'/api/event/{event_id}').status_code
+        after_delete = client.get(feed_url, headers={'If-Modified-Since': after_edit.headers['Last-Modified']})
+        after_delete.get_data()  # Finish the stream, so its read transaction ends before the writes below
+        check('changes move the validators', edited == 200 and after_edit.status_code == 200 and renamed
+              and deleted == 200 and after_delete.status_code == 200
+              and after_delete.last_modified > after_edit.last_modified,
+              f'HTTP {after_edit.status_code} after an edit (renamed: {renamed}), {after_delete.status_code} after a delete')
+
+        # The student's own series tagged for another class, with one occurrence made untagged:
+        # that occurrence is private to the student and both feeds must show it
+        from models.event import Event
+        from models.event_exceptions import EventExceptions
+        with app.app_context():
+            series = Event(title='Own series', description='', start_time=month.replace(hour=18),
+                           end_time=month.replace(hour=19), creator_id=dataset['student_id'], tags='not-my-class',
+                           is_recurring=True, recurrence_unit='weekly', recurrence_interval=1,
+                           recurrence_until=(month + relativedelta(months=1)).date(), recurrence_group_id='own-series')
+            db.session.add(series)
+            db.session.flush()
+            untagged_on = (month + relativedelta(days=7)).date()
+            db.session.add(EventExceptions(original_event_id=series.id, exception_date=untagged_on,
+                                           title='Own series', tags=''))
+            db.session.commit()
+            series_id = series.id
+        untagged = (series_id, 'Own series', month.replace(hour=18) + relativedelta(days=7))
+        in_api = untagged in api_occurrences(client, month)
+        in_feed = untagged in feed_occurrences(client.get(feed_url).get_data(as_text=True), month, month + relativedelta(months=1))
+        check('own retagged series', in_api and in_feed,
+              f'untagged occurrence of the own series in /api/events: {in_api}, in the feed: {in_feed}')
+
+        rotated = client.post('/api/calendar-feed').get_json()['url'].replace('http://localhost', '')
+        old_status, new_status = client.get(feed_url).status_code, client.get(rotated).status_code
+        client.delete('/api/calendar-feed')
+        revoked = client.get(rotated).status_code
+        check('token rotation', old_status == 404 and new_status == 200 and revoked == 404,
+              f'old URL HTTP {old_status}, new URL {new_status}, revoked URL {revoked}')
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
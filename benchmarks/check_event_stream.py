@@ -0,0 +1,186 @@
+# Check of the live update stream (utils.event_stream) through the real routes
+# Opens /api/stream for a few users with the test client, then checks that event
+# creates, edits, deletes and toggles reach exactly the users who can see the event,
+# that rolled back changes are never sent, and the heartbeat, backpressure and
+# connection cap. Also times fan-out to many open streams.
+# Exits non-zero if any check fails.
+# Usage: python -m benchmarks.check_event_stream
+
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import sign_in
+
+def read_frames(stream, seconds=0.5):
+    """(kind, data) of the frames a stream sends within `seconds`; comments come back as ('comment', text)"""
+    frames = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            chunk = next(stream)
+        except StopIteration:
+            frames.append(('closed', None))
+            break
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        kind = data = None
+        for line in chunk.strip().split('\n'):
+            if line.startswith('event: '):
+                kind = line[len('event: '):]
+            elif line.startswith('data: '):
+                data = json.loads(line[len('data: '):])
+        frames.append((kind, data) if kind else ('comment', chunk.strip()))
+        if kind:
+            break
+    return frames
+
+def messages(frames):
+    return [frame for frame in frames if frame[0] != 'comment']
+
+def main():
+    failures = []
+    def check(name, ok, detail):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}: {detail}")
+        if not ok:
+            failures.append(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'check.db')}"
+        from benchmarks import create_app
+        from auth.identity import Identity
+        from extensions import db
+        from models.event import Event
+        from models.user import User
+        from utils.event_stream import Audience, event_bus, publish_event_changes, stream_messages
+
+        app = create_app()
+        app.config.update(STREAM_HEARTBEAT_SECONDS=0.2)
+
+        with app.app_context():
+            users = {
+                'teacher': User(email='teacher@example.com', password='Password123!', role='teacher'),
+                'alice': User(email='alice@example.com', password='Password123!', role='student'),
+                'bob': User(email='bob@example.com', password='Password123!', role='student')
+            }
+            users['alice'].profile_tags = 'class-a'
+            db.session.add_all(users.values())
+            db.session.commit()
+            user_ids = {name: user.id for name, user in users.items()}
+
+        def client_for(name):
+            client = app.test_client()
+            sign_in(app, client, user_ids[name])
+            return client
+
+        clients = {name: client_for(name) for name in user_ids}
+        responses = {name: clients[name].get('/api/stream', buffered=False) for name in user_ids}
+        streams = {name: iter(response.response) for name, response in responses.items()}
+        for stream in streams.values():
+            read_frames(stream, 0.1)  # The retry/connected preamble
+        check('stream opens', all(r.status_code == 200 and r.mimetype == 'text/event-stream' for r in responses.values())
+              and event_bus.stats()['connections'] == 3, f"{event_bus.stats()['connections']} streams open")
+
+        def received(seconds=0.4):
+            return {name: messages(read_frames(stream, seconds)) for name, stream in streams.items()}
+
+        # A class event reaches the teacher and class-a, not bob
+        start = (datetime.utcnow() + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+        response = clients['teacher'].post('/event/create', json={
+            'title': 'Class A test', 'start_time': start.strftime('%Y-%m-%dT%H:%M'),
+            'end_time': (start + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M'), 'tags': 'class-a'
+        })
+        event_id = response.get_json()['event_id']
+        got = received()
+        check('create reaches its audience', got['teacher'] == [('calendar', {'events': [event_id]})]
+              and got['alice'] == [('calendar', {'events': [event_id]})] and got['bob'] == [],
+              f"teacher {got['teacher']}, alice {got['alice']}, bob {got['bob']}")
+
+        # Retagging away from class-a still tells alice (the event left her calendar)
+        payload = {'title': 'Class B test', 'start_time': start.isoformat(), 'end_time': (start + timedelta(hours=1)).isoformat(),
+                   'tags': 'class-b'}
+        clients['teacher'].post(f'/api/event/{event_id}', json=payload)
+        got = received()
+        check('edit reaches old and new audience', got['alice'] == [('calendar', {'events': [event_id]})] and got['bob'] == [],
+              f"alice {got['alice']}, bob {got['bob']}")
+
+        clients['teacher'].post(f'/api/event/{event_id}/toggle-notifications', json={})
+        got = received()
+        check('toggle published', got['teacher'] == [('calendar', {'events': [event_id]})], f"teacher {got['teacher']}")
+
+        # A student's untagged event is private: only its creator hears about it
+        response = clients['bob'].post('/event/create', json={
+            'title': 'Private', 'start_time': start.strftime('%Y-%m-%dT%H:%M'),
+            'end_time': (start + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M'), 'tags': ''
+        })
+        private_id = response.get_json()['event_id']
+        got = received()
+        check('private event', got['bob'] == [('calendar', {'events': [private_id]})]
+              and got['teacher'] == [] and got['alice'] == [],
+              f"teacher {got['teacher']}, alice {got['alice']}, bob {got['bob']}")
+
+        clients['bob'].delete(f'/api/event/{private_id}')
+        got = received()
+        check('delete published', got['bob'] == [('calendar', {'events': [private_id]})], f"bob {got['bob']}")
+
+        # Rolled back changes are never sent
+        with app.app_context():
+            event = db.session.get(Event, event_id)
+            event.title = 'Never committed'
+            db.session.flush()
+            db.session.rollback()
+        got = received()
+        check('rollback not published', not any(got.values()), f'{got}')
+
+        # Nothing to say: keep-alive comments at the heartbeat interval
+        frames = read_frames(streams['alice'], 0.5)
+        check('heartbeat', any(kind == 'comment' and 'keep-alive' in text for kind, text in frames),
+              f'{len(frames)} frame(s) in 0.5s')
+
+        # Profile tag changes close the user's stream after a reconnecting resync
+        clients['alice'].post('/api/profile/tags', json={'tags': 'class-b'})
+        frames = read_frames(streams['alice'], 0.4) + read_frames(streams['alice'], 0.4)
+        check('tag change resyncs', ('resync', {'reconnect': True}) in frames and ('closed', None) in frames, f'{frames}')
+        responses['alice'].close()
+
+        # Backpressure: a stream that stops reading gets one resync instead of an unbounded backlog
+        audience = {1: Audience(frozenset({'public'}), None, 'teacher', False)}
+        slow = event_bus.subscribe(Identity(user_ids['teacher'], 'teacher@example.com', 'teacher', frozenset({'public', 'teacher'})))
+        for _ in range(app.config['STREAM_QUEUE_SIZE'] * 3):
+            publish_event_changes(audience)
+        frames = stream_messages(slow, 0.1, 5, 1000)
+        next(frames)
+        kinds = [read_frames(frames, 0.3)[0][0] for _ in range(2)]
+        frames.close()
+        check('backpressure', kinds == ['resync', 'comment'] and event_bus.stats()['overflows'] >= 1,
+              f"{kinds}, {event_bus.stats()['overflows']} overflow(s)")
+
+        # Connection cap
+        app.config['STREAM_MAX_CONNECTIONS'] = event_bus.max_connections = event_bus.stats()['connections']
+        response = clients['bob'].get('/api/stream', buffered=False)
+        check('connection cap', response.status_code == 503 and response.headers.get('Retry-After') == '60',
+              f'HTTP {response.status_code} with {event_bus.stats()["connections"]} open')
+        for name in ('teacher', 'bob'):
+            responses[name].close()
+        check('streams released', event_bus.stats()['connections'] == 0, f"{event_bus.stats()['connections']} left open")
+
+        # Fan-out cost with many open streams (publishing happens after commit, on the request thread)
+        event_bus.max_connections = 1000
+        subscribers = [event_bus.subscribe(identity) for identity in
+                       [Identity(i, None, 'student', frozenset({'public', 'student', f'class-{i % 20}'}))
+                        for i in range(1000)]]
+        audiences = {i: Audience(frozenset({f'class-{i % 20}'}), 1, 'teacher', False) for i in range(10)}
+        started = time.perf_counter()
+        for _ in range(20):
+            publish_event_changes(audiences)
+        elapsed = (time.perf_counter() - started) / 20
+        for subscription in subscribers:
+            event_bus.unsubscribe(subscription)
+        check('fan-out time', elapsed < 0.05, f'{elapsed * 1000:.2f} ms to publish 10 changes to 1000 streams')
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
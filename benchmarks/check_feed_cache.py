@@ -0,0 +1,117 @@
+# Check of the shared feed cache (utils.feed_cache) against writes it never hears about
+# Seeds a calendar with benchmarks.generator, warms the cache with a student's month, then
+# renames and deletes events from a separate process through plain sqlite3, as another app
+# worker or a maintenance script would. The next /api/events must miss the cache, carry
+# the change and move the ETag, so neither the cache nor a client revalidation serves the
+# old body. Writes through the app must still be picked up as before.
+# Exits non-zero if any check fails.
+# Usage: python -m benchmarks.check_feed_cache
+
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import date
+
+from benchmarks import sign_in
+from benchmarks.generator import generate
+
+# Runs in its own interpreter: no session hooks, no shared cache, just a commit to the file
+WRITER = '''
+import sqlite3, sys
+from datetime import datetime
+path, statement, event_id = sys.argv[1:]
+connection = sqlite3.connect(path)
+with connection:
+    if statement == 'rename':
+        connection.execute("UPDATE events SET title = ?, updated_at = ? WHERE id = ?",
+                           ('Renamed elsewhere', datetime.utcnow().isoformat(' '), int(event_id)))
+    else:
+        connection.execute("DELETE FROM event_tags WHERE event_id = ?", (int(event_id),))
+        connection.execute("DELETE FROM events WHERE id = ?", (int(event_id),))
+connection.close()
+'''
+
+def main():
+    failures = []
+    def check(name, ok, detail):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}: {detail}")
+        if not ok:
+            failures.append(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'check.db')
+        os.environ['DATABASE_URL'] = f"sqlite:///{path}"
+        from benchmarks import create_app
+        from extensions import db
+        from models.event import Event
+
+        app = create_app()
+        with contextlib.redirect_stdout(io.StringIO()):
+            dataset = generate(app, 'small')
+
+        client = app.test_client()
+        sign_in(app, client, dataset['student_id'])
+        url = f"/api/events?range=month&start={date.today().replace(day=1).isoformat()}"
+
+        def fetch(**headers):
+            response = client.get(url, headers=headers)
+            events = response.get_json() if response.status_code == 200 else None
+            return response, events
+
+        def write_elsewhere(statement, event_id):
+            subprocess.run([sys.executable, '-c', WRITER, path, statement, str(event_id)], check=True)
+
+        first, events = fetch()
+        second, _ = fetch()
+        check('warm cache', first.headers['X-Feed-Cache'] == 'miss' and second.headers['X-Feed-Cache'] == 'hit'
+              and second.headers['ETag'] == first.headers['ETag'],
+              f"{len(events)} events, then {first.headers['X-Feed-Cache']} and {second.headers['X-Feed-Cache']}")
+
+        # Two tagged single events in the shared part of the window
+        with app.app_context():
+            shared = [event_id for (event_id,) in db.session.query(Event.id).filter(
+                Event.id.in_({event['id'] for event in events}), Event.tags != '', Event.is_recurring == False
+            ).order_by(Event.id).limit(2)]
+        renamed_id, deleted_id = shared
+
+        write_elsewhere('rename', renamed_id)
+        after_rename, events = fetch(**{'If-None-Match': first.headers['ETag']})
+        titles = {event['title'] for event in events or () if event['id'] == renamed_id}
+        check('rename in another process', after_rename.status_code == 200
+              and after_rename.headers['X-Feed-Cache'] == 'miss' and titles == {'Renamed elsewhere'},
+              f"revalidation HTTP {after_rename.status_code}, {after_rename.headers.get('X-Feed-Cache')} with {titles}")
+
+        write_elsewhere('delete', deleted_id)
+        after_delete, events = fetch(**{'If-None-Match': after_rename.headers['ETag']})
+        remaining = sum(1 for event in events or () if event['id'] == deleted_id)
+        check('delete in another process', after_delete.status_code == 200
+              and after_delete.headers['X-Feed-Cache'] == 'miss' and remaining == 0,
+              f"revalidation HTTP {after_delete.status_code}, {after_delete.headers.get('X-Feed-Cache')}, "
+              f"{remaining} occurrences of the deleted event left")
+
+        # Nothing changed since: the fresh body is cached again and the client's copy still valid
+        cached, events = fetch()
+        unchanged, _ = fetch(**{'If-None-Match': after_delete.headers['ETag']})
+        check('unchanged after the writes', cached.headers['X-Feed-Cache'] == 'hit' and unchanged.status_code == 304,
+              f"{cached.headers['X-Feed-Cache']}, revalidation HTTP {unchanged.status_code}")
+
+        # A write through the app is still seen by this process's invalidation
+        admin = app.test_client()
+        sign_in(app, admin, 201)  # Every 200th user after the first is an admin
+        event = next(event for event in events if event['id'] == shared[0])
+        edited = admin.post(f"/api/event/{event['id']}", json={
+            'title': 'Renamed here', 'start_time': event['start_time'], 'end_time': event['end_time']
+        }).status_code
+        after_edit, events = fetch()
+        titles = {event['title'] for event in events if event['id'] == shared[0]}
+        check('edit through the app', edited == 200 and after_edit.headers['X-Feed-Cache'] == 'miss'
+              and titles == {'Renamed here'},
+              f"HTTP {edited}, then {after_edit.headers['X-Feed-Cache']} with {titles}")
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
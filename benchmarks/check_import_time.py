@@ -0,0 +1,80 @@
+# Check of the web app's import time and start-up imports
+# Imports the app in fresh interpreters under `python -X importtime` and compares the median
+# cumulative time of `import app` with that of the framework it builds on (Flask and
+# Flask-SQLAlchemy), measured alternately in the same run, so the budget is a ratio that
+# holds on slower and faster machines alike. Then creates the app on a migrated database
+# and checks that none of the optional heavy dependencies - loaded only by the routes,
+# jobs or commands that need them - were imported on the way.
+# Exits non-zero if any check fails.
+# Usage: python -m benchmarks.check_import_time [--max-ratio 1.5] [--runs 5]
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Imported on first use only: the summariser's HTTP client, Alembic (for `flask db`
+# commands), mail delivery (for the outbox), the Gemini SDK and the worker's scheduler
+DEFERRED_MODULES = ['requests', 'flask_migrate', 'alembic', 'flask_mail', 'flask_login', 'google.genai', 'apscheduler']
+
+# The baseline: what `import app` can never avoid (SQLAlchemy comes with Flask-SQLAlchemy)
+BASELINE_MODULES = ['flask', 'flask_sqlalchemy']
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in fresh interpreters: migrate a database, then start the app on it and list the
+# deferred modules it imported (migrating imports Alembic, so that needs its own process)
+MIGRATE_SCRIPT = "from benchmarks import create_app; create_app()"
+LOADED_SCRIPT = """
+import sys
+from app import create_app
+create_app()
+print(' '.join(name for name in {modules!r} if name in sys.modules))
+"""
+
+def import_time_ms(modules):
+    """Cumulative time of importing these top-level modules in a fresh interpreter, from -X importtime"""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {', '.join(modules)}"], cwd=ROOT,
+                               capture_output=True, text=True, check=True)
+    found = re.findall(r'^import time:\s+\d+ \|\s+(\d+) \| (\S+)$', completed.stderr, re.MULTILINE)
+    return sum(int(microseconds) for microseconds, name in found if name in modules) / 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the import time of the web app')
+    parser.add_argument('--max-ratio', type=float, default=1.5,
+                        help='budget for the median `import app` time as a multiple of the framework baseline')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    failures = []
+    def check(name, ok, detail):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}: {detail}")
+        if not ok:
+            failures.append(name)
+
+    # Alternated, so both medians see the same load on the machine
+    timings, baselines = [], []
+    for _ in range(args.runs):
+        timings.append(import_time_ms(['app']))
+        baselines.append(import_time_ms(BASELINE_MODULES))
+    median, baseline = statistics.median(timings), statistics.median(baselines)
+    check('import budget', median <= baseline * args.max_ratio,
+          f'median {median:.0f} ms over {args.runs} runs, {median / baseline:.2f}x the {baseline:.0f} ms of '
+          f"{' and '.join(BASELINE_MODULES)} (budget {args.max_ratio:.2f}x)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        environment = {**os.environ, 'DATABASE_URL': f"sqlite:///{os.path.join(tmp, 'check.db')}"}
+        subprocess.run([sys.executable, '-c', MIGRATE_SCRIPT], cwd=ROOT, env=environment, capture_output=True, check=True)
+        completed = subprocess.run([sys.executable, '-c', LOADED_SCRIPT.format(modules=DEFERRED_MODULES)], cwd=ROOT,
+                                   env=environment, capture_output=True, text=True, check=True)
+    loaded = completed.stdout.split()
+    check('deferred imports', not loaded, f"imported at start-up: {', '.join(loaded)}" if loaded else
+          f"none of {', '.join(DEFERRED_MODULES)} imported at start-up")
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
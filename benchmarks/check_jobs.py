@@ -0,0 +1,138 @@
+# Check of the job run leases behind worker.py (models.job)
+# Races several workers, each on its own connection, for the same runs through claim_run
+# and checks that exactly one of them wins every run. Then checks that heartbeats keep a
+# lease from being taken over, that a lease whose heartbeat stops is taken over once it
+# expires (the old holder can neither renew nor finish it), and that a run whose leases
+# keep expiring is marked failed after JOB_MAX_ATTEMPTS.
+# Exits non-zero if any check fails.
+# Usage: python -m benchmarks.check_jobs
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+WORKERS = 8
+RACES = 20
+
+def main():
+    failures = []
+    def check(name, ok, detail):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}: {detail}")
+        if not ok:
+            failures.append(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'check.db')}"
+        from benchmarks import create_app
+        from extensions import db
+        from models.job import JobRun, claim_run, claimable_runs, finish_run, renew_lease, schedule_run
+        from worker import Heartbeat
+
+        app = create_app()
+        start = datetime.utcnow() - timedelta(hours=1)
+
+        def new_run(name, minutes=0):
+            with app.app_context():
+                schedule_run(name, start + timedelta(minutes=minutes))
+                db.session.commit()
+                return db.session.query(JobRun.id).filter(JobRun.name == name).order_by(JobRun.id.desc()).first()[0]
+
+        def run_row(run_id):
+            with app.app_context():
+                return db.session.query(JobRun.status, JobRun.lease_owner, JobRun.attempts).filter(JobRun.id == run_id).one()
+
+        def claim(run_id, owner, lease_seconds=300, max_attempts=3):
+            with app.app_context():
+                claimed = claim_run(run_id, owner, lease_seconds, max_attempts)
+                db.session.commit()
+                return claimed
+
+        # Race: every worker tries the same run at the same moment, each on its own connection
+        outcomes = []
+        for race in range(RACES):
+            run_id = new_run(f'race-{race}')
+            barrier = threading.Barrier(WORKERS)
+            winners, errors = [], []
+            def racer(owner):
+                with app.app_context():
+                    barrier.wait()
+                    try:
+                        if claim_run(run_id, owner, 300, 3):
+                            winners.append(owner)
+                        db.session.commit()
+                    except Exception as error:
+                        db.session.rollback()
+                        errors.append(repr(error))
+            threads = [threading.Thread(target=racer, args=(f'worker-{n}',)) for n in range(WORKERS)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            status, lease_owner, attempts = run_row(run_id)
+            outcomes.append(len(winners) == 1 and not errors and status == 'running'
+                            and lease_owner == winners[0] and attempts == 1)
+        check('one winner per race', all(outcomes),
+              f'{sum(outcomes)} of {RACES} races had exactly one winner among {WORKERS} workers')
+
+        # Two due runs of one job: only one of them may run at a time
+        first, second = new_run('overlap', 0), new_run('overlap', 1)
+        with app.app_context():
+            # The second schedule_run skipped the first; put it back as a late pending run
+            db.session.query(JobRun).filter(JobRun.id == first).update({'status': 'pending', 'finished_at': None})
+            db.session.commit()
+        claimed = (claim(first, 'worker-a'), claim(second, 'worker-b'))
+        check('one run of a job at a time', claimed == (True, False),
+              f'first run claimed: {claimed[0]}, second run claimed while the first holds its lease: {claimed[1]}')
+
+        # Heartbeat: renewed every third of the lease, so another worker never gets in
+        run_id = new_run('heartbeat')
+        claim(run_id, 'worker-a', lease_seconds=1)
+        heartbeat = Heartbeat(app, run_id, 'worker-a', 1)
+        heartbeat.start()
+        stolen = 0
+        deadline = time.monotonic() + 2.5
+        while time.monotonic() < deadline:
+            stolen += claim(run_id, 'worker-b', lease_seconds=1)
+            time.sleep(0.1)
+        heartbeat.stop()
+        status, lease_owner, _ = run_row(run_id)
+        check('heartbeat keeps the lease', stolen == 0 and not heartbeat.lost and lease_owner == 'worker-a',
+              f'{stolen} takeovers in 2.5s of a 1s lease, held by {lease_owner}')
+
+        # Takeover: the heartbeat stops (the worker died), the lease expires and another worker claims the run
+        time.sleep(1.2)
+        with app.app_context():
+            due = claimable_runs(3)
+        taken = claim(run_id, 'worker-b')
+        with app.app_context():
+            renewed = renew_lease(run_id, 'worker-a', 300)
+            finish_run(run_id, 'worker-a', 3)  # The old holder's outcome must not count
+            db.session.commit()
+        status, lease_owner, attempts = run_row(run_id)
+        check('expired lease taken over', run_id in due and taken and not renewed
+              and (status, lease_owner, attempts) == ('running', 'worker-b', 2),
+              f'claimable: {run_id in due}, taken: {taken}, old holder renewed: {renewed}; '
+              f'{status} by {lease_owner} on attempt {attempts}')
+
+        # Leases that keep expiring use up the attempts, then the run is failed
+        run_id = new_run('crashing')
+        claims = []
+        for attempt in range(3):
+            claims.append(claim(run_id, f'worker-{attempt}', lease_seconds=0, max_attempts=2))
+            time.sleep(0.05)
+        with app.app_context():
+            claimable_runs(2)
+            db.session.commit()
+        with app.app_context():
+            status, last_error = db.session.query(JobRun.status, JobRun.last_error).filter(JobRun.id == run_id).one()
+        check('failed after max attempts', claims == [True, True, False] and status == 'failed'
+              and last_error == 'Lease expired',
+              f'claims {claims}, then {status} ({last_error})')
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
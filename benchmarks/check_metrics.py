@@ -0,0 +1,125 @@
+# Check of the request and SQL accounting served at /metrics (utils.metrics)
+# Drives a few routes through the test client, then checks the Prometheus output: request
+# counters and latency histograms per endpoint, query counts that match what the engine
+# actually executed, job durations read from job_runs, the optional bearer token, and
+# the bookkeeping cost per request.
+# Exits non-zero if any check fails.
+# Usage: python -m benchmarks.check_metrics
+
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event as sa_event
+
+from benchmarks import sign_in
+
+def sample(text, name, **labels):
+    """Value of one sample line of a Prometheus text body, or None"""
+    for line in text.splitlines():
+        match = re.fullmatch(r'(\w+)(?:\{(.*)\})? (\S+)', line)
+        if not match or match.group(1) != name:
+            continue
+        found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2) or ''))
+        if all(found.get(key) == str(value) for key, value in labels.items()):
+            return float(match.group(3))
+    return None
+
+def time_requests(client, count=200):
+    started = time.perf_counter()
+    for _ in range(count):
+        client.get('/api/notifications')
+    return (time.perf_counter() - started) * 1000 / count
+
+def main():
+    failures = []
+    def check(name, ok, detail):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}: {detail}")
+        if not ok:
+            failures.append(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'check.db')}"
+        os.environ.pop('METRICS_TOKEN', None)
+        from benchmarks import create_app
+        from extensions import db
+        from models.job import JobRun
+        from models.user import User
+
+        app = create_app()
+        with app.app_context():
+            db.session.add(User('sam@example.com', 'Password123', 'teacher'))
+            now = datetime.utcnow()
+            db.session.add(JobRun(name='inbox_refresh_job', scheduled_for=now - timedelta(minutes=5), status='done',
+                                  attempts=1, started_at=now - timedelta(seconds=90), finished_at=now - timedelta(seconds=60)))
+            db.session.commit()
+            user_id = db.session.query(User.id).scalar()
+            engine = db.engine
+        client = app.test_client()
+        sign_in(app, client, user_id)
+
+        # Count what the engine really executes for one request, next to the recorded tally
+        executed = [0]
+        def count_query(*args):
+            executed[0] += 1
+        sa_event.listen(engine, 'before_cursor_execute', count_query)
+        client.get('/api/events?range=month&start=2030-01-01')
+        sa_event.remove(engine, 'before_cursor_execute', count_query)
+        client.get('/api/events?range=month&start=2030-01-01')
+        client.get('/no-such-page')
+
+        response = client.get('/metrics')
+        text = response.get_data(as_text=True)
+        check('prometheus text', response.status_code == 200 and response.content_type.startswith('text/plain; version=0.0.4'),
+              f'HTTP {response.status_code}, {response.content_type}')
+
+        requests_seen = sample(text, 'eventease_http_requests_total', endpoint='get_events', method='GET', status=200)
+        latency_count = sample(text, 'eventease_http_request_duration_seconds_count', endpoint='get_events', method='GET')
+        inf_bucket = sample(text, 'eventease_http_request_duration_seconds_bucket', endpoint='get_events', method='GET', le='+Inf')
+        check('request counter and histogram', requests_seen == 2 and latency_count == 2 and inf_bucket == 2,
+              f'{requests_seen} requests, {latency_count} observations, +Inf bucket {inf_bucket}')
+
+        queries_sum = sample(text, 'eventease_http_request_queries_sum', endpoint='get_events')
+        db_seconds = sample(text, 'eventease_http_request_db_seconds_sum', endpoint='get_events')
+        # The second request is served from the feed cache, so it runs fewer queries
+        check('queries per request', queries_sum is not None and executed[0] <= queries_sum < 2 * executed[0] and db_seconds > 0,
+              f'{executed[0]} executed by the first request, {queries_sum:.0f} recorded over both, {db_seconds * 1000:.2f} ms in SQL')
+
+        unmatched = sample(text, 'eventease_http_requests_total', endpoint='unmatched', method='GET', status=404)
+        check('unmatched URLs share a label', unmatched == 1, f'{unmatched} under endpoint="unmatched"')
+
+        job_seconds = sample(text, 'eventease_job_last_duration_seconds', job='inbox_refresh_job', status='done')
+        check('job duration from job_runs', job_seconds == 30, f'{job_seconds} seconds')
+
+        cache_misses = sample(text, 'eventease_feed_cache_misses_total')
+        stream = sample(text, 'eventease_stream_connections')
+        check('component counters', cache_misses is not None and cache_misses >= 1 and stream == 0,
+              f'{cache_misses} feed cache misses, {stream} stream connections')
+
+        app.config['METRICS_TOKEN'] = 'scrape-token'
+        denied = client.get('/metrics').status_code
+        allowed = client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'}).status_code
+        check('metrics token', denied == 401 and allowed == 200, f'HTTP {denied} without, {allowed} with the token')
+
+        # Overhead: the bookkeeping one request with three queries adds, next to a real request
+        enabled_ms = time_requests(client)
+        from utils import metrics
+        started = time.perf_counter()
+        for _ in range(10000):
+            metrics._current.tally = metrics._Tally()
+            for _ in range(3):
+                metrics._before_cursor_execute(None, None, None, None, None, False)
+                metrics._after_cursor_execute(None, None, None, None, None, False)
+            metrics.request_metrics.record('check', 'GET', 200, 0.01, 3, 0.001)
+        per_request_us = (time.perf_counter() - started) * 1e6 / 10000
+        metrics._current.tally = None
+        check('recording overhead', per_request_us < 50,
+              f'{per_request_us:.1f} µs of bookkeeping per request next to {enabled_ms:.2f} ms per request')
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
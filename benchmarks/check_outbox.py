@@ -0,0 +1,176 @@
+# Check of outbox email delivery (utils.email_utils.deliver_outbox)
+# Runs deliver_outbox against a local aiosmtpd server and checks that the workers reuse
+# one SMTP connection each, that OUTBOX_RATE_LIMIT holds, that rejected messages are
+# retried with exponential backoff and dead-lettered after OUTBOX_MAX_ATTEMPTS, that
+# dead or delivered messages are never sent again, and that a batch outlasting
+# OUTBOX_CLAIM_TIMEOUT_SECONDS keeps its claims while a second run starts. Finally
+# checks that prune_outbox deletes only sent and dead messages past OUTBOX_RETENTION_DAYS.
+# Exits non-zero if any check fails.
+# Usage: python -m benchmarks.check_outbox
+
+import contextlib
+import io
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+class RecordingHandler:
+    """aiosmtpd handler that records accepted messages per connection and rejects bounce@ recipients"""
+
+    def __init__(self):
+        self.delivered = []   # (connection, recipient)
+        self.rejected = 0
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('bounce@'):
+            self.rejected += 1
+            return '550 Mailbox unavailable'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.delivered.extend((id(session), recipient) for recipient in envelope.rcpt_tos)
+        return '250 Message accepted for delivery'
+
+def main():
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        sys.exit('aiosmtpd is required for this check: pip install aiosmtpd')
+
+    failures = []
+    def check(name, ok, detail):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}: {detail}")
+        if not ok:
+            failures.append(name)
+
+    # A free port for the SMTP server
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'check.db')}"
+            from benchmarks import create_app
+            from extensions import db
+            from models.outbox import OutboxMessage
+            from utils.email_utils import deliver_outbox, enqueue_emails, prune_outbox
+
+            app = create_app()
+            app.config.update(
+                MAIL_SERVER='127.0.0.1', MAIL_PORT=port,
+                MAIL_USE_TLS=False, MAIL_USE_SSL=False, MAIL_DEFAULT_SENDER='calendar@example.com',
+                OUTBOX_WORKERS=4, OUTBOX_MAX_ATTEMPTS=3, OUTBOX_BACKOFF_SECONDS=60, OUTBOX_MAX_BACKOFF_SECONDS=90
+            )
+
+            def queue(recipients):
+                with app.app_context():
+                    enqueue_emails((recipient, 'Reminder', 'Your event is coming up') for recipient in recipients)
+                    db.session.commit()
+
+            def deliver():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    return deliver_outbox(app)
+
+            def bounce_row():
+                with app.app_context():
+                    return db.session.query(OutboxMessage.status, OutboxMessage.attempts, OutboxMessage.next_attempt_at,
+                                            OutboxMessage.last_error).filter(OutboxMessage.recipient == 'bounce@example.com').one()
+
+            def make_due():
+                with app.app_context():
+                    OutboxMessage.query.filter(OutboxMessage.status == 'pending').update(
+                        {'next_attempt_at': datetime.utcnow()})
+                    db.session.commit()
+
+            # Connection reuse: 400 messages over 4 workers, one connection each
+            queue(f'student{i}@example.com' for i in range(400))
+            started = time.perf_counter()
+            sent, failed = deliver()
+            elapsed = time.perf_counter() - started
+            connections = len({connection for connection, _ in handler.delivered})
+            check('connection reuse', sent == 400 and failed == 0 and len(handler.delivered) == 400 and connections <= 4,
+                  f'{sent} sent over {connections} connections in {elapsed:.2f}s')
+
+            # Rate limit: a one-second burst, then OUTBOX_RATE_LIMIT per second
+            app.config['OUTBOX_RATE_LIMIT'] = 50
+            queue(f'teacher{i}@example.com' for i in range(100))
+            started = time.perf_counter()
+            sent, _ = deliver()
+            elapsed = time.perf_counter() - started
+            check('rate limit', sent == 100 and 0.9 <= elapsed < 3,
+                  f'{sent} sent in {elapsed:.2f}s at 50/s (at least 0.9s after the burst)')
+            app.config['OUTBOX_RATE_LIMIT'] = 0
+
+            # Backoff: a rejected message is retried after 60s, then 90s (capped from 120s)
+            queue(['bounce@example.com', 'parent@example.com'])
+            before = datetime.utcnow()
+            sent, failed = deliver()
+            status, attempts, first_retry, error = bounce_row()
+            first_delay = (first_retry - before).total_seconds()
+            again_sent, again_failed = deliver()  # Not due yet, so nothing is claimed
+            make_due()
+            before = datetime.utcnow()
+            deliver()
+            status_2, attempts_2, second_retry, _ = bounce_row()
+            second_delay = (second_retry - before).total_seconds()
+            check('backoff', sent == 1 and failed == 1 and status == status_2 == 'pending' and (attempts, attempts_2) == (1, 2)
+                  and 59 <= first_delay <= 61 and 89 <= second_delay <= 91 and (again_sent, again_failed) == (0, 0)
+                  and '550' in error,
+                  f'retry after {first_delay:.0f}s then {second_delay:.0f}s; early run sent {again_sent}, failed {again_failed}')
+
+            # Dead-lettering: the third failure is final and the message is never claimed again
+            make_due()
+            deliver()
+            status_3, attempts_3, _, _ = bounce_row()
+            rejected = handler.rejected
+            make_due()
+            after_dead = deliver()
+            with app.app_context():
+                counts = dict(db.session.query(OutboxMessage.status, db.func.count()).group_by(OutboxMessage.status).all())
+            check('dead letter', status_3 == 'dead' and attempts_3 == 3 and after_dead == (0, 0)
+                  and handler.rejected == rejected == 3 and counts == {'sent': 501, 'dead': 1}
+                  and len(handler.delivered) == 501,
+                  f'{status_3} after {attempts_3} attempts; {counts}, {len(handler.delivered)} messages received')
+
+            # Heartbeat: a 2s batch against a 1s claim timeout, with another run starting halfway
+            app.config.update(OUTBOX_RATE_LIMIT=50, OUTBOX_CLAIM_TIMEOUT_SECONDS=1)
+            queue(f'parent{i}@example.com' for i in range(150))
+            received = len(handler.delivered)
+            with contextlib.redirect_stdout(io.StringIO()):
+                first = threading.Thread(target=deliver_outbox, args=(app,))
+                first.start()
+                time.sleep(1.5)
+                overlapping = deliver_outbox(app)
+                first.join()
+            recipients = [recipient for _, recipient in handler.delivered[received:]]
+            check('claims kept alive', overlapping == (0, 0) and len(recipients) == len(set(recipients)) == 150,
+                  f'second run sent {overlapping[0]}; {len(recipients)} received, {len(set(recipients))} distinct')
+
+            # Retention: age the first 400 sent messages and the dead letter, keep a pending one
+            with app.app_context():
+                aged = datetime.utcnow() - timedelta(days=app.config['OUTBOX_RETENTION_DAYS'] + 1)
+                OutboxMessage.query.filter(OutboxMessage.recipient.like('student%')).update({'sent_at': aged})
+                OutboxMessage.query.filter(OutboxMessage.status == 'dead').update({'next_attempt_at': aged})
+                db.session.commit()
+            queue(['later@example.com'])
+            with contextlib.redirect_stdout(io.StringIO()):
+                pruned = prune_outbox(app)
+            with app.app_context():
+                counts = dict(db.session.query(OutboxMessage.status, db.func.count()).group_by(OutboxMessage.status).all())
+            check('retention', pruned == 401 and counts == {'sent': 251, 'pending': 1},
+                  f'{pruned} pruned, {counts} kept')
+    finally:
+        controller.stop()
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# Check of password hashing on the process pool (utils.password_hashing)
+# Checks that the pool processes are not forked from the (multi-threaded) web process, that
+# a stored hash made with other parameters is upgraded when the password is verified, that a
+# pool process that dies is replaced, and that PASSWORD_HASH_MAX_PENDING sheds a burst with
+# HashingBusy (HTTP 503 from /login) after PASSWORD_HASH_QUEUE_TIMEOUT instead of queueing it.
+# Exits non-zero if any check fails.
+# Usage: python -m benchmarks.check_password_hashing
+
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+# Cheap enough to keep the check quick, different enough to tell the hashes apart
+CURRENT_METHOD = 'pbkdf2:sha256:20000'
+OLD_METHOD = 'pbkdf2:sha256:1000'
+# Slow enough that a burst outlasts the queue timeout
+SLOW_METHOD = 'pbkdf2:sha256:600000'
+
+def main():
+    failures = []
+    def check(name, ok, detail):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}: {detail}")
+        if not ok:
+            failures.append(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'check.db')}"
+        from sqlalchemy import insert
+        from werkzeug.security import generate_password_hash
+        from benchmarks import create_app
+        from extensions import db
+        from models.user import User
+        from utils.password_hashing import HashingBusy, password_hasher
+
+        app = create_app()
+        app.config.update(PASSWORD_HASH_METHOD=CURRENT_METHOD, PASSWORD_HASH_WORKERS=1)
+        password_hasher.configure(app.config)
+        try:
+            # Forked children would inherit the locks other threads hold at that moment
+            parent = password_hasher._executor().submit(os.getppid).result()
+            check('pool not forked from the web process', parent != os.getpid(),
+                  f'pool process parent {parent}, web process {os.getpid()}')
+
+            old_hash = generate_password_hash('Password123', method=OLD_METHOD)
+            matches, new_hash = password_hasher.verify(old_hash, 'Password123')
+            wrong = password_hasher.verify(old_hash, 'Wrong123')
+            current = password_hasher.verify(new_hash, 'Password123') if new_hash else None
+            check('rehash on verify', matches and new_hash.startswith(CURRENT_METHOD + '$')
+                  and wrong == (False, None) and current == (True, None),
+                  f"old hash matched: {matches}, new method {(new_hash or '').split('$')[0]}, "
+                  f"wrong password {wrong}, new hash verified as {current}")
+
+            with app.app_context():
+                db.session.execute(insert(User), [{'email': 'old@example.com', 'role': 'student', 'password_hash': old_hash}])
+                db.session.commit()
+            status = app.test_client().post('/login', json={'email': 'old@example.com', 'password': 'Password123'}).status_code
+            with app.app_context():
+                stored = db.session.query(User.password_hash).filter(User.email == 'old@example.com').scalar()
+            check('rehash on login', status == 200 and stored.startswith(CURRENT_METHOD + '$'),
+                  f"HTTP {status}, stored hash now {stored.split('$')[0]}")
+
+            # A pool process killed mid-life (e.g. for memory) is replaced on the next hash
+            for process in list(password_hasher._executor()._processes.values()):
+                os.kill(process.pid, signal.SIGKILL)
+            time.sleep(0.2)
+            try:
+                recovered = password_hasher.hash('Password123').startswith(CURRENT_METHOD + '$')
+            except Exception as error:
+                recovered = repr(error)
+            check('dead pool process replaced', recovered is True, f'hash after SIGKILL: {recovered}')
+
+            # Queue limit: 2 hashes in flight, the rest give up after the queue timeout
+            app.config.update(PASSWORD_HASH_METHOD=SLOW_METHOD, PASSWORD_HASH_MAX_PENDING=2, PASSWORD_HASH_QUEUE_TIMEOUT=0.2)
+            password_hasher.configure(app.config)
+            password_hasher.hash('warm-up')  # Start the pool outside the burst
+            results = []
+            def attempt():
+                started = time.perf_counter()
+                try:
+                    password_hasher.hash('Password123')
+                    results.append(('ok', time.perf_counter() - started))
+                except HashingBusy:
+                    results.append(('busy', time.perf_counter() - started))
+            threads = [threading.Thread(target=attempt) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            ok = sum(1 for outcome, _ in results if outcome == 'ok')
+            busy_waits = [seconds for outcome, seconds in results if outcome == 'busy']
+            check('queue limit', ok >= 2 and len(busy_waits) >= 4 and max(busy_waits) < 0.5,
+                  f'{ok} hashed, {len(busy_waits)} shed after at most {max(busy_waits, default=0):.2f}s')
+
+            # The same burst against /login is shed with 503 and a Retry-After
+            with app.app_context():
+                db.session.execute(insert(User), [
+                    {'email': f'burst{n}@example.com', 'role': 'student',
+                     'password_hash': generate_password_hash('Password123', method=SLOW_METHOD)} for n in range(8)
+                ])
+                db.session.commit()
+            responses = []
+            def login(n):
+                response = app.test_client().post('/login', json={'email': f'burst{n}@example.com', 'password': 'Password123'})
+                responses.append((response.status_code, response.headers.get('Retry-After')))
+            threads = [threading.Thread(target=login, args=(n,)) for n in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            statuses = sorted(status for status, _ in responses)
+            shed = [retry for status, retry in responses if status == 503]
+            check('login burst shed', statuses.count(200) >= 2 and len(shed) >= 4 and set(shed) == {'2'}
+                  and set(statuses) <= {200, 503},
+                  f'{statuses.count(200)} signed in, {len(shed)} told to retry')
+        finally:
+            password_hasher.shutdown()
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
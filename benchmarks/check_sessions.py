@@ -0,0 +1,109 @@
+# Check of the sessions table and cached token validation (models.user_session)
+# Signs one user in on two devices through the real routes, then checks that tokens are
+# validated from the cache without queries, last_seen_at is written in one batch, logout
+# and password changes end the right sessions, and the sweeper purges expired rows.
+# Exits non-zero if any check fails.
+# Usage: python -m benchmarks.check_sessions
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event as sa_event
+
+def main():
+    failures = []
+    def check(name, ok, detail):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}: {detail}")
+        if not ok:
+            failures.append(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'check.db')}"
+        from benchmarks import create_app
+        from extensions import db
+        from models.user import User
+        from models.user_session import UserSession, last_seen_buffer, purge_expired_sessions, session_cache
+
+        app = create_app()
+        credentials = {'email': 'sam@example.com', 'password': 'Password123'}
+        laptop, phone = app.test_client(), app.test_client()
+        laptop.post('/register', json={**credentials, 'role': 'student'})
+        laptop.post('/logout')
+        with app.app_context():
+            user_row = db.session.query(User.id, User.password_hash, User.csrf_token).one()
+
+        for client, agent in ((laptop, 'Laptop'), (phone, 'Phone')):
+            client.post('/login', json=credentials, headers={'User-Agent': agent})
+        with app.app_context():
+            sessions = db.session.query(UserSession.user_agent).filter_by(user_id=user_row.id).all()
+            user_after = db.session.query(User.password_hash, User.csrf_token).one()
+        check('one session per device', sorted(agent for (agent,) in sessions) == ['Laptop', 'Phone'],
+              f'{len(sessions)} sessions')
+        check('login leaves the user row alone', tuple(user_after) == tuple(user_row[1:]), 'password hash and csrf token unchanged')
+
+        # Validated tokens come from the cache: a signed-in request runs no session query
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        with app.app_context():
+            engine = db.engine
+        sa_event.listen(engine, 'before_cursor_execute', record)
+        laptop.get('/api/notifications')
+        session_cache.clear()
+        statements.clear()
+        laptop.get('/api/notifications')
+        cold = sum('FROM sessions' in statement for statement in statements)
+        statements.clear()
+        started = time.perf_counter()
+        for _ in range(50):
+            laptop.get('/api/notifications')
+        warm_ms = (time.perf_counter() - started) * 1000 / 50
+        warm = sum('FROM sessions' in statement for statement in statements)
+        check('cached validation', cold == 1 and warm == 0,
+              f'{cold} session query cold, {warm} over 50 cached requests ({warm_ms:.1f} ms per request)')
+
+        # last_seen_at: nothing written per request, one UPDATE for all sessions when due
+        updates = sum(statement.startswith('UPDATE sessions') for statement in statements)
+        last_seen_buffer.interval = 0
+        statements.clear()
+        phone.get('/api/notifications')
+        batched = [statement for statement in statements if statement.startswith('UPDATE sessions')]
+        last_seen_buffer.interval = app.config['SESSION_LAST_SEEN_FLUSH_SECONDS']
+        check('last_seen batched', updates == 0 and len(batched) == 1,
+              f'{updates} writes over 50 requests, {len(batched)} batched UPDATE when due')
+        sa_event.remove(engine, 'before_cursor_execute', record)
+
+        # Logout ends only this device's session
+        phone.post('/logout')
+        laptop_status = laptop.get('/api/notifications').status_code
+        phone_status = phone.get('/api/notifications').status_code
+        check('logout is per device', laptop_status == 200 and phone_status == 401,
+              f'laptop HTTP {laptop_status}, phone HTTP {phone_status}')
+
+        # A password change signs out every other device at once, despite the cache
+        phone.post('/login', json=credentials)
+        phone.get('/api/notifications')  # Cached as valid
+        laptop.post('/profile/change-password', data={
+            'current_password': 'Password123', 'new_password': 'Password456', 'confirm_password': 'Password456'
+        })
+        laptop_status = laptop.get('/api/notifications').status_code
+        phone_status = phone.get('/api/notifications').status_code
+        check('password change revokes other devices', laptop_status == 200 and phone_status == 401,
+              f'laptop HTTP {laptop_status}, phone HTTP {phone_status}')
+
+        # The sweeper purges what has expired
+        with app.app_context():
+            db.session.query(UserSession).update({UserSession.expires_at: datetime.utcnow() - timedelta(minutes=1)})
+            db.session.commit()
+        session_cache.clear()
+        expired_status = laptop.get('/api/notifications').status_code
+        purged = purge_expired_sessions(app)
+        check('expired sessions', expired_status == 401 and purged == 1, f'HTTP {expired_status}, {purged} purged')
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# Check of the opt-in slow query log (utils.slow_query_log)
+# Seeds a calendar with benchmarks.generator, turns the log on with a 0 ms threshold so
+# every statement counts as slow, and checks that log lines carry the route, redacted
+# parameters and a query plan, that the rate limit holds, that job statements name
+# their job, and that /admin/slow-queries is admin-only and ranks by total time.
+# Exits non-zero if any check fails.
+# Usage: python -m benchmarks.check_slow_queries
+
+import contextlib
+import io
+import logging
+import os
+import sys
+import tempfile
+from datetime import date
+
+from benchmarks import sign_in
+from benchmarks.generator import generate
+
+class Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+def main():
+    failures = []
+    def check(name, ok, detail):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}: {detail}")
+        if not ok:
+            failures.append(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'check.db')}"
+        os.environ['SLOW_QUERY_LOG_MS'] = '0'
+        from benchmarks import create_app
+        from models.notifications import send_event_reminders
+        from utils.slow_query_log import query_origin, slow_query_log
+
+        app = create_app()
+        with contextlib.redirect_stdout(io.StringIO()):
+            dataset = generate(app, 'small')
+        capture = Capture()
+        slow_query_log.logger.addHandler(capture)
+        slow_query_log.logger.propagate = False  # Keep the flood of 0 ms lines off stderr
+        slow_query_log.configure({**app.config, 'SLOW_QUERY_LOG_PER_MINUTE': 1000})
+
+        student = app.test_client()
+        sign_in(app, student, dataset['student_id'])
+        student.get(f"/api/events?range=month&start={date.today().replace(day=1).isoformat()}")
+        feed_lines = [message for message in capture.messages if 'from GET get_events' in message]
+        check('route attribution', bool(feed_lines), f'{len(feed_lines)} statements logged for GET get_events')
+        with_plan = [message for message in feed_lines if '  plan:' in message and ('SEARCH' in message or 'SCAN' in message)]
+        check('query plan captured', len(with_plan) == len([m for m in feed_lines if m.split(': ', 1)[1].startswith('SELECT')]),
+              f'{len(with_plan)} of the logged SELECTs carry an EXPLAIN QUERY PLAN')
+        leaked = [message for message in feed_lines if 'year-' in message.split('parameters:', 1)[1]]
+        check('parameters redacted', not leaked and any('<str len=' in message for message in feed_lines),
+              f'{len(leaked)} lines with a raw tag value')
+
+        # Statements of a job carry its name
+        capture.messages.clear()
+        with query_origin('job daily_notification_job'), contextlib.redirect_stdout(io.StringIO()):
+            send_event_reminders(app)
+        job_lines = [message for message in capture.messages if 'from job daily_notification_job' in message]
+        check('job attribution', len(job_lines) == len(capture.messages) > 0, f'{len(job_lines)} of {len(capture.messages)} lines')
+
+        # Rate limit: at most SLOW_QUERY_LOG_PER_MINUTE lines, the rest only counted
+        slow_query_log.configure({**app.config, 'SLOW_QUERY_LOG_PER_MINUTE': 3})
+        capture.messages.clear()
+        for _ in range(5):
+            student.get('/api/notifications')
+        summarised = sum(entry['count'] for entry in slow_query_log.top(200))
+        check('rate limit', len(capture.messages) == 3 and summarised > 3,
+              f'{len(capture.messages)} lines logged, {summarised} statements summarised')
+
+        admin = app.test_client()
+        sign_in(app, admin, 201)  # Every 200th user after the first is an admin
+        forbidden = student.get('/admin/slow-queries').status_code
+        response = admin.get('/admin/slow-queries?limit=5')
+        statements = response.get_json()['statements']
+        ranked = [entry['total_ms'] for entry in statements] == sorted((entry['total_ms'] for entry in statements), reverse=True)
+        check('admin summary', forbidden == 403 and response.status_code == 200 and len(statements) == 5 and ranked,
+              f'HTTP {forbidden} for a student, {response.status_code} for an admin, top statement '
+              f"{statements[0]['count']}x {statements[0]['total_ms']:.1f} ms total" if statements else 'no statements')
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+# Check of the summariser client (utils.summariser) against a local stub of the Gemini API
+# Starts a threaded HTTP server that plays both the OAuth token endpoint and generateContent,
+# then checks token caching, connection reuse, timeouts, the concurrency cap, the
+# /api/summarise error mapping and the stored summary cache with pre-generation, which
+# must not keep a database transaction open while the model is called.
+# Exits non-zero if any check fails.
+# Usage: python -m benchmarks.check_summariser
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks import sign_in
+
+class StubState:
+    """What the stub server has seen, and how it should behave"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.token_requests = 0
+        self.generate_requests = 0
+        self.connections = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = 0.0
+        self.expires_in = 3600
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so connection reuse is observable
+
+    def do_POST(self):
+        state = self.server.state
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path == '/token':
+            with state.lock:
+                state.token_requests += 1
+                token = f'token-{state.token_requests}'
+            self._reply({'access_token': token, 'expires_in': state.expires_in, 'token_type': 'Bearer'})
+            return
+
+        with state.lock:
+            state.generate_requests += 1
+            state.connections.add(self.client_address)
+            state.in_flight += 1
+            state.max_in_flight = max(state.max_in_flight, state.in_flight)
+        try:
+            time.sleep(state.delay)
+            self._reply({'candidates': [{'content': {'parts': [{'text': '**Summary**'}]}}]})
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up (timeout check)
+
+    def log_message(self, *args):
+        pass
+
+def write_key_file(path, token_uri):
+    """Write a throwaway service-account key whose token endpoint is the stub"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    with open(path, 'w') as f:
+        json.dump({
+            'type': 'service_account', 'project_id': 'stub', 'private_key_id': 'stub',
+            'private_key': pem.decode(), 'client_email': 'stub@stub.iam.gserviceaccount.com',
+            'client_id': '1', 'token_uri': token_uri
+        }, f)
+
+def check_pregeneration(app, client, state, check):
+    """Pre-generate summaries for upcoming events, then open a popup the way dashboard.js does"""
+    from datetime import datetime, timedelta
+    from extensions import db
+    from models.event import Event
+    from models.summary import EventSummary, evict_summaries, pregenerate_summaries
+    from models.user import User
+
+    with app.app_context():
+        teacher = User(email='teacher@example.com', password='Password123!', role='teacher')
+        db.session.add(teacher)
+        db.session.flush()
+        start = datetime.utcnow().replace(hour=9, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        db.session.add_all([
+            Event(title='Assembly', description='Bring a pen', start_time=start, end_time=start + timedelta(hours=1),
+                  creator_id=teacher.id, tags='public'),
+            Event(title='Far away', description='', start_time=start + timedelta(days=30),
+                  end_time=start + timedelta(days=30, hours=1), creator_id=teacher.id, tags='public'),
+            Event(title='Practice', description='Weekly', start_time=start, end_time=start + timedelta(hours=1),
+                  creator_id=teacher.id, tags='public', is_recurring=True, recurrence_unit='weekly',
+                  recurrence_interval=1, recurrence_until=(start + timedelta(days=60)).date(),
+                  recurrence_group_id='practice')
+        ])
+        db.session.commit()
+        teacher_id = teacher.id
+        series_id = db.session.query(Event.id).filter_by(title='Practice').scalar()
+
+    state.generate_requests = 0
+    generated = pregenerate_summaries(app)
+    # Assembly plus one or two Practice occurrences in the next 7 days; nothing 30 days out
+    check('pre-generated', generated in (2, 3) and state.generate_requests == generated,
+          f'{generated} summaries, {state.generate_requests} upstream calls')
+    state.generate_requests = 0
+    pregenerate_summaries(app)
+    check('pre-generation idempotent', state.generate_requests == 0, f'{state.generate_requests} upstream calls on rerun')
+
+    # The popup fetches the occurrence and posts it unchanged
+    sign_in(app, client, teacher_id)
+    event_data = client.get(f"/api/event/{series_id}?date={start.date().isoformat()}").get_json()
+    response = client.post('/api/summarise', json=event_data)
+    check('popup served from pre-generated', response.status_code == 200 and state.generate_requests == 0,
+          f'HTTP {response.status_code}, {state.generate_requests} upstream calls')
+
+    with app.app_context():
+        app.config['SUMMARY_CACHE_MAX_ROWS'] = 2
+        evict_summaries()
+        remaining = db.session.query(EventSummary).count()
+    check('LRU eviction', remaining == 2, f'{remaining} summaries left with SUMMARY_CACHE_MAX_ROWS=2')
+
+def main():
+    from utils.summariser import (
+        SUMMARISER_DEFAULTS, SummariserBusy, SummariserTimeout, summariser
+    )
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.state = state = StubState()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+
+    failures = []
+    def check(name, ok, detail):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}: {detail}")
+        if not ok:
+            failures.append(name)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        key_file = os.path.join(tmp, 'key.json')
+        write_key_file(key_file, f'{base}/token')
+        config = {**SUMMARISER_DEFAULTS, 'SUMMARISER_KEY_FILE': key_file, 'SUMMARISER_URL': f'{base}/generate'}
+
+        # Sequential calls share one token and one keep-alive connection
+        summariser.configure(config)
+        started = time.perf_counter()
+        for _ in range(20):
+            summariser.generate('prompt')
+        elapsed = (time.perf_counter() - started) * 1000
+        check('token cached', state.token_requests == 1, f'{state.token_requests} token request(s) for 20 calls')
+        check('connection reused', len(state.connections) == 1,
+              f'{len(state.connections)} connection(s) for 20 calls, {elapsed / 20:.1f} ms per call')
+
+        # A token inside the refresh margin is refreshed before use
+        summariser.configure({**config, 'SUMMARISER_TOKEN_MARGIN_SECONDS': 3600})
+        state.token_requests = 0
+        state.expires_in = 600
+        summariser.generate('prompt')
+        summariser.generate('prompt')
+        check('token refreshed near expiry', state.token_requests == 2, f'{state.token_requests} token requests for 2 calls')
+        state.expires_in = 3600
+
+        # A slow upstream holds at most SUMMARISER_MAX_CONCURRENT slots; the rest give up quickly
+        summariser.configure({**config, 'SUMMARISER_MAX_CONCURRENT': 4, 'SUMMARISER_QUEUE_TIMEOUT': 0.2})
+        state.delay = 0.5
+        state.max_in_flight = 0
+        outcomes = []
+        def call():
+            try:
+                summariser.generate('prompt')
+                outcomes.append('ok')
+            except SummariserBusy:
+                outcomes.append('busy')
+        threads = [threading.Thread(target=call) for _ in range(12)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        check('concurrency capped', state.max_in_flight <= 4 and outcomes.count('busy') > 0,
+              f'{state.max_in_flight} in flight at most, {outcomes.count("ok")} ok / {outcomes.count("busy")} busy in {elapsed:.2f}s')
+
+        # Reads that outlast the read timeout fail fast instead of pinning the thread
+        summariser.configure({**config, 'SUMMARISER_READ_TIMEOUT': 0.3})
+        state.delay = 2
+        started = time.perf_counter()
+        try:
+            summariser.generate('prompt')
+            timed_out = False
+        except SummariserTimeout:
+            timed_out = True
+        elapsed = time.perf_counter() - started
+        check('read timeout', timed_out and elapsed < 1.5, f'gave up after {elapsed:.2f}s')
+        state.delay = 0
+
+        # The route maps the client's errors onto HTTP statuses
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'check.db')}"
+        from benchmarks import create_app
+        app = create_app()
+        summariser.configure(config)
+        client = app.test_client()
+        event = {'title': 'Excursion', 'description': 'Bring a hat, water', 'start_time': '09:00', 'end_time': '15:00'}
+        response = client.post('/api/summarise', json=event)
+        check('route ok', response.status_code == 200 and response.get_json().get('summary') == '**Summary**',
+              f'HTTP {response.status_code}')
+
+        summariser.configure({**config, 'SUMMARISER_MAX_CONCURRENT': 1, 'SUMMARISER_QUEUE_TIMEOUT': 0.05})
+        summariser.slots.acquire()  # Another request holds the only slot
+        response = client.post('/api/summarise', json={**event, 'title': 'Busy'})
+        summariser.slots.release()
+        check('route busy', response.status_code == 503 and response.headers.get('Retry-After') == '5',
+              f'HTTP {response.status_code}')
+
+        summariser.configure({**config, 'SUMMARISER_READ_TIMEOUT': 0.3})
+        state.delay = 2
+        response = client.post('/api/summarise', json={**event, 'title': 'Slow'})
+        check('route timeout', response.status_code == 504, f'HTTP {response.status_code}')
+        state.delay = 0
+
+        # Repeat requests for the same event text are served from event_summaries
+        summariser.configure(config)
+        state.generate_requests = 0
+        for _ in range(5):
+            response = client.post('/api/summarise', json=event)
+        check('summary cached', response.status_code == 200 and state.generate_requests == 0,
+              f'{state.generate_requests} upstream calls for 5 repeat requests')
+
+        # A miss reads the cache, then calls the model without holding a transaction open
+        from extensions import db
+        generate, open_transactions = summariser.generate, []
+        def watched(prompt):
+            open_transactions.append(db.session().in_transaction())
+            return generate(prompt)
+        summariser.generate = watched
+        response = client.post('/api/summarise', json={**event, 'title': 'Uncached'})
+        del summariser.generate
+        check('no transaction during the call', response.status_code == 200 and open_transactions == [False],
+              f'HTTP {response.status_code}, transaction open during the upstream call: {open_transactions}')
+
+        check_pregeneration(app, client, state, check)
+
+    server.shutdown()
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# Compare two results files written by benchmarks.suite, e.g. from the base and head of a branch
+# A case regresses when its median time grows by more than --threshold, or when it runs
+# more queries than before (query counts do not depend on the machine, so any increase counts).
+# Exits non-zero if any case regressed.
+# Usage: python -m benchmarks.compare base.json head.json [--threshold 0.15]
+
+import argparse
+import json
+import sys
+
+from benchmarks.suite import SCHEMA_VERSION
+
+def load(path):
+    """Results of a file keyed by (scale, case)"""
+    with open(path) as handle:
+        report = json.load(handle)
+    if report.get('schema') != SCHEMA_VERSION:
+        sys.exit(f"{path}: results schema {report.get('schema')}, expected {SCHEMA_VERSION}")
+    return report, {(result['scale'], result['case']): result for result in report['results']}
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark results files')
+    parser.add_argument('base')
+    parser.add_argument('head')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed relative growth of the median (0.15 = 15%%)')
+    args = parser.parse_args()
+
+    base_report, base = load(args.base)
+    head_report, head = load(args.head)
+    print(f"base {base_report['commit']} ({base_report['created_at']}), head {head_report['commit']} ({head_report['created_at']})")
+    for scale in sorted(set(base_report['datasets']) & set(head_report['datasets'])):
+        if base_report['datasets'][scale] != head_report['datasets'][scale]:
+            print(f"warning: the {scale} datasets differ (seed or generator changed), timings may not be comparable")
+
+    regressions = []
+    print(f"{'scale':>7} {'case':<24} {'base ms':>9} {'head ms':>9} {'change':>8} {'queries':>9}")
+    for key in sorted(base.keys() & head.keys()):
+        before, after = base[key], head[key]
+        change = after['median_ms'] / before['median_ms'] - 1 if before['median_ms'] else 0.0
+        slower = change > args.threshold
+        more_queries = after['queries'] > before['queries']
+        flag = '  REGRESSION' if slower or more_queries else ''
+        if flag:
+            regressions.append(key)
+        print(f"{key[0]:>7} {key[1]:<24} {before['median_ms']:>9.1f} {after['median_ms']:>9.1f} {change:>+8.0%}"
+              f" {before['queries']:>4}->{after['queries']:<4}{flag}")
+    for key in sorted(base.keys() ^ head.keys()):
+        print(f"{key[0]:>7} {key[1]:<24} only in {'base' if key in base else 'head'}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
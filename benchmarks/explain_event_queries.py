@@ -0,0 +1,112 @@
+# Query-plan check for the time-range queries on events
+# Seeds a temporary database, runs EXPLAIN QUERY PLAN on the feed, notification and
+# reminder queries and fails if any of them scans the events table (or every event before
+# the window) instead of using a two-sided index range
+# Usage: python -m benchmarks.explain_event_queries [--events 20000]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import event as sa_event, insert, or_
+
+WINDOW_START = datetime(2030, 3, 1)
+
+def seed(db, events, rng):
+    """Insert `events` events spread over four years, one in fifty a weekly series"""
+    from models.event import Event
+
+    rows = []
+    for event_id in range(1, events + 1):
+        start = WINDOW_START - timedelta(days=730) + timedelta(hours=rng.randint(0, 24 * 365 * 4))
+        is_series = event_id % 50 == 0
+        rows.append({
+            'id': event_id, 'title': f'Event {event_id}', 'priority': rng.randint(0, 2), 'tags': 'year-12',
+            'start_time': start, 'end_time': start + timedelta(hours=rng.choice([1, 2, 30])),
+            'is_recurring': is_series, 'notifications_silenced': False, 'creator_id': 1,
+            'recurrence_unit': 'weekly' if is_series else None, 'recurrence_interval': 1 if is_series else None,
+            'recurrence_until': (start + timedelta(days=90)).date() if is_series else None
+        })
+    db.session.execute(insert(Event), rows)
+    db.session.commit()
+
+def explain(db, query):
+    """
+    Run an ORM query and return {sql: plan lines} for every statement it executed
+    Capturing the statements as sent to SQLite means expanded IN lists and the
+    longest-span lookup done by window_filter() are explained too
+    """
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    sa_event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        query.all()
+    finally:
+        sa_event.remove(db.engine, 'before_cursor_execute', capture)
+
+    connection = db.session.connection()
+    return {
+        statement: [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        for statement, parameters in statements
+    }
+
+def is_scan(line):
+    """True for a plan line that reads the whole table or an open-ended start_time range"""
+    if line.startswith('SCAN events'):
+        return True
+    return line.startswith('SEARCH events') and 'start_time<?' in line and 'start_time>?' not in line
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that event time-range queries use an index')
+    parser.add_argument('--events', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'explain.db')}"
+        from benchmarks import create_app
+        from extensions import db
+        from models.event import Event, feed_query
+        from models.user import User
+        from models.recurrence import window_filter
+        from models.notifications import reminder_candidates_query
+
+        app = create_app()
+        with app.app_context():
+            seed(db, args.events, random.Random(42))
+            # As the migration that adds the indexes does
+            db.session.execute(db.text('ANALYZE events'))
+
+            window_end = WINDOW_START + timedelta(days=31)
+            queries = {
+                'feed (month)': feed_query().filter(window_filter(WINDOW_START, window_end)),
+                'feed (teacher)': feed_query().filter(
+                    or_(User.role == None, User.role != 'student'),
+                    window_filter(WINDOW_START, window_end)
+                ),
+                'notifications': Event.query.filter(
+                    window_filter(WINDOW_START, WINDOW_START + timedelta(days=7)),
+                    Event.notifications_silenced == False
+                ),
+                'reminders': reminder_candidates_query(WINDOW_START, WINDOW_START + timedelta(days=8)),
+            }
+
+            failures = 0
+            for name, query in queries.items():
+                plans = explain(db, query)
+                scans = [line for plan in plans.values() for line in plan if is_scan(line)]
+                failures += bool(scans)
+                print(f"{'FAIL' if scans else 'ok':<5}{name}")
+                for plan in plans.values():
+                    for line in plan:
+                        print(f"       {line}")
+            db.engine.dispose()
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
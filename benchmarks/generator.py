@@ -0,0 +1,166 @@
+# Seeded generator of a synthetic school calendar for the benchmark suite
+# Builds users with a mix of roles and tags, single events, recurring series with
+# exceptions (cancelled, moved and retagged occurrences), past notification history and
+# the materialised inboxes, all with Core inserts so seeding costs no password hashing.
+# Dates are relative to today, so the reminder and inbox windows always have data in them.
+# The same scale and seed always produce the same rows.
+
+import random
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+
+# Sizes of the generated calendar; every other count is derived from these
+SCALES = {
+    'small': {'users': 500, 'events': 1000},
+    'medium': {'users': 2000, 'events': 4000},
+    'large': {'users': 5000, 'events': 10000}
+}
+
+SERIES_SHARE = 0.2          # Fraction of events that are series masters
+EXCEPTIONS_PER_SERIES = 3   # Cancelled, moved and retagged occurrences per series
+HISTORY_PER_USER = 6        # Past reminders per user, plus some already sent for upcoming events
+PAST_DAYS = 30              # Events start this many days back...
+FUTURE_DAYS = 60            # ...up to this many days ahead
+
+def _tags_for_event(rng, year_tags, class_tags):
+    # Mostly class events, some year-group and school-wide ones, the rest personal
+    roll = rng.random()
+    if roll < 0.02:
+        return 'public'
+    if roll < 0.15:
+        return rng.choice(year_tags)
+    if roll < 0.85:
+        return rng.choice(class_tags)
+    return ''
+
+def generate(app, scale='small', seed=42):
+    """
+    Fill the app's (empty) database with a synthetic school calendar
+
+    Args:
+        app: Flask application whose database is filled
+        scale: Key of SCALES
+        seed: Seed of the random generator
+
+    Returns:
+        Dict with the row counts per table and the IDs of a representative
+        student and teacher ('student_id', 'teacher_id')
+    """
+    from extensions import db
+    from models.event import Event
+    from models.event_exceptions import EventExceptions
+    from models.inbox import refresh_inbox
+    from models.notifications import Notification
+    from models.tags import EventTag, UserTag
+    from models.user import User
+
+    rng = random.Random(seed)
+    users, events = SCALES[scale]['users'], SCALES[scale]['events']
+    today = date.today()
+    year_tags = [f'year-{n}' for n in range(7, 13)]
+    class_tags = [f'class-{n}' for n in range(max(users // 10, 1))]  # About 40 students per class
+
+    # Users: one in 20 is a teacher and one in 200 an admin; user 1 is always a student
+    # and user 2 a teacher so the cases have the same subjects at every scale
+    user_rows, user_tag_rows = [], []
+    teacher_ids = []
+    for user_id in range(1, users + 1):
+        if user_id == 2 or (user_id > 2 and user_id % 20 == 0):
+            role = 'teacher'
+            teacher_ids.append(user_id)
+            profile = rng.sample(class_tags, min(2, len(class_tags)))
+        elif user_id > 2 and user_id % 200 == 1:
+            role, profile = 'admin', []
+        else:
+            role = 'student'
+            profile = [rng.choice(year_tags), *rng.sample(class_tags, min(4, len(class_tags)))]
+        user_rows.append({'id': user_id, 'email': f'user{user_id}@example.com', 'password_hash': 'x',
+                          'role': role, 'profile_tags': ','.join(profile) or None})
+        user_tag_rows.extend({'user_id': user_id, 'tag': tag} for tag in {'public', role, *profile})
+
+    event_rows, event_tag_rows, exception_rows = [], [], []
+    series_count = int(events * SERIES_SHARE)
+    for event_id in range(1, events + 1):
+        tags = _tags_for_event(rng, year_tags, class_tags)
+        is_series = event_id <= series_count
+        creator_id = rng.choice(teacher_ids) if is_series or rng.random() < 0.7 else rng.randint(1, users)
+        day = today + timedelta(days=rng.randint(-PAST_DAYS, FUTURE_DAYS))
+        start = datetime.combine(day, datetime.min.time()) + timedelta(hours=rng.randint(8, 16))
+        row = {
+            'id': event_id, 'title': f'Event {event_id}', 'description': 'Synthetic event', 'priority': rng.randint(0, 2),
+            'tags': tags, 'start_time': start, 'end_time': start + timedelta(hours=1), 'is_recurring': False,
+            'notifications_silenced': rng.random() < 0.02, 'creator_id': creator_id,
+            'recurrence_group_id': None, 'recurrence_unit': None, 'recurrence_interval': None,
+            'recurrence_weekdays': None, 'recurrence_until': None
+        }
+        event_tags = set(tags.split(',')) if tags else set()
+
+        if is_series:
+            # Lessons and clubs: weekly (some on two weekdays) or daily, started before
+            # today and running a term ahead. A series starts on a Monday so every
+            # start + 7k is an occurrence, whatever its weekdays.
+            monday = today - timedelta(days=today.weekday() + 7 * rng.randint(1, 8))
+            start = datetime.combine(monday, start.time())
+            unit = 'daily' if rng.random() < 0.1 else 'weekly'
+            interval = 1 if unit == 'daily' else rng.choice((1, 1, 2))
+            row.update(
+                start_time=start, end_time=start + timedelta(hours=1), is_recurring=True,
+                recurrence_group_id=f'series-{event_id}', recurrence_unit=unit, recurrence_interval=interval,
+                recurrence_weekdays=rng.choice((None, 'MO,WE', 'MO,TH')) if unit == 'weekly' else None,
+                recurrence_until=today + timedelta(days=rng.randint(30, 120))
+            )
+            step = 7 * interval if unit == 'weekly' else 1
+            last = (row['recurrence_until'] - start.date()).days // step
+            for k in rng.sample(range(1, last + 1), min(EXCEPTIONS_PER_SERIES, last)):
+                occurrence = start + timedelta(days=k * step)
+                kind = rng.choice(('cancelled', 'moved', 'retagged'))
+                exception = {'original_event_id': event_id, 'exception_date': occurrence.date(),
+                             'title': None, 'description': None, 'priority': None, 'tags': None,
+                             'start_time': None, 'end_time': None}
+                if kind != 'cancelled':
+                    moved = occurrence + timedelta(hours=2 if kind == 'moved' else 0)
+                    exception.update(title=row['title'], description=row['description'], priority=row['priority'],
+                                     tags=rng.choice(class_tags) if kind == 'retagged' else tags,
+                                     start_time=moved, end_time=moved + timedelta(hours=1))
+                    # event_tags also indexes the tags of exceptions
+                    if exception['tags']:
+                        event_tags.add(exception['tags'])
+                exception_rows.append(exception)
+
+        event_rows.append(row)
+        event_tag_rows.extend({'event_id': event_id, 'tag': tag} for tag in event_tags)
+
+    # Notification history: reminders sent for past single events, plus reminders already
+    # sent today for upcoming ones, which the reminder run has to recognise and skip
+    single_events = [row for row in event_rows if not row['is_recurring']]
+    past_events = [row for row in single_events if row['start_time'].date() < today]
+    upcoming = [row for row in single_events if 1 <= (row['start_time'].date() - today).days <= 7]
+    notification_rows = []
+    for user_id in range(1, users + 1):
+        for n in range(HISTORY_PER_USER):
+            already_sent = n == 0 and bool(upcoming)
+            event = rng.choice(upcoming if already_sent else past_events)
+            days_before = (event['start_time'].date() - today).days if already_sent else rng.choice((1, 2, 7))
+            notification_rows.append({
+                'user_id': user_id, 'event_id': event['id'], 'days_before': days_before,
+                'occurrence_date': event['start_time'].date(), 'type': 'email',
+                'message': f"Reminder: {event['title']}",
+                'created_at': event['start_time'] - timedelta(days=days_before)
+            })
+
+    with app.app_context():
+        for model, rows in ((User, user_rows), (UserTag, user_tag_rows), (Event, event_rows),
+                            (EventTag, event_tag_rows), (EventExceptions, exception_rows),
+                            (Notification, notification_rows)):
+            if rows:
+                db.session.execute(insert(model), rows)
+        db.session.commit()
+    # Materialise the inboxes as the worker would after a deploy
+    refresh_inbox(app, full=True)
+
+    return {
+        'users': len(user_rows), 'user_tags': len(user_tag_rows), 'events': len(event_rows),
+        'series': series_count, 'exceptions': len(exception_rows), 'notifications': len(notification_rows),
+        'student_id': 1, 'teacher_id': 2
+    }
@@ -0,0 +1,192 @@
+# Benchmark suite for the paths that grow with the data
+# For each scale, generates a synthetic school calendar (benchmarks.generator) in a
+# throwaway SQLite database and times:
+# - get_events.student / get_events.teacher: a month of /api/events with the feed cache cleared
+# - create_event.recurring: POST /event/create of a weekly series running for a term
+# - send_event_reminders: one reminder run, with the reminders it queued removed between runs
+# - api_notifications: the first page of /api/notifications
+# Each case runs once to warm up and is then timed --repeats times; the median, p95, fastest
+# run and the queries per run are printed and, with --output, written as JSON that
+# benchmarks.compare can check against the results of another commit.
+# Usage: python -m benchmarks.suite [--scales small,medium] [--repeats 7] [--output results.json]
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event as sa_event
+
+from benchmarks import sign_in
+from benchmarks.generator import SCALES, generate
+
+# Bumped when the layout of the results file changes
+SCHEMA_VERSION = 1
+
+def _get_events(client):
+    from utils.feed_cache import feed_cache
+
+    month_start = date.today().replace(day=1).isoformat()
+    def before():
+        feed_cache.clear()
+    def run():
+        response = client.get(f'/api/events?range=month&start={month_start}')
+        assert response.status_code == 200, response.status_code
+    return before, run
+
+def _create_recurring(client):
+    first = date.today() + timedelta(days=1)
+    payload = {
+        'title': 'Benchmark club', 'description': 'Weekly club', 'event_type': 'recurring', 'tags': 'year-12',
+        'start_time': f'{first.isoformat()}T15:30:00', 'end_time': f'{first.isoformat()}T16:30:00',
+        'rec_start_date': first.isoformat(), 'rec_ends': (first + timedelta(days=90)).isoformat(),
+        'rec_interval': 1, 'rec_unit': 'weekly', 'rec_weekdays': ['MO', 'WE']
+    }
+    def run():
+        response = client.post('/event/create', json=payload)
+        assert response.status_code == 200, response.get_json()
+    return None, run
+
+def _send_reminders(app):
+    from extensions import db
+    from models.notifications import Notification, send_event_reminders
+    from models.outbox import OutboxMessage
+
+    with app.app_context():
+        baseline = {model: db.session.query(db.func.max(model.id)).scalar() or 0
+                    for model in (Notification, OutboxMessage)}
+    def before():
+        # Forget what the previous run queued so every run does the same work
+        with app.app_context():
+            for model, last_id in baseline.items():
+                db.session.query(model).filter(model.id > last_id).delete()
+            db.session.commit()
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            send_event_reminders(app)
+    return before, run
+
+def _api_notifications(client):
+    def run():
+        response = client.get('/api/notifications')
+        assert response.status_code == 200, response.status_code
+    return None, run
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def run_scale(scale, repeats, seed):
+    """
+    Generate the calendar for a scale and time every case on it
+
+    Returns:
+        (dataset row counts, [result dicts])
+    """
+    from benchmarks import create_app
+    from auth.identity import identity_cache
+    from extensions import db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app = create_app()
+        identity_cache.clear()
+        with contextlib.redirect_stdout(io.StringIO()):
+            dataset = generate(app, scale, seed)
+
+        student, teacher = app.test_client(), app.test_client()
+        sign_in(app, student, dataset['student_id'])
+        sign_in(app, teacher, dataset['teacher_id'])
+        cases = [
+            ('get_events.student', _get_events(student)),
+            ('get_events.teacher', _get_events(teacher)),
+            ('create_event.recurring', _create_recurring(teacher)),
+            ('send_event_reminders', _send_reminders(app)),
+            ('api_notifications', _api_notifications(student))
+        ]
+
+        with app.app_context():
+            engine = db.engine
+        query_count = [0]
+        def count_query(*args):
+            query_count[0] += 1
+        sa_event.listen(engine, 'before_cursor_execute', count_query)
+
+        results = []
+        for name, (before, run) in cases:
+            timings, queries = [], []
+            for attempt in range(repeats + 1):
+                if before:
+                    before()
+                query_count[0] = 0
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+                if attempt:  # The first run only warms up
+                    timings.append(elapsed)
+                    queries.append(query_count[0])
+            results.append({
+                'case': name, 'scale': scale, 'repeats': repeats,
+                'median_ms': round(statistics.median(timings) * 1000, 3),
+                'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+                'min_ms': round(min(timings) * 1000, 3),
+                'queries': statistics.median_low(queries)
+            })
+
+        sa_event.remove(engine, 'before_cursor_execute', count_query)
+        engine.dispose()
+    counts = {key: value for key, value in dataset.items() if not key.endswith('_id')}
+    return counts, results
+
+def current_commit():
+    """Short hash of the checked-out commit, with '+dirty' for uncommitted changes, or None outside git"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('+dirty' if dirty else '')
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmark suite at several scales')
+    parser.add_argument('--scales', type=lambda v: v.split(','), default=['small', 'medium'],
+                        help=f"comma-separated, from: {', '.join(SCALES)}")
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+    unknown = [scale for scale in args.scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+
+    report = {
+        'schema': SCHEMA_VERSION, 'commit': current_commit(), 'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+        'seed': args.seed, 'repeats': args.repeats, 'datasets': {}, 'results': []
+    }
+    print(f"{'scale':>7} {'case':<24} {'median ms':>10} {'p95 ms':>9} {'min ms':>9} {'queries':>8}")
+    for scale in args.scales:
+        counts, results = run_scale(scale, args.repeats, args.seed)
+        report['datasets'][scale] = counts
+        report['results'].extend(results)
+        for result in results:
+            print(f"{scale:>7} {result['case']:<24} {result['median_ms']:>10.1f} {result['p95_ms']:>9.1f}"
+                  f" {result['min_ms']:>9.1f} {result['queries']:>8}")
+        sys.stdout.flush()
+
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,15 @@
 # Database initialization script
-# Run this script to create all database tables based on model definitions
+# Creates the database schema, or brings an existing database up to date, by applying
+# the migrations in migrations/versions - the same as `flask db upgrade`
 # Usage: python create_db.py
 
-from extensions import db
+import os
 
-# Create all database tables defined in the models
-# This reads the model definitions and creates corresponding SQL tables
-db.create_all()
+# The schema check would refuse to start on the database this script is about to create
+os.environ.setdefault('SCHEMA_CHECK', 'off')
+
+from app import create_app
+from utils.schema import upgrade_schema
+
+if __name__ == '__main__':
+    upgrade_schema(create_app())
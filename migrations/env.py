@@ -11,21 +11,25 @@ from alembic import context
 # Alembic Config object - contains migration settings
 config = context.config
 
-# Setup logging
-fileConfig(config.config_file_name)
+# Setup logging, leaving the loggers of the app being migrated enabled
+fileConfig(config.config_file_name, disable_existing_loggers=False)
 logger = logging.getLogger('alembic.env')
 
-# Import your app and initialize context
-from app import create_app  # Adjust if your app package/module name differs
-from extensions import db
-
-app = create_app()
-
+# Flask-Migrate runs this file inside the app context of the app being migrated; creating
+# another app here would check (and used to create) the schema before migrating it.
 # Import your models so SQLAlchemy metadata is fully populated
 import models.user
 import models.event
 import models.notifications
 import models.event_exceptions  # if you have this model too
+import models.tags
+import models.outbox
+import models.tombstone
+import models.job
+import models.summary
+import models.inbox
+import models.user_session
+import models.calendar_feed
 
 
 def get_engine():
@@ -78,20 +82,18 @@ def run_migrations_online():
 
     connectable = get_engine()
 
-    with app.app_context():
-        with connectable.connect() as connection:
-            context.configure(
-                connection=connection,
-                target_metadata=get_metadata(),
-                **conf_args
-            )
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=get_metadata(),
+            **conf_args
+        )
 
-            with context.begin_transaction():
-                context.run_migrations()
+        with context.begin_transaction():
+            context.run_migrations()
 
 
 if context.is_offline_mode():
-    with app.app_context():
-        run_migrations_offline()
+    run_migrations_offline()
 else:
     run_migrations_online()
@@ -0,0 +1,65 @@
+"""Add updated_at to events and exceptions, and event tombstones
+
+Revision ID: 09cb126fa84e
+Revises: 3bd74b7365f6
+Create Date: 2025-09-06 14:03:22.518406
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '09cb126fa84e'
+down_revision = '3bd74b7365f6'
+branch_labels = None
+depends_on = None
+
+
+def _restore_span_index():
+    # Batch mode rebuilds the events table and cannot reflect expression indexes
+    op.execute('CREATE INDEX IF NOT EXISTS ix_events_span ON events (julianday(end_time) - julianday(start_time))')
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # Existing rows count as changed now; clients have no cursors yet anyway
+    now = datetime.utcnow()
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.literal(now)))
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.alter_column('updated_at', server_default=None)
+        batch_op.create_index(batch_op.f('ix_events_updated_at'), ['updated_at'], unique=False)
+    _restore_span_index()
+
+    with op.batch_alter_table('event_exceptions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.literal(now)))
+    with op.batch_alter_table('event_exceptions', schema=None) as batch_op:
+        batch_op.alter_column('updated_at', server_default=None)
+
+    # create_app() runs db.create_all(), so the table may already exist (empty)
+    if not inspector.has_table('event_tombstones'):
+        op.create_table('event_tombstones',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('event_id', sa.Integer(), nullable=False),
+            sa.Column('deleted_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_event_tombstones_deleted_at', 'event_tombstones', ['deleted_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_event_tombstones_deleted_at', table_name='event_tombstones')
+    op.drop_table('event_tombstones')
+
+    with op.batch_alter_table('event_exceptions', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_events_updated_at'))
+        batch_op.drop_column('updated_at')
+    _restore_span_index()
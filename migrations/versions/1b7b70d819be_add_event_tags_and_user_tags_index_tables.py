@@ -0,0 +1,89 @@
+"""Add event_tags and user_tags index tables
+
+Revision ID: 1b7b70d819be
+Revises: 8468cab027e4
+Create Date: 2025-08-02 10:14:37.512904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b7b70d819be'
+down_revision = '8468cab027e4'
+branch_labels = None
+depends_on = None
+
+
+def _split_tags(value):
+    # Same normalisation as models.tags.split_tags
+    if not value:
+        return []
+    return sorted({tag.strip().lower() for tag in value.split(',') if tag.strip()})
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # create_app() runs db.create_all(), so the tables may already exist (empty)
+    if not inspector.has_table('event_tags'):
+        op.create_table('event_tags',
+            sa.Column('event_id', sa.Integer(), nullable=False),
+            sa.Column('tag', sa.String(length=100), nullable=False),
+            sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('event_id', 'tag')
+        )
+        op.create_index('ix_event_tags_tag_event_id', 'event_tags', ['tag', 'event_id'], unique=False)
+
+    if not inspector.has_table('user_tags'):
+        op.create_table('user_tags',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('tag', sa.String(length=100), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('user_id', 'tag')
+        )
+        op.create_index('ix_user_tags_tag_user_id', 'user_tags', ['tag', 'user_id'], unique=False)
+
+    # Private events are looked up by creator alongside the tag index
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_events_creator_id'), ['creator_id'], unique=False)
+
+    # Backfill from the comma-separated columns
+    events = sa.table('events', sa.column('id', sa.Integer), sa.column('tags', sa.String))
+    exceptions = sa.table('event_exceptions', sa.column('original_event_id', sa.Integer), sa.column('tags', sa.String))
+    users = sa.table('users', sa.column('id', sa.Integer), sa.column('role', sa.String), sa.column('profile_tags', sa.String))
+    event_tags = sa.table('event_tags', sa.column('event_id', sa.Integer), sa.column('tag', sa.String))
+    user_tags = sa.table('user_tags', sa.column('user_id', sa.Integer), sa.column('tag', sa.String))
+
+    tags_by_event = {}
+    for event_id, tags in bind.execute(sa.select(events.c.id, events.c.tags)):
+        tags_by_event.setdefault(event_id, set()).update(_split_tags(tags))
+    for event_id, tags in bind.execute(sa.select(exceptions.c.original_event_id, exceptions.c.tags)):
+        if event_id in tags_by_event:
+            tags_by_event[event_id].update(_split_tags(tags))
+
+    bind.execute(event_tags.delete())
+    event_rows = [{'event_id': event_id, 'tag': tag} for event_id, tags in tags_by_event.items() for tag in tags]
+    if event_rows:
+        op.bulk_insert(event_tags, event_rows)
+
+    user_rows = []
+    for user_id, role, profile_tags in bind.execute(sa.select(users.c.id, users.c.role, users.c.profile_tags)):
+        tags = {'public', role.lower()} | set(_split_tags(profile_tags))
+        user_rows.extend({'user_id': user_id, 'tag': tag} for tag in sorted(tags))
+
+    bind.execute(user_tags.delete())
+    if user_rows:
+        op.bulk_insert(user_tags, user_rows)
+
+
+def downgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_events_creator_id'))
+
+    op.drop_index('ix_user_tags_tag_user_id', table_name='user_tags')
+    op.drop_table('user_tags')
+    op.drop_index('ix_event_tags_tag_event_id', table_name='event_tags')
+    op.drop_table('event_tags')
@@ -0,0 +1,49 @@
+"""Add outbox_messages table
+
+Revision ID: 3513d719c76b
+Revises: faeae8bcb7c1
+Create Date: 2025-08-23 14:05:12.871360
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3513d719c76b'
+down_revision = 'faeae8bcb7c1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app() runs db.create_all(), so the table may already exist
+    if sa.inspect(op.get_bind()).has_table('outbox_messages'):
+        return
+
+    op.create_table('outbox_messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('recipient', sa.String(length=120), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=10), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('claim_token', sa.String(length=36), nullable=True),
+        sa.Column('claimed_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('outbox_messages', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_outbox_messages_claim_token'), ['claim_token'], unique=False)
+        batch_op.create_index('ix_outbox_messages_status_next_attempt_at', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('outbox_messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_outbox_messages_status_next_attempt_at')
+        batch_op.drop_index(batch_op.f('ix_outbox_messages_claim_token'))
+
+    op.drop_table('outbox_messages')
@@ -0,0 +1,41 @@
+"""Add time-range indexes to events
+
+Revision ID: 3bd74b7365f6
+Revises: 3513d719c76b
+Create Date: 2025-08-30 11:12:47.203915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3bd74b7365f6'
+down_revision = '3513d719c76b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.create_index('ix_events_start_time_end_time', ['start_time', 'end_time'], unique=False)
+        batch_op.create_index('ix_events_priority_start_time', ['priority', 'start_time'], unique=False)
+        batch_op.create_index('ix_events_notifications_silenced_start_time', ['notifications_silenced', 'start_time'], unique=False)
+        batch_op.create_index('ix_events_recurrence_until_start_time', ['recurrence_until', 'start_time'], unique=False,
+                              sqlite_where=sa.text('recurrence_unit IS NOT NULL'))
+
+    # Expression index behind models.event.longest_event_span()
+    op.create_index('ix_events_span', 'events', [sa.text('julianday(end_time) - julianday(start_time)')], unique=False)
+
+    # Give the planner statistics so it picks the range indexes over notifications_silenced
+    op.execute('ANALYZE events')
+
+
+def downgrade():
+    op.drop_index('ix_events_span', table_name='events')
+
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_index('ix_events_recurrence_until_start_time')
+        batch_op.drop_index('ix_events_notifications_silenced_start_time')
+        batch_op.drop_index('ix_events_priority_start_time')
+        batch_op.drop_index('ix_events_start_time_end_time')
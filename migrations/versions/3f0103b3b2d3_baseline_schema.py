@@ -0,0 +1,95 @@
+"""Baseline schema: the tables that db.create_all() used to create before the first migration
+
+Revision ID: 3f0103b3b2d3
+Revises:
+Create Date: 2026-10-18 15:40:12.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f0103b3b2d3'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() before the schema was left to migrations
+    # already have these tables; only a new database needs them
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('users'):
+        op.create_table('users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('email', sa.String(length=120), nullable=False),
+            sa.Column('password_hash', sa.String(length=200), nullable=False),
+            sa.Column('role', sa.String(length=20), nullable=False),
+            sa.Column('profile_tags', sa.String(length=255), nullable=True),
+            sa.Column('session_token', sa.String(length=64), nullable=True),
+            sa.Column('session_expiry', sa.DateTime(), nullable=True),
+            sa.Column('csrf_token', sa.String(length=64), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('email')
+        )
+        op.create_index('ix_users_session_token', 'users', ['session_token'], unique=True)
+        op.create_index('ix_users_csrf_token', 'users', ['csrf_token'], unique=True)
+
+    if not inspector.has_table('events'):
+        # notifications_silenced arrives with 8468cab027e4
+        op.create_table('events',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(length=150), nullable=False),
+            sa.Column('description', sa.String(length=300), nullable=True),
+            sa.Column('priority', sa.Integer(), nullable=True),
+            sa.Column('tags', sa.String(length=100), nullable=True),
+            sa.Column('start_time', sa.DateTime(), nullable=True),
+            sa.Column('end_time', sa.DateTime(), nullable=True),
+            sa.Column('is_recurring', sa.Boolean(), nullable=False),
+            sa.Column('recurrence_group_id', sa.String(length=36), nullable=True),
+            sa.Column('creator_id', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['creator_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_events_recurrence_group_id', 'events', ['recurrence_group_id'], unique=False)
+
+    if not inspector.has_table('event_exceptions'):
+        op.create_table('event_exceptions',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('original_event_id', sa.Integer(), nullable=True),
+            sa.Column('exception_date', sa.Date(), nullable=False),
+            sa.Column('title', sa.String(length=150), nullable=True),
+            sa.Column('description', sa.String(length=300), nullable=True),
+            sa.Column('priority', sa.Integer(), nullable=True),
+            sa.Column('tags', sa.String(length=100), nullable=True),
+            sa.Column('start_time', sa.DateTime(), nullable=True),
+            sa.Column('end_time', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['original_event_id'], ['events.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if not inspector.has_table('notifications'):
+        op.create_table('notifications',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('event_id', sa.Integer(), nullable=False),
+            sa.Column('days_before', sa.Integer(), nullable=False),
+            sa.Column('type', sa.String(length=50), nullable=True),
+            sa.Column('message', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['event_id'], ['events.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('notifications')
+    op.drop_table('event_exceptions')
+    op.drop_index('ix_events_recurrence_group_id', table_name='events')
+    op.drop_table('events')
+    op.drop_index('ix_users_csrf_token', table_name='users')
+    op.drop_index('ix_users_session_token', table_name='users')
+    op.drop_table('users')
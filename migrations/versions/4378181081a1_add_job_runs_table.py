@@ -0,0 +1,43 @@
+"""Add job_runs table
+
+Revision ID: 4378181081a1
+Revises: b61524f615e4
+Create Date: 2025-09-14 09:12:47.301552
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4378181081a1'
+down_revision = 'b61524f615e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app() runs db.create_all(), so the table may already exist (empty)
+    if sa.inspect(op.get_bind()).has_table('job_runs'):
+        return
+    op.create_table('job_runs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('scheduled_for', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String(length=10), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('lease_owner', sa.String(length=64), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name', 'scheduled_for', name='uq_job_runs_name_scheduled_for')
+    )
+    op.create_index('ix_job_runs_status_scheduled_for', 'job_runs', ['status', 'scheduled_for'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_job_runs_status_scheduled_for', table_name='job_runs')
+    op.drop_table('job_runs')
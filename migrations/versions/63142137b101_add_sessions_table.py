@@ -0,0 +1,57 @@
+"""Add sessions table and drop the session columns of users
+
+Revision ID: 63142137b101
+Revises: ac2894918db1
+Create Date: 2025-09-18 10:12:41.207315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '63142137b101'
+down_revision = 'ac2894918db1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # create_app() runs db.create_all(), so the table may already exist (empty)
+    if not inspector.has_table('sessions'):
+        op.create_table('sessions',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('token_hash', sa.String(length=64), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.Column('last_seen_at', sa.DateTime(), nullable=False),
+            sa.Column('user_agent', sa.String(length=255), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('token_hash')
+        )
+        op.create_index(op.f('ix_sessions_user_id'), 'sessions', ['user_id'], unique=False)
+        op.create_index(op.f('ix_sessions_expires_at'), 'sessions', ['expires_at'], unique=False)
+
+    # Databases created by create_all() carry the old per-user session columns; tokens
+    # in them are not carried over, so everyone signs in again once
+    columns = {column['name'] for column in inspector.get_columns('users')}
+    if 'session_token' in columns:
+        indexes = {index['name'] for index in inspector.get_indexes('users')}
+        with op.batch_alter_table('users') as batch_op:
+            if 'ix_users_session_token' in indexes:
+                batch_op.drop_index('ix_users_session_token')
+            batch_op.drop_column('session_token')
+            batch_op.drop_column('session_expiry')
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('session_token', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('session_expiry', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_users_session_token', ['session_token'], unique=True)
+    op.drop_index(op.f('ix_sessions_expires_at'), table_name='sessions')
+    op.drop_index(op.f('ix_sessions_user_id'), table_name='sessions')
+    op.drop_table('sessions')
@@ -0,0 +1,35 @@
+"""Add event_summaries table
+
+Revision ID: 7222aefbc92f
+Revises: 4378181081a1
+Create Date: 2025-09-15 16:40:03.912774
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7222aefbc92f'
+down_revision = '4378181081a1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app() runs db.create_all(), so the table may already exist (empty)
+    if sa.inspect(op.get_bind()).has_table('event_summaries'):
+        return
+    op.create_table('event_summaries',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('summary', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_event_summaries_last_used_at', 'event_summaries', ['last_used_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_event_summaries_last_used_at', table_name='event_summaries')
+    op.drop_table('event_summaries')
@@ -1,7 +1,7 @@
 """Add notifications_silenced column to events
 
 Revision ID: 8468cab027e4
-Revises: 
+Revises: 3f0103b3b2d3
 Create Date: 2025-07-20 01:51:02.353818
 
 """
@@ -11,12 +11,16 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision = '8468cab027e4'
-down_revision = None
+down_revision = '3f0103b3b2d3'
 branch_labels = None
 depends_on = None
 
 
 def upgrade():
+    # Databases created by db.create_all() before this migration may have the column already
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('events')}
+    if 'notifications_silenced' in columns:
+        return
     # ### commands auto generated by Alembic - please adjust! ###
     with op.batch_alter_table('events', schema=None) as batch_op:
         batch_op.add_column(sa.Column('notifications_silenced', sa.Boolean(), nullable=False, server_default='0'))
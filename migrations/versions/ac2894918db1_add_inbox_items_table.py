@@ -0,0 +1,47 @@
+"""Add inbox_items table
+
+Revision ID: ac2894918db1
+Revises: 7222aefbc92f
+Create Date: 2025-09-17 11:05:29.480163
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ac2894918db1'
+down_revision = '7222aefbc92f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_app() runs db.create_all(), so the table may already exist (empty).
+    # The worker's inbox_refresh_job fills it on its next run.
+    if sa.inspect(op.get_bind()).has_table('inbox_items'):
+        return
+    op.create_table('inbox_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('occurrence_date', sa.Date(), nullable=False),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=False),
+        sa.Column('title', sa.String(length=200), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('priority', sa.Integer(), nullable=False),
+        sa.Column('read_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'event_id', 'occurrence_date', name='uq_inbox_items_user_event_occurrence')
+    )
+    op.create_index('ix_inbox_items_user_id_start_time_id', 'inbox_items', ['user_id', 'start_time', 'id'], unique=False)
+    op.create_index('ix_inbox_items_event_id_occurrence_date', 'inbox_items', ['event_id', 'occurrence_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_inbox_items_event_id_occurrence_date', table_name='inbox_items')
+    op.drop_index('ix_inbox_items_user_id_start_time_id', table_name='inbox_items')
+    op.drop_table('inbox_items')
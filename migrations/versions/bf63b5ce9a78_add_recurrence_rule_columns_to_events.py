@@ -0,0 +1,45 @@
+"""Add recurrence rule columns to events and occurrence_date to notifications
+
+Revision ID: bf63b5ce9a78
+Revises: 1b7b70d819be
+Create Date: 2025-08-09 16:42:05.108231
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bf63b5ce9a78'
+down_revision = '1b7b70d819be'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('recurrence_unit', sa.String(length=10), nullable=True))
+        batch_op.add_column(sa.Column('recurrence_interval', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('recurrence_weekdays', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('recurrence_until', sa.Date(), nullable=True))
+
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('occurrence_date', sa.Date(), nullable=True))
+
+    # Existing series are stored one row per occurrence, so each reminder
+    # belongs to the occurrence on its event's own start date
+    op.execute(
+        "UPDATE notifications SET occurrence_date = "
+        "(SELECT date(events.start_time) FROM events WHERE events.id = notifications.event_id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_column('occurrence_date')
+
+    with op.batch_alter_table('events', schema=None) as batch_op:
+        batch_op.drop_column('recurrence_until')
+        batch_op.drop_column('recurrence_weekdays')
+        batch_op.drop_column('recurrence_interval')
+        batch_op.drop_column('recurrence_unit')
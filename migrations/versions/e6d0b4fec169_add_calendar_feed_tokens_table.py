@@ -0,0 +1,33 @@
+"""Add calendar_feed_tokens table
+
+Revision ID: e6d0b4fec169
+Revises: 63142137b101
+Create Date: 2026-10-18 17:02:36.814920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6d0b4fec169'
+down_revision = '63142137b101'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('calendar_feed_tokens',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('token_hash', sa.String(length=64), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('token_hash'),
+        sa.UniqueConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('calendar_feed_tokens')
@@ -0,0 +1,55 @@
+# Calendar subscription tokens, one per user
+# A user's .ics feed URL (/calendar/<token>.ics) carries a random token instead of a
+# session cookie, since calendar apps poll it without signing in. As with login
+# sessions only the token's sha256 is stored, so the URL is shown once when it is
+# created; creating a new one replaces (and so revokes) the old one.
+import secrets
+from datetime import datetime
+from sqlalchemy import delete
+from extensions import db
+from models.user_session import hash_token
+
+# Calendar feed defaults - override through app.config
+CALENDAR_FEED_DEFAULTS = {
+    'CALENDAR_FEED_PAST_DAYS': 90,          # Events that ended longer ago are left out of the feed
+    'CALENDAR_FEED_REFRESH_MINUTES': 60,    # Polling interval suggested to calendar apps
+    'CALENDAR_FEED_BATCH_SIZE': 500         # Events fetched from the cursor per batch
+}
+
+class CalendarFeedToken(db.Model):
+    """The calendar subscription token of a user"""
+    __tablename__ = 'calendar_feed_tokens'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), unique=True, nullable=False)
+    token_hash = db.Column(db.String(64), unique=True, nullable=False)  # sha256 hex of the URL token
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+def create_feed_token(user_id):
+    """
+    Give a user a new calendar feed token, revoking any previous one; the caller commits
+
+    Returns:
+        The raw token for the feed URL (only its hash is stored)
+    """
+    revoke_feed_token(user_id)
+    token = secrets.token_urlsafe(32)
+    db.session.add(CalendarFeedToken(user_id=user_id, token_hash=hash_token(token)))
+    return token
+
+def revoke_feed_token(user_id):
+    """Remove a user's calendar feed token, if any; the caller commits"""
+    db.session.execute(delete(CalendarFeedToken).where(CalendarFeedToken.user_id == user_id))
+
+def feed_token_user(token):
+    """User ID of a calendar feed token, or None"""
+    if not token:
+        return None
+    return db.session.query(CalendarFeedToken.user_id).filter(
+        CalendarFeedToken.token_hash == hash_token(token)
+    ).scalar()
+
+def init_calendar_feed(app):
+    """Apply the calendar feed defaults to app.config"""
+    for key, value in CALENDAR_FEED_DEFAULTS.items():
+        app.config.setdefault(key, value)
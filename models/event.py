@@ -1,6 +1,8 @@
 # Event model for calendar events and scheduling
+from datetime import datetime, timedelta
 from extensions import db
 from sqlalchemy import JSON
+from models.user import User
 
 class Event(db.Model):
     """
@@ -26,9 +28,62 @@ class Event(db.Model):
     is_recurring = db.Column(db.Boolean, default=False, nullable=False)
     recurrence_group_id = db.Column(db.String(36), nullable=True, index=True)  # Groups recurring instances
 
+    # Recurrence rule - only set on series master rows, whose start/end times are the
+    # first occurrence. Occurrences are expanded on the fly by models.recurrence.
+    # Older series were stored as one row per occurrence and leave these NULL.
+    recurrence_unit = db.Column(db.String(10), nullable=True)      # 'daily', 'weekly' or 'monthly'
+    recurrence_interval = db.Column(db.Integer, nullable=True)     # Repeat every N units
+    recurrence_weekdays = db.Column(db.String(20), nullable=True)  # Comma-separated codes, e.g. 'MO,WE'
+    recurrence_until = db.Column(db.Date, nullable=True)           # Last date an occurrence may start on
+
     # Notification management
     notifications_silenced = db.Column(db.Boolean, default=False, nullable=False)
 
     # Foreign key to user who created the event
-    creator_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    creator_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+
+    # Last change to the event or any of its exceptions, for feed validators and delta sync
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    # Time-range indexes for the calendar feed, the notification pages and the reminder job
+    # (see models.recurrence.window_filter for the query shape they serve)
+    __table_args__ = (
+        db.Index('ix_events_start_time_end_time', 'start_time', 'end_time'),
+        db.Index('ix_events_priority_start_time', 'priority', 'start_time'),
+        db.Index('ix_events_notifications_silenced_start_time', 'notifications_silenced', 'start_time'),
+        # Series masters only, so single events never bloat it
+        db.Index('ix_events_recurrence_until_start_time', 'recurrence_until', 'start_time',
+                 sqlite_where=db.text('recurrence_unit IS NOT NULL')),
+    )
+
+# Length of each event in days; indexed so the longest event is an O(log n) lookup
+EVENT_SPAN = db.func.julianday(Event.end_time) - db.func.julianday(Event.start_time)
+db.Index('ix_events_span', EVENT_SPAN)
+
+def longest_event_span():
+    """
+    Duration of the longest event (or series occurrence), as a timedelta
+    Lets overlap queries bound start_time on both sides: an event overlapping a window
+    that starts at T cannot have started before T minus this span
+    """
+    days = db.session.query(db.func.max(EVENT_SPAN)).scalar() or 0
+    # julianday() is a float, so allow a second of rounding
+    return timedelta(days=max(days, 0)) + timedelta(seconds=1)
+
+# Columns needed to expand and serialise events for the calendar feed
+FEED_COLUMNS = (
+    Event.id, Event.title, Event.description, Event.priority, Event.tags,
+    Event.start_time, Event.end_time, Event.is_recurring, Event.recurrence_group_id,
+    Event.recurrence_unit, Event.recurrence_interval, Event.recurrence_weekdays,
+    Event.recurrence_until, Event.notifications_silenced, Event.creator_id
+)
 
+def feed_query():
+    """
+    Column-only query for the calendar feed, joined to the creator's role
+    Rows behave like read-only Event objects plus a creator_role attribute,
+    so no ORM instances are built and event.creator is never lazy-loaded
+    """
+    return db.session.query(*FEED_COLUMNS, User.role.label('creator_role')).outerjoin(
+        User, User.id == Event.creator_id
+    )
@@ -0,0 +1,109 @@
+# Which events a transaction changes, for the modules that keep state derived from them
+# One set of session hooks collects the IDs of the events whose Event or EventExceptions
+# rows are added, changed or deleted - through the ORM, or through defer_changes() for
+# Core statements - and hands them to the subscribed modules at three points:
+#   before_change(session, event_ids, state): once per event, before the transaction first
+#       writes it, so its stored state can still be read; not called for new events
+#   before_commit(session, event_ids, state): every changed event, after the last flush
+#       and while SQL can still run in the same transaction
+#   after_commit(event_ids, state): every changed event, once the commit has succeeded
+# state is a dict private to one subscriber and one transaction; a rollback discards it.
+from collections import namedtuple
+from sqlalchemy import event as sa_event, inspect
+from sqlalchemy.orm import Session
+from extensions import db
+from models.event import Event
+from models.event_exceptions import EventExceptions
+
+ChangeSubscriber = namedtuple('ChangeSubscriber', ['before_change', 'before_commit', 'after_commit'])
+
+# Subscribers by name, called in the order they subscribed
+_subscribers = {}
+
+def subscribe(name, before_change=None, before_commit=None, after_commit=None):
+    """
+    Register (or replace) a subscriber to committed event changes
+
+    Args:
+        name: Unique name of the subscriber, e.g. 'inbox'
+        before_change, before_commit, after_commit: Callbacks, see the top of this module
+    """
+    _subscribers[name] = ChangeSubscriber(before_change, before_commit, after_commit)
+    if not sa_event.contains(Session, 'before_flush', _collect_before_flush):
+        sa_event.listen(Session, 'before_flush', _collect_before_flush)
+        sa_event.listen(Session, 'after_flush', _collect_after_flush)
+        sa_event.listen(Session, 'before_commit', _notify_before_commit)
+        sa_event.listen(Session, 'after_commit', _notify_after_commit)
+        sa_event.listen(Session, 'after_rollback', _discard)
+
+def defer_changes(event_ids):
+    """
+    Record events about to be changed by a Core UPDATE or DELETE, which the session
+    hooks cannot see; call before the statement. The caller commits.
+    """
+    session = db.session()
+    event_ids = set(event_ids)
+    _announce(session, event_ids)
+    _changes(session)['event_ids'].update(event_ids)
+
+def _changes(session):
+    # Per-transaction record: every changed event, those announced to before_change, subscriber states
+    return session.info.setdefault('event_changes', {'event_ids': set(), 'announced': set(), 'states': {}})
+
+def _announce(session, event_ids):
+    changes = _changes(session)
+    first_seen = event_ids - changes['announced']
+    if not first_seen:
+        return
+    changes['announced'].update(first_seen)
+    for name, subscriber in _subscribers.items():
+        if subscriber.before_change:
+            subscriber.before_change(session, first_seen, changes['states'].setdefault(name, {}))
+
+def _touched_event_ids(session):
+    # Events of the pending Event and EventExceptions objects that already have an ID
+    event_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Event) and obj.id is not None:
+            event_ids.add(obj.id)
+        elif isinstance(obj, EventExceptions):
+            # The parent before the change too, should the exception move to another event
+            history = inspect(obj).attrs.original_event_id.history
+            event_ids.update(event_id for event_id in (obj.original_event_id, *history.deleted) if event_id is not None)
+    return event_ids
+
+def _collect_before_flush(session, flush_context, instances):
+    """before_flush: announce the stored events the flush is about to change"""
+    event_ids = _touched_event_ids(session)
+    if event_ids:
+        _announce(session, event_ids)
+
+def _collect_after_flush(session, flush_context):
+    """after_flush: remember every changed event, new ones included (IDs are assigned by now)"""
+    event_ids = _touched_event_ids(session)
+    if event_ids:
+        _changes(session)['event_ids'].update(event_ids)
+
+def _notify_before_commit(session):
+    if 'event_changes' not in session.info and not (session.new or session.dirty or session.deleted):
+        return
+    session.flush()
+    changes = session.info.get('event_changes')
+    if not changes or not changes['event_ids']:
+        return
+    event_ids = frozenset(changes['event_ids'])
+    for name, subscriber in _subscribers.items():
+        if subscriber.before_commit:
+            subscriber.before_commit(session, event_ids, changes['states'].setdefault(name, {}))
+
+def _notify_after_commit(session):
+    changes = session.info.pop('event_changes', None)
+    if not changes or not changes['event_ids']:
+        return
+    event_ids = frozenset(changes['event_ids'])
+    for name, subscriber in _subscribers.items():
+        if subscriber.after_commit:
+            subscriber.after_commit(event_ids, changes['states'].setdefault(name, {}))
+
+def _discard(session):
+    session.info.pop('event_changes', None)
@@ -1,5 +1,8 @@
 # Event exceptions model for handling recurring event modifications
+from datetime import datetime
+from sqlalchemy import event as sa_event, update
 from extensions import db
+from models.event import Event
 
 class EventExceptions(db.Model):
     """
@@ -13,7 +16,7 @@ class EventExceptions(db.Model):
     id = db.Column(db.Integer, primary_key=True)
 
     # Reference to the original recurring event
-    original_event_id = db.Column(db.Integer, db.ForeignKey('events.id'))
+    original_event_id = db.Column(db.Integer, db.ForeignKey('events.id'), index=True)
 
     # The specific date this exception applies to
     exception_date = db.Column(db.Date, nullable=False)
@@ -27,3 +30,17 @@ class EventExceptions(db.Model):
     tags = db.Column(db.String(100), nullable=True)
     start_time = db.Column(db.DateTime, nullable=True)
     end_time = db.Column(db.DateTime, nullable=True)
+
+    # Last change to this exception
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+@sa_event.listens_for(EventExceptions, 'after_insert')
+@sa_event.listens_for(EventExceptions, 'after_update')
+def touch_original_event(mapper, connection, exception):
+    """
+    Bump the series master's updated_at whenever one of its exceptions is written
+    so feed validators and delta sync only have to look at Event.updated_at
+    """
+    connection.execute(
+        update(Event).where(Event.id == exception.original_event_id).values(updated_at=exception.updated_at)
+    )
@@ -0,0 +1,249 @@
+# Materialized per-user notification inbox (fan-out on write)
+# Every user has one row per upcoming occurrence they can see, with the fields the
+# notification list shows, so reading the inbox is one indexed range scan instead of
+# expanding and tag-matching every event in the window on each request.
+# Rows are reconciled when events change (models.event_changes) or a user's tags change
+# (fan_out_user), and the worker rolls the horizon forward hourly (refresh_inbox).
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, or_, update
+from extensions import db
+from models.event import Event
+from models.event_changes import subscribe
+from models.recurrence import expand_events, window_filter
+from models.tags import EventTag, UserTag, split_tags
+from utils.db_engine import IN_CLAUSE_CHUNK, chunks
+
+# Occurrences are materialized this far ahead; the inbox shows INBOX_WINDOW_DAYS of them.
+# The gap leaves room for the refresh job to be late without the list running short.
+INBOX_HORIZON_DAYS = 14
+INBOX_WINDOW_DAYS = 7
+
+# The hourly refresh fans out events overlapping the last stretch of the horizon, so runs
+# can be missed for this long before an occurrence is skipped
+REFRESH_OVERLAP = timedelta(days=2)
+
+# Display fields copied from the occurrence into every recipient's row
+DISPLAY_FIELDS = ('start_time', 'end_time', 'title', 'description', 'priority')
+
+class InboxItem(db.Model):
+    """
+    One upcoming occurrence in one user's inbox
+    Keyed by (user, event, occurrence date) so edits update rows in place and keep read_at
+    """
+    __tablename__ = 'inbox_items'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('events.id', ondelete='CASCADE'), nullable=False)
+    occurrence_date = db.Column(db.Date, nullable=False)  # Date the rule generated the occurrence on
+
+    # Copied from the occurrence when the row is written
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    priority = db.Column(db.Integer, nullable=False, default=0)
+
+    read_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'event_id', 'occurrence_date', name='uq_inbox_items_user_event_occurrence'),
+        # Inbox reads and keyset pagination: user -> (start_time, id)
+        db.Index('ix_inbox_items_user_id_start_time_id', 'user_id', 'start_time', 'id'),
+        # Fan-out finds the rows of changed events
+        db.Index('ix_inbox_items_event_id_occurrence_date', 'event_id', 'occurrence_date'),
+    )
+
+def _display(occurrence):
+    return {
+        'start_time': occurrence.start_time,
+        'end_time': occurrence.end_time,
+        'title': occurrence.title,
+        'description': occurrence.description,
+        'priority': occurrence.priority or 0
+    }
+
+def _desired_rows(events, window_start, window_end, user_id=None, user_tags=None):
+    """
+    {(user_id, event_id, occurrence_date): display fields} for the visible occurrences of events
+    Recipients are the creator plus every user sharing a tag with the occurrence;
+    pass user_id/user_tags to compute one user's rows only.
+    """
+    occurrences = [
+        occurrence for occurrence in expand_events(events, window_start, window_end)
+        if occurrence.start_time >= window_start
+    ]
+
+    users_by_tag = {}
+    if user_id is None:
+        all_tags = {tag for occurrence in occurrences for tag in split_tags(occurrence.tags)}
+        for chunk in chunks(all_tags):
+            for tag, tag_user_id in db.session.query(UserTag.tag, UserTag.user_id).filter(UserTag.tag.in_(chunk)):
+                users_by_tag.setdefault(tag, set()).add(tag_user_id)
+
+    desired = {}
+    for occurrence in occurrences:
+        tags = split_tags(occurrence.tags)
+        if user_id is None:
+            recipients = {occurrence.event.creator_id} if occurrence.event.creator_id else set()
+            for tag in tags:
+                recipients |= users_by_tag.get(tag, set())
+        elif occurrence.event.creator_id == user_id or not user_tags.isdisjoint(tags):
+            recipients = {user_id}
+        else:
+            continue
+        fields = _display(occurrence)
+        for recipient in recipients:
+            desired[(recipient, occurrence.id, occurrence.original_date)] = fields
+    return desired
+
+def _reconcile(desired, existing, now):
+    """
+    Make the stored rows match `desired`
+    existing: rows (id, user_id, event_id, occurrence_date, *DISPLAY_FIELDS) that may be affected.
+    Rows no longer wanted are deleted unless already in the past, new ones are bulk inserted,
+    and changed display fields are rewritten with one UPDATE per occurrence, not per user.
+    """
+    stale_ids = []
+    changed = {}
+    for row in existing:
+        key = (row.user_id, row.event_id, row.occurrence_date)
+        fields = desired.pop(key, None)
+        if fields is None:
+            if row.start_time >= now:
+                stale_ids.append(row.id)
+        elif any(getattr(row, name) != fields[name] for name in DISPLAY_FIELDS):
+            changed[(row.event_id, row.occurrence_date)] = fields
+
+    for chunk in chunks(stale_ids):
+        db.session.execute(delete(InboxItem).where(InboxItem.id.in_(chunk)))
+    for (event_id, occurrence_date), fields in changed.items():
+        db.session.execute(
+            update(InboxItem)
+            .where(InboxItem.event_id == event_id, InboxItem.occurrence_date == occurrence_date)
+            .values(**fields)
+        )
+    rows = [
+        {'user_id': user_id, 'event_id': event_id, 'occurrence_date': occurrence_date, **fields}
+        for (user_id, event_id, occurrence_date), fields in desired.items()
+    ]
+    if rows:
+        db.session.execute(insert(InboxItem), rows)
+    return len(rows), len(stale_ids), len(changed)
+
+_ROW_COLUMNS = (InboxItem.id, InboxItem.user_id, InboxItem.event_id, InboxItem.occurrence_date) + tuple(
+    getattr(InboxItem, name) for name in DISPLAY_FIELDS
+)
+
+def fan_out_events(event_ids):
+    """
+    Bring every inbox row of the given events up to date; the caller commits
+    Deleted and silenced events lose their upcoming rows.
+    """
+    event_ids = set(event_ids)
+    if not event_ids:
+        return
+    now = datetime.utcnow()
+    horizon = now + timedelta(days=INBOX_HORIZON_DAYS)
+
+    events, existing = [], []
+    for chunk in chunks(event_ids):
+        events.extend(Event.query.filter(
+            Event.id.in_(chunk), window_filter(now, horizon), Event.notifications_silenced == False
+        ))
+        existing.extend(db.session.query(*_ROW_COLUMNS).filter(InboxItem.event_id.in_(chunk)))
+    _reconcile(_desired_rows(events, now, horizon), existing, now)
+
+def fan_out_user(user_id):
+    """
+    Rebuild one user's upcoming inbox rows, e.g. after registration or a profile tag change
+    Reads the user's tags from user_tags, so call it after sync_user_tags(). The caller commits.
+    """
+    now = datetime.utcnow()
+    horizon = now + timedelta(days=INBOX_HORIZON_DAYS)
+    user_tags = {tag for (tag,) in db.session.query(UserTag.tag).filter(UserTag.user_id == user_id)}
+
+    tagged = db.session.query(EventTag.event_id).filter(EventTag.tag.in_(user_tags))
+    events = Event.query.filter(
+        window_filter(now, horizon),
+        Event.notifications_silenced == False,
+        or_(Event.creator_id == user_id, Event.id.in_(tagged))
+    ).all()
+    existing = db.session.query(*_ROW_COLUMNS).filter(InboxItem.user_id == user_id, InboxItem.start_time >= now)
+    _reconcile(_desired_rows(events, now, horizon, user_id, user_tags), existing, now)
+
+def delete_inbox_items(event_ids):
+    """Remove the inbox rows of events that are being deleted"""
+    for chunk in chunks(event_ids):
+        db.session.execute(delete(InboxItem).where(InboxItem.event_id.in_(chunk)))
+
+def refresh_inbox(app, full=False):
+    """
+    Roll the inbox forward: drop past rows and fan out the events whose occurrences
+    entered the horizon since the last run. Edits fan out as they are committed, so only
+    that slice is new; the whole horizon is reconciled when the inbox is empty (first run
+    after deploying it) or when full=True. Called hourly by the worker.
+    """
+    with app.app_context():
+        now = datetime.utcnow()
+        horizon = now + timedelta(days=INBOX_HORIZON_DAYS)
+        removed = db.session.execute(delete(InboxItem).where(InboxItem.end_time < now)).rowcount
+
+        if full or db.session.query(InboxItem.id).first() is None:
+            slice_start = now
+        else:
+            slice_start = horizon - REFRESH_OVERLAP
+        event_ids = [event_id for (event_id,) in db.session.query(Event.id).filter(window_filter(slice_start, horizon))]
+        fan_out_events(event_ids)
+        db.session.commit()
+        print(f"✅ Inbox refreshed for {len(event_ids)} events ({removed} past items removed).")
+
+def inbox_page(user_id, after=None, limit=50):
+    """
+    One page of a user's inbox for the next INBOX_WINDOW_DAYS, oldest first
+    Keyset pagination on (start_time, id): `after` is the (start_time, id) of the
+    last item of the previous page, so every page is one index range scan.
+
+    Returns:
+        (items, next_key) - next_key is None on the last page
+    """
+    now = datetime.utcnow()
+    query = InboxItem.query.filter(
+        InboxItem.user_id == user_id,
+        InboxItem.start_time >= now,
+        InboxItem.start_time < now + timedelta(days=INBOX_WINDOW_DAYS)
+    )
+    if after is not None:
+        query = query.filter(db.tuple_(InboxItem.start_time, InboxItem.id) > after)
+    items = query.order_by(InboxItem.start_time, InboxItem.id).limit(limit + 1).all()
+    next_key = (items[limit - 1].start_time, items[limit - 1].id) if len(items) > limit else None
+    return items[:limit], next_key
+
+def unread_count(user_id):
+    """Number of unread items in a user's inbox window"""
+    now = datetime.utcnow()
+    return db.session.query(db.func.count(InboxItem.id)).filter(
+        InboxItem.user_id == user_id,
+        InboxItem.start_time >= now,
+        InboxItem.start_time < now + timedelta(days=INBOX_WINDOW_DAYS),
+        InboxItem.read_at == None
+    ).scalar()
+
+def mark_read(user_id, item_ids=None):
+    """Mark some (or, with item_ids None, all) of a user's items read; the caller commits"""
+    query = update(InboxItem).where(InboxItem.user_id == user_id, InboxItem.read_at == None)
+    if item_ids is not None:
+        query = query.where(InboxItem.id.in_(list(item_ids)[:IN_CLAUSE_CHUNK]))
+    db.session.execute(query.values(read_at=datetime.utcnow()))
+
+def _fan_out_changes(session, event_ids, state):
+    """before_commit: write the inbox rows of the changed events into the same transaction"""
+    fan_out_events(event_ids)
+
+def init_inbox(app):
+    """
+    Subscribe inbox fan-out to event changes
+    The inbox rows of every changed event are brought up to date before the commit, so
+    they are committed (or rolled back) together with the change.
+    """
+    subscribe('inbox', before_commit=_fan_out_changes)
@@ -0,0 +1,171 @@
+# Job runs leased by background workers (see worker.py)
+# Every scheduled run of a job is one row. Workers agree on the runs through the
+# database: the unique (name, scheduled_for) key makes a run exist once, and a
+# conditional UPDATE hands its lease to exactly one worker.
+from datetime import datetime, timedelta
+from sqlalchemy import and_, case, delete, exists, or_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import aliased
+from extensions import db
+
+# Finished runs are kept this long; the newest run of each job anchors its schedule
+JOB_HISTORY_DAYS = 14
+
+class JobRun(db.Model):
+    """
+    One scheduled run of a background job
+
+    Status lifecycle:
+    - pending: due at scheduled_for, waiting for a worker (or for a retry)
+    - running: leased by lease_owner until lease_expires_at, renewed by heartbeats;
+      a lease that expires belongs to a dead worker and the run is claimed again
+    - done / failed: finished; failed after JOB_MAX_ATTEMPTS attempts
+    - skipped: superseded by a later run of the same job before anyone ran it
+    """
+    __tablename__ = 'job_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    scheduled_for = db.Column(db.DateTime, nullable=False)  # UTC
+
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+
+    # Lease held by the worker running the job
+    lease_owner = db.Column(db.String(64), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # A run exists once however many workers schedule it
+        db.UniqueConstraint('name', 'scheduled_for', name='uq_job_runs_name_scheduled_for'),
+        # Workers look for due pending runs and for expired leases
+        db.Index('ix_job_runs_status_scheduled_for', 'status', 'scheduled_for'),
+    )
+
+def last_scheduled(name):
+    """scheduled_for of the newest run of a job, or None if it never had one"""
+    return db.session.query(db.func.max(JobRun.scheduled_for)).filter(JobRun.name == name).scalar()
+
+def schedule_run(name, scheduled_for):
+    """
+    Create the run of a job at scheduled_for unless it exists already, and skip
+    older runs nobody has started - a worker that was down catches up with one run
+
+    Args:
+        name: Job name
+        scheduled_for: UTC datetime of the run
+    """
+    db.session.execute(
+        sqlite_insert(JobRun)
+        .values(name=name, scheduled_for=scheduled_for, status='pending', attempts=0)
+        .on_conflict_do_nothing(index_elements=['name', 'scheduled_for'])
+    )
+    db.session.execute(
+        update(JobRun)
+        .where(JobRun.name == name, JobRun.status == 'pending', JobRun.scheduled_for < scheduled_for)
+        .values(status='skipped', finished_at=datetime.utcnow())
+    )
+
+def claimable_runs(max_attempts):
+    """
+    IDs of runs a worker may try to claim, oldest first: due pending runs and
+    running ones whose lease expired. Runs out of attempts are marked failed here.
+    """
+    now = datetime.utcnow()
+    db.session.execute(
+        update(JobRun)
+        .where(JobRun.status == 'running', JobRun.lease_expires_at < now, JobRun.attempts >= max_attempts)
+        .values(status='failed', finished_at=now, lease_owner=None, last_error='Lease expired')
+    )
+    return [run_id for (run_id,) in db.session.query(JobRun.id).filter(
+        or_(
+            and_(JobRun.status == 'pending', JobRun.scheduled_for <= now),
+            and_(JobRun.status == 'running', JobRun.lease_expires_at < now)
+        )
+    ).order_by(JobRun.scheduled_for, JobRun.id)]
+
+def claim_run(run_id, owner, lease_seconds, max_attempts):
+    """
+    Lease a run to one worker
+    The UPDATE only matches while the run is still claimable and no other run of
+    the same job holds a live lease, so of several workers racing for it exactly
+    one sees a row count of 1. The caller commits.
+
+    Returns:
+        True if this worker now holds the lease
+    """
+    now = datetime.utcnow()
+    other = aliased(JobRun)
+    running_elsewhere = exists().where(
+        other.name == JobRun.name,
+        other.id != JobRun.id,
+        other.status == 'running',
+        other.lease_expires_at >= now
+    )
+    result = db.session.execute(
+        update(JobRun)
+        .where(
+            JobRun.id == run_id,
+            JobRun.attempts < max_attempts,
+            or_(
+                and_(JobRun.status == 'pending', JobRun.scheduled_for <= now),
+                and_(JobRun.status == 'running', JobRun.lease_expires_at < now)
+            ),
+            ~running_elsewhere
+        )
+        .values(
+            status='running', lease_owner=owner, lease_expires_at=now + timedelta(seconds=lease_seconds),
+            heartbeat_at=now, started_at=now, attempts=JobRun.attempts + 1
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+def renew_lease(run_id, owner, lease_seconds):
+    """
+    Heartbeat: extend a lease this worker still holds
+
+    Returns:
+        False if the lease was lost (it expired and another worker took the run)
+    """
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(JobRun)
+        .where(JobRun.id == run_id, JobRun.lease_owner == owner, JobRun.status == 'running')
+        .values(lease_expires_at=now + timedelta(seconds=lease_seconds), heartbeat_at=now)
+    )
+    return result.rowcount == 1
+
+def finish_run(run_id, owner, max_attempts, error=None):
+    """
+    Record the outcome of a run this worker holds
+    A failed run goes back to pending for another attempt until max_attempts is reached.
+    The caller commits.
+    """
+    values = {'status': 'done'}
+    if error is not None:
+        values = {
+            'status': case((JobRun.attempts >= max_attempts, 'failed'), else_='pending'),
+            'last_error': error[:1000]
+        }
+    db.session.execute(
+        update(JobRun)
+        .where(JobRun.id == run_id, JobRun.lease_owner == owner)
+        .values(lease_owner=None, lease_expires_at=None, finished_at=datetime.utcnow(), **values)
+    )
+
+def prune_job_runs():
+    """Delete finished runs older than JOB_HISTORY_DAYS, keeping the newest run of every job"""
+    newest = db.select(db.func.max(JobRun.id)).group_by(JobRun.name)
+    db.session.execute(
+        delete(JobRun).where(
+            JobRun.status.in_(['done', 'failed', 'skipped']),
+            JobRun.scheduled_for < datetime.utcnow() - timedelta(days=JOB_HISTORY_DAYS),
+            JobRun.id.not_in(newest)
+        )
+    )
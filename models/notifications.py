@@ -1,8 +1,11 @@
 from extensions import db
 from models.user import User
 from models.event import Event
-from utils.email_utils import send_email
-from sqlalchemy import and_
+from models.recurrence import expand_events, window_filter
+from models.tags import UserTag, split_tags
+from utils.db_engine import chunks
+from utils.email_utils import enqueue_emails
+from sqlalchemy import and_, insert
 from datetime import datetime, timedelta
 from flask import current_app
 
@@ -23,104 +26,146 @@ class Notification(db.Model):
 
     # Notification timing and details
     days_before = db.Column(db.Integer, nullable=False)  # How many days before event
+    occurrence_date = db.Column(db.Date, nullable=True)  # Which occurrence of a recurring series
     type = db.Column(db.String(50))  # Notification type (e.g., 'email')
     message = db.Column(db.Text)     # Content of the notification
     created_at = db.Column(db.DateTime, default=db.func.now())  # When notification was sent
 
+    # Duplicate checks look up everything already sent for a batch of occurrences
+    __table_args__ = (db.Index('ix_notifications_event_id_occurrence_date', 'event_id', 'occurrence_date'),)
+
+# Notification rules based on event priority: days before the event to send a reminder
+PRIORITY_RULES = {
+    2: [7, 2, 1],  # High priority: multiple reminders
+    1: [2, 1],     # Medium priority: fewer reminders
+    0: [1]         # Low priority: single reminder
+}
+
+def reminder_candidates_query(window_start, window_end):
+    """
+    Events that may need a reminder for an occurrence in [window_start, window_end)
+    Silenced events are skipped; the time range is index-backed (see window_filter)
+    """
+    return Event.query.filter(
+        Event.priority.in_(list(PRIORITY_RULES)),
+        window_filter(window_start, window_end),
+        Event.notifications_silenced == False  # Skip silenced events
+    )
+
 def send_event_reminders(app):
     """
-    Send email reminders for upcoming events based on priority rules
-    Called by the scheduler to automatically notify users of upcoming events
+    Queue email reminders for upcoming events based on priority rules
+    Called by the scheduler to automatically notify users of upcoming events;
+    the emails are delivered afterwards by utils.email_utils.deliver_outbox
 
     Priority-based notification schedule:
     - High priority (2): 7, 2, and 1 days before
     - Medium priority (1): 2 and 1 days before
     - Low priority (0): 1 day before
 
+    The work is set-based so the number of queries does not grow with events or users:
+    one query loads every candidate event in the reminder window, one builds a
+    tag -> users index from user_tags, one per chunk of events finds reminders that
+    were already sent, and the queued emails and new Notification rows are bulk-inserted.
+
     Args:
         app: Flask application instance for database context
     """
     with app.app_context():
-        now = datetime.now()
-
-        # Define notification rules based on event priority
-        PRIORITY_RULES = {
-            2: [7, 2, 1],  # High priority: multiple reminders
-            1: [2, 1],     # Medium priority: fewer reminders
-            0: [1]         # Low priority: single reminder
-        }
-
-        # Process each priority level and notification timing
-        for priority, days_list in PRIORITY_RULES.items():
-            for days_before in days_list:
-                # Calculate target date for events to notify about
-                target_date = now + timedelta(days=days_before)
-
-                # Find matching events (excluding silenced ones)
-                matching_events = Event.query.filter(
-                    Event.priority == priority,
-                    db.func.date(Event.start_time) == target_date.date(),
-                    Event.notifications_silenced == False  # Skip silenced events
-                ).all()
-
-                # Process each matching event
-                for event in matching_events:
-                    notified_users = set()
-
-                    # Handle personal events (no tags - only notify creator)
-                    if not event.tags or event.tags.strip() == "":
-                        user = User.query.get(event.creator_id)
-                        if user:
-                            notified_users.add(user)
-
-                    else:
-                        # Handle shared events (tag-based - notify users with matching tags)
-                        event_tags = [tag.strip().lower() for tag in event.tags.split(',')]
-
-                        # Check all users for matching tags
-                        all_users = User.query.all()
-                        for user in all_users:
-                            user_tags = [tag.strip().lower() for tag in user.tags] if user.tags else []
-                            # Notify user if they have any matching tags
-                            if any(tag in event_tags for tag in user_tags):
-                                notified_users.add(user)
-
-                    # Send notifications to all identified users
-                    for user in notified_users:
-                        # Check for duplicate notifications to prevent spam
-                        already_sent = Notification.query.filter_by(
-                            user_id=user.id,
-                            event_id=event.id,
-                            days_before=days_before,
-                            type="email"
-                        ).first()
-
-                        # Skip if notification already sent
-                        if already_sent:
-                            continue
-
-                        # Compose email content
-                        subject = f"Upcoming Event: {event.title}"
-                        body = (
-                            f"Reminder: '{event.title}' is happening in {days_before} day(s).\n\n"
-                            f"Details: {event.description or 'No description provided.'}"
-                        )
-
-                        # Send the email
-                        send_email(app, user.email, subject, body)
-
-                        # Record the notification to prevent duplicates
-                        notif = Notification(
-                            user_id=user.id,
-                            event_id=event.id,
-                            days_before=days_before,
-                            type="email",
-                            message=body
-                        )
-                        db.session.add(notif)
-
-                        print(f"✅ Sent to {user.email} for event '{event.title}' ({days_before}d before)")
-
-        # Commit all notification records to database
+        today = datetime.now().date()
+        max_days = max(max(days) for days in PRIORITY_RULES.values())
+        window_start = datetime.combine(today + timedelta(days=1), datetime.min.time())
+        window_end = datetime.combine(today + timedelta(days=max_days + 1), datetime.min.time())
+
+        # Load every candidate in the window at once (excluding silenced ones) and
+        # keep the occurrences whose distance from today matches their priority rule
+        candidates = reminder_candidates_query(window_start, window_end).all()
+        due = []
+        for occurrence in expand_events(candidates, window_start, window_end):
+            days_before = (occurrence.start_time.date() - today).days
+            if days_before in PRIORITY_RULES[occurrence.event.priority]:
+                due.append((occurrence, days_before, split_tags(occurrence.tags)))
+
+        if not due:
+            print("✅ All reminders processed.")
+            return
+
+        # Inverted index tag -> user IDs, built once for every tag in play
+        wanted_tags = sorted({tag for _, _, tags in due for tag in tags})
+        users_by_tag = {}
+        for tag_chunk in chunks(wanted_tags):
+            for tag, user_id in db.session.query(UserTag.tag, UserTag.user_id).filter(UserTag.tag.in_(tag_chunk)):
+                users_by_tag.setdefault(tag, set()).add(user_id)
+
+        # Candidate (user, event, days_before, occurrence_date) reminders
+        candidate_keys = []
+        for occurrence, days_before, tags in due:
+            if tags:
+                # Shared events (tag-based - notify users with matching tags)
+                recipients = set()
+                for tag in tags:
+                    recipients.update(users_by_tag.get(tag, ()))
+            else:
+                # Personal events (no tags - only notify creator)
+                recipients = {occurrence.event.creator_id}
+            occurrence_date = occurrence.start_time.date()
+            for user_id in recipients:
+                candidate_keys.append((user_id, occurrence, days_before, occurrence_date))
+
+        # Anti-join against reminders that were already sent for these occurrences
+        event_ids = sorted({occurrence.event.id for occurrence, _, _ in due})
+        already_sent = set()
+        for id_chunk in chunks(event_ids):
+            sent_rows = db.session.query(
+                Notification.user_id, Notification.event_id, Notification.days_before, Notification.occurrence_date
+            ).filter(
+                Notification.event_id.in_(id_chunk),
+                Notification.occurrence_date >= window_start.date(),
+                Notification.occurrence_date < window_end.date(),
+                Notification.type == "email"
+            )
+            already_sent.update(tuple(row) for row in sent_rows)
+        pending = [
+            key for key in candidate_keys
+            if (key[0], key[1].event.id, key[2], key[3]) not in already_sent
+        ]
+
+        # Resolve recipient addresses in bulk
+        user_ids = sorted({user_id for user_id, _, _, _ in pending})
+        emails = {}
+        for id_chunk in chunks(user_ids):
+            emails.update(db.session.query(User.id, User.email).filter(User.id.in_(id_chunk)))
+
+        new_rows = []
+        emails_to_queue = []
+        for user_id, occurrence, days_before, occurrence_date in pending:
+            email = emails.get(user_id)
+            if not email:
+                continue
+
+            # Compose email content
+            subject = f"Upcoming Event: {occurrence.title}"
+            body = (
+                f"Reminder: '{occurrence.title}' is happening in {days_before} day(s).\n\n"
+                f"Details: {occurrence.description or 'No description provided.'}"
+            )
+
+            # Queue the email; it is delivered by deliver_outbox() once this run commits
+            emails_to_queue.append((email, subject, body))
+
+            # Record the notification to prevent duplicates
+            new_rows.append({
+                'user_id': user_id,
+                'event_id': occurrence.event.id,
+                'days_before': days_before,
+                'occurrence_date': occurrence_date,
+                'type': "email",
+                'message': body
+            })
+
+        # Bulk-insert the queued emails and notification records and commit them together
+        enqueue_emails(emails_to_queue)
+        if new_rows:
+            db.session.execute(insert(Notification), new_rows)
         db.session.commit()
-        print("✅ All reminders processed.")
+        print(f"✅ All reminders processed ({len(new_rows)} queued).")
@@ -0,0 +1,43 @@
+# Outbox model for queued outgoing email
+from datetime import datetime
+from extensions import db
+
+class OutboxMessage(db.Model):
+    """
+    Email waiting to be delivered by utils.email_utils.deliver_outbox
+    Rows are written in the same transaction as the change that triggers them,
+    so a message is queued if and only if that change is committed
+
+    Status lifecycle:
+    - pending: waiting for delivery (or for its next retry after next_attempt_at)
+    - sending: claimed by a delivery run; reset to pending if the run dies
+    - sent: delivered to the SMTP server
+    - dead: gave up after OUTBOX_MAX_ATTEMPTS failures (dead letter)
+
+    Sent and dead rows are deleted after OUTBOX_RETENTION_DAYS by utils.email_utils.prune_outbox
+    """
+    __tablename__ = 'outbox_messages'
+
+    # Primary key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Message content
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+
+    # Delivery state
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+
+    # Claim bookkeeping so concurrent delivery runs never send the same message
+    claim_token = db.Column(db.String(36), nullable=True, index=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=db.func.now())
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    # Delivery runs look for due pending messages
+    __table_args__ = (db.Index('ix_outbox_messages_status_next_attempt_at', 'status', 'next_attempt_at'),)
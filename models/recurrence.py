@@ -0,0 +1,270 @@
+# Recurrence rules for recurring event series
+# A series is stored as one master Event row carrying the rule; occurrences are
+# generated on the fly for the requested window and EventExceptions are applied as overrides
+from datetime import datetime, time, timedelta
+from dateutil.rrule import rrule, DAILY, WEEKLY, MONTHLY
+from sqlalchemy import and_, or_
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.expression import UnaryExpression
+from extensions import db
+from models.event import Event, longest_event_span
+from models.event_exceptions import EventExceptions
+
+# Supported recurrence units and their rrule frequencies
+FREQUENCIES = {
+    'daily': DAILY,
+    'weekly': WEEKLY,
+    'monthly': MONTHLY
+}
+
+# Weekday codes as sent by the event forms, indexed like datetime.weekday()
+WEEKDAY_CODES = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+class Occurrence:
+    """
+    A single occurrence of an event in a calendar window
+    Field values come from the matching exception when one exists, otherwise from the event
+    """
+    __slots__ = ('event', 'start_time', 'end_time', 'original_date', 'exception')
+
+    def __init__(self, event, start_time, end_time, original_date, exception=None):
+        self.event = event
+        self.start_time = start_time
+        self.end_time = end_time
+        self.original_date = original_date  # Date the rule generated this occurrence on
+        self.exception = exception
+
+    def _value(self, name):
+        if self.exception is not None and getattr(self.exception, name) is not None:
+            return getattr(self.exception, name)
+        return getattr(self.event, name)
+
+    @property
+    def id(self):
+        return self.event.id
+
+    @property
+    def title(self):
+        return self._value('title')
+
+    @property
+    def description(self):
+        return self._value('description')
+
+    @property
+    def priority(self):
+        return self._value('priority')
+
+    @property
+    def tags(self):
+        # An exception with tags '' deliberately clears them, so only None falls back
+        if self.exception is not None and self.exception.tags is not None:
+            return self.exception.tags
+        return self.event.tags
+
+def is_series(event):
+    """Return True for a series master row (as opposed to a single or legacy materialised event)"""
+    return event.recurrence_unit is not None
+
+def build_rule(unit, interval, weekdays, dtstart, until):
+    """
+    Build the dateutil rule for a series
+
+    Args:
+        unit: 'daily', 'weekly' or 'monthly'
+        interval: Repeat every N units
+        weekdays: Weekday codes (e.g. ['MO', 'WE']) for weekly series, may be empty
+        dtstart: Start datetime of the first candidate occurrence
+        until: Last date (inclusive) an occurrence may start on
+    """
+    byweekday = None
+    if unit == 'weekly' and weekdays:
+        byweekday = [WEEKDAY_CODES.index(code) for code in weekdays]
+    return rrule(
+        FREQUENCIES[unit],
+        dtstart=dtstart,
+        interval=interval,
+        byweekday=byweekday,
+        until=datetime.combine(until, time.max)
+    )
+
+def split_weekdays(value):
+    """Split the stored weekday codes into a list"""
+    return [code for code in (value or '').split(',') if code]
+
+def event_rule(event):
+    """Build the rule stored on a series master"""
+    return build_rule(
+        event.recurrence_unit,
+        event.recurrence_interval or 1,
+        split_weekdays(event.recurrence_weekdays),
+        event.start_time,
+        event.recurrence_until
+    )
+
+def iter_occurrence_starts(event, window_start=None, window_end=None):
+    """
+    Yield the start datetimes of a series' occurrences that overlap [window_start, window_end)
+    Either bound may be None to leave that side of the window open
+    """
+    duration = event.end_time - event.start_time
+    rule = event_rule(event)
+    starts = rule if window_start is None else rule.xafter(window_start - duration)
+    for start in starts:
+        if window_end is not None and start >= window_end:
+            break
+        yield start
+
+def occurrence_on(event, occurrence_date):
+    """
+    Return the occurrence a series master generates on a date, with its exception applied
+    Returns None when the rule has no occurrence that day or it was deleted
+    """
+    start = datetime.combine(occurrence_date, event.start_time.time())
+    if start not in event_rule(event).between(start, start, inc=True):
+        return None
+    exception = EventExceptions.query.filter_by(original_event_id=event.id, exception_date=occurrence_date).first()
+    return _make_occurrence(event, start, event.end_time - event.start_time, exception)
+
+def _unindexed(column):
+    # Unary + leaves the value alone but keeps SQLite from answering the term with an
+    # index, and from factoring a shared start_time < window_end term out of an OR
+    return UnaryExpression(column, operator=operators.custom_op('+'), type_=column.type)
+
+def window_filter(window_start, window_end):
+    """
+    SQL condition matching events that may have an occurrence overlapping the window
+    Single events must overlap it directly; series masters must have started before
+    it ends and not finished before it starts. expand_events() does the exact check.
+
+    Both branches are half-open ranges that SQLite can answer from an index, so the
+    planner runs them as a MULTI-INDEX OR instead of scanning the events table:
+    - single events use ix_events_start_time_end_time (or the priority/silenced variants),
+      with start_time bounded below by the longest event span so the range is two-sided
+    - series masters use the partial index ix_events_recurrence_until_start_time
+    The planner relies on sqlite_stat1 to prefer these over the low-selectivity
+    notifications_silenced column, so the migration that adds them runs ANALYZE.
+    """
+    earliest_start = window_start - longest_event_span()
+    return or_(
+        and_(
+            Event.start_time >= earliest_start,
+            Event.start_time < window_end,
+            Event.end_time > window_start
+        ),
+        and_(
+            # Occurrences start and end on the same day, so one day of slack is enough
+            Event.recurrence_until >= (window_start - timedelta(days=1)).date(),
+            _unindexed(Event.start_time) < window_end,
+            Event.recurrence_unit != None
+        )
+    )
+
+def _make_occurrence(event, start, duration, exception):
+    if exception is None:
+        return Occurrence(event, start, start + duration, start.date())
+    if exception.title is None:
+        return None  # Deleted occurrence
+    return Occurrence(
+        event,
+        exception.start_time or start,
+        exception.end_time or start + duration,
+        start.date(),
+        exception
+    )
+
+def expand_events(events, window_start=None, window_end=None):
+    """
+    Expand events into the occurrences that overlap a window
+    Series masters generate occurrences from their rule, every other row is one occurrence.
+    Exceptions for all recurring rows are loaded in a single query and applied as overrides;
+    deleted occurrences are dropped.
+
+    Args:
+        events: Event rows, typically filtered with window_filter()
+        window_start: Start of the window, or None for no lower bound
+        window_end: End of the window (exclusive), or None for no upper bound
+
+    Returns:
+        List of Occurrence objects ordered by start time
+    """
+    recurring_ids = [event.id for event in events if event.is_recurring]
+    exception_map = {}
+    if recurring_ids:
+        exceptions = EventExceptions.query.filter(EventExceptions.original_event_id.in_(recurring_ids)).all()
+        for exc in exceptions:
+            exception_map[(exc.original_event_id, exc.exception_date)] = exc
+
+    occurrences = []
+    for event in events:
+        duration = event.end_time - event.start_time
+        if is_series(event):
+            starts = iter_occurrence_starts(event, window_start, window_end)
+        else:
+            starts = [event.start_time]
+        for start in starts:
+            exception = exception_map.get((event.id, start.date())) if event.is_recurring else None
+            occurrence = _make_occurrence(event, start, duration, exception)
+            if occurrence is not None:
+                occurrences.append(occurrence)
+
+    occurrences.sort(key=lambda occurrence: occurrence.start_time)
+    return occurrences
+
+def split_series(event, from_date):
+    """
+    Split a series master so that occurrences from from_date onwards belong to a new master
+    The original series is cut off the day before, and exceptions on or after from_date move
+    to the new master. Returns the event itself when from_date is not after its first occurrence.
+
+    Args:
+        event: Series master to split
+        from_date: Date of the first occurrence that should move to the new master
+    """
+    if from_date <= event.start_time.date():
+        return event
+
+    duration = event.end_time - event.start_time
+    next_start = event_rule(event).after(datetime.combine(from_date, time.min), inc=True)
+    if next_start is None:
+        return None
+
+    new_event = Event(
+        title=event.title,
+        description=event.description,
+        priority=event.priority,
+        tags=event.tags,
+        start_time=next_start,
+        end_time=next_start + duration,
+        is_recurring=True,
+        recurrence_group_id=event.recurrence_group_id,
+        recurrence_unit=event.recurrence_unit,
+        recurrence_interval=event.recurrence_interval,
+        recurrence_weekdays=event.recurrence_weekdays,
+        recurrence_until=event.recurrence_until,
+        notifications_silenced=event.notifications_silenced,
+        creator_id=event.creator_id
+    )
+    db.session.add(new_event)
+    db.session.flush()
+
+    event.recurrence_until = from_date - timedelta(days=1)
+    EventExceptions.query.filter(
+        EventExceptions.original_event_id == event.id,
+        EventExceptions.exception_date >= from_date
+    ).update({'original_event_id': new_event.id}, synchronize_session=False)
+    return new_event
+
+def truncate_series(event, from_date):
+    """
+    Remove the occurrences of a series master from from_date onwards
+    Returns False when nothing would be left and the master itself should be deleted
+    """
+    if from_date <= event.start_time.date():
+        return False
+    event.recurrence_until = from_date - timedelta(days=1)
+    EventExceptions.query.filter(
+        EventExceptions.original_event_id == event.id,
+        EventExceptions.exception_date >= from_date
+    ).delete(synchronize_session=False)
+    return True
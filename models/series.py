@@ -0,0 +1,91 @@
+# Set-based operations on recurring series and their dependent rows
+# Every operation is a fixed number of UPDATE/DELETE statements keyed on
+# recurrence_group_id (or a list of event IDs), however many rows a series has
+from sqlalchemy import delete, update
+from extensions import db
+from models.event import Event
+from models.event_changes import defer_changes
+from models.event_exceptions import EventExceptions
+from models.inbox import delete_inbox_items
+from models.notifications import Notification
+from models.tags import delete_event_tags, sync_event_tags
+from models.tombstone import record_event_deletions
+
+# SQLAlchemy's SQLite storage format for DateTime columns; time-of-day rewrites
+# must produce the same text so range comparisons keep working
+SQLITE_TIME_FORMAT = '%H:%M:%S.%f'
+
+def series_event_ids(group_id, from_time=None):
+    """
+    IDs of the rows of a series: its master(s) after any splits, or one row per
+    occurrence for series stored before recurrence rules
+
+    Args:
+        group_id: recurrence_group_id of the series
+        from_time: Only rows starting at or after this datetime (None = all)
+    """
+    query = db.session.query(Event.id).filter(Event.recurrence_group_id == group_id)
+    if from_time is not None:
+        query = query.filter(Event.start_time >= from_time)
+    return [event_id for (event_id,) in query]
+
+def delete_events(event_ids):
+    """
+    Delete events together with their exceptions, reminders, inbox and tag rows, and leave tombstones
+    One DELETE per table; the caller commits
+
+    Args:
+        event_ids: IDs of the events to delete
+    """
+    event_ids = list(event_ids)
+    if not event_ids:
+        return 0
+    defer_changes(event_ids)
+
+    # ORM-enabled deletes, so loaded Event/EventExceptions objects are marked deleted too
+    db.session.execute(delete(EventExceptions).where(EventExceptions.original_event_id.in_(event_ids)))
+    db.session.execute(delete(Notification).where(Notification.event_id.in_(event_ids)))
+    delete_inbox_items(event_ids)
+    delete_event_tags(event_ids)
+    db.session.execute(delete(Event).where(Event.id.in_(event_ids)))
+    record_event_deletions(event_ids)
+    return len(event_ids)
+
+def delete_series(group_id):
+    """Delete every row of a series and everything that hangs off it; returns the row count"""
+    return delete_events(series_event_ids(group_id))
+
+def update_series(group_id, values, start_time=None, end_time=None, from_time=None):
+    """
+    Apply the same field values to every row of a series in one UPDATE
+    Each row keeps its own date; start_time/end_time (datetime.time) replace the time of day
+
+    Args:
+        group_id: recurrence_group_id of the series
+        values: Column values to set, e.g. {'title': ..., 'tags': ...}
+        start_time, end_time: New time of day for every row (None = unchanged)
+        from_time: Only rows starting at or after this datetime (None = all)
+
+    Returns:
+        IDs of the updated rows
+    """
+    event_ids = series_event_ids(group_id, from_time)
+    if not event_ids:
+        return event_ids
+    defer_changes(event_ids)
+
+    values = dict(values)
+    if start_time is not None:
+        values['start_time'] = db.func.date(Event.start_time).concat(' ' + start_time.strftime(SQLITE_TIME_FORMAT))
+    if end_time is not None:
+        values['end_time'] = db.func.date(Event.end_time).concat(' ' + end_time.strftime(SQLITE_TIME_FORMAT))
+    # ORM-enabled update, so loaded Event objects see the new values
+    db.session.execute(update(Event).where(Event.id.in_(event_ids)).values(**values))
+
+    if 'tags' in values:
+        sync_event_tags(event_ids)
+    return event_ids
+
+def set_series_silenced(group_id, silenced):
+    """Silence or re-enable reminders for every row of a series in one UPDATE; returns the row count"""
+    return len(update_series(group_id, {'notifications_silenced': silenced}))
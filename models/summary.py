@@ -0,0 +1,166 @@
+# Content-addressed cache of AI event summaries
+# A summary depends only on the text sent to the model, so it is stored under a hash
+# of that text and shared by every viewer of the event (and every identical occurrence).
+# The worker pre-generates summaries for upcoming events so popups rarely wait on the API.
+import hashlib
+import json
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from extensions import db
+from models.event import Event
+from models.recurrence import expand_events, window_filter
+from utils.db_engine import chunks
+from utils.input_validation import sanitize_string
+from utils.summariser import PROMPT_VERSION, SummariserBusy, build_prompt, summariser
+
+# Summary cache defaults - override through app.config
+SUMMARY_CACHE_DEFAULTS = {
+    'SUMMARY_CACHE_MAX_ROWS': 5000,         # Least recently used summaries beyond this are evicted
+    'SUMMARY_CACHE_TTL_DAYS': 30,           # Summaries are regenerated after this long
+    'SUMMARY_PREGENERATE_DAYS': 7,          # Pre-generate for events starting within this many days
+    'SUMMARY_PREGENERATE_LIMIT': 200        # Upstream calls per pre-generation run
+}
+
+# last_used_at is only rewritten when older than this, so cache hits are reads
+TOUCH_INTERVAL = timedelta(hours=1)
+
+class EventSummary(db.Model):
+    """Generated summary for one (title, description, start, end, prompt version)"""
+    __tablename__ = 'event_summaries'
+
+    key = db.Column(db.String(64), primary_key=True)  # sha256 hex, see summary_key()
+    summary = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+def summary_key(title, description, start_time, end_time):
+    """
+    Cache key of a summary: sha256 of the prompt inputs and PROMPT_VERSION
+
+    Args:
+        title, description, start_time, end_time: Sanitized event fields as strings
+    """
+    payload = json.dumps([PROMPT_VERSION, title, description, start_time, end_time], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def summary_fields(source):
+    """
+    The (title, description, start, end) strings /api/summarise receives for an event or occurrence
+    Matches what the popup posts: the /api/event/<id> fields, sanitized like the route does
+    """
+    return (
+        sanitize_string(source.title or '', 200),
+        sanitize_string(source.description or '', 2000),
+        sanitize_string(source.start_time.isoformat(), 50),
+        sanitize_string(source.end_time.isoformat(), 50)
+    )
+
+def cached_summary(key):
+    """Return a stored summary that has not expired, or None"""
+    now = datetime.utcnow()
+    ttl = timedelta(days=current_app.config['SUMMARY_CACHE_TTL_DAYS'])
+    row = db.session.query(EventSummary.summary, EventSummary.created_at, EventSummary.last_used_at).filter(
+        EventSummary.key == key
+    ).first()
+    if row is None or row.created_at < now - ttl:
+        return None
+    if row.last_used_at < now - TOUCH_INTERVAL:
+        db.session.execute(update(EventSummary).where(EventSummary.key == key).values(last_used_at=now))
+        db.session.commit()
+    return row.summary
+
+def store_summary(key, summary):
+    """Insert or replace a summary; the caller commits"""
+    now = datetime.utcnow()
+    db.session.execute(
+        sqlite_insert(EventSummary)
+        .values(key=key, summary=summary, created_at=now, last_used_at=now)
+        .on_conflict_do_update(index_elements=['key'], set_={'summary': summary, 'created_at': now, 'last_used_at': now})
+    )
+
+def event_summary(title, description, start_time, end_time):
+    """
+    Summary for the given event fields, from the cache or generated and stored
+
+    Raises:
+        SummariserError (and subclasses) when the model has to be called and fails
+    """
+    key = summary_key(title, description, start_time, end_time)
+    summary = cached_summary(key)
+    if summary is None:
+        # Release the pooled connection while the model is called (up to SUMMARISER_READ_TIMEOUT);
+        # the summary is stored in a transaction of its own
+        db.session.rollback()
+        summary = summariser.generate(build_prompt(title, description, start_time, end_time))
+        store_summary(key, summary)
+        db.session.commit()
+    return summary
+
+def evict_summaries():
+    """Delete expired summaries and the least recently used ones beyond SUMMARY_CACHE_MAX_ROWS"""
+    config = current_app.config
+    db.session.execute(delete(EventSummary).where(
+        EventSummary.created_at < datetime.utcnow() - timedelta(days=config['SUMMARY_CACHE_TTL_DAYS'])
+    ))
+    keep = db.select(EventSummary.key).order_by(EventSummary.last_used_at.desc()).limit(config['SUMMARY_CACHE_MAX_ROWS'])
+    db.session.execute(delete(EventSummary).where(EventSummary.key.not_in(keep)))
+    db.session.commit()
+
+def _existing_keys(keys):
+    # Keys with a stored summary that has not expired
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config['SUMMARY_CACHE_TTL_DAYS'])
+    existing = set()
+    for chunk in chunks(keys):
+        existing.update(key for (key,) in db.session.query(EventSummary.key).filter(
+            EventSummary.key.in_(chunk), EventSummary.created_at >= cutoff
+        ))
+    return existing
+
+def pregenerate_summaries(app):
+    """
+    Generate missing summaries for occurrences in the next SUMMARY_PREGENERATE_DAYS days
+    Called by the worker. Makes at most SUMMARY_PREGENERATE_LIMIT upstream calls per run
+    and stops early if the summariser is saturated, leaving the rest for the next run.
+
+    Returns:
+        Number of summaries generated
+    """
+    with app.app_context():
+        config = app.config
+        window_start = datetime.utcnow()
+        window_end = window_start + timedelta(days=config['SUMMARY_PREGENERATE_DAYS'])
+        events = Event.query.filter(window_filter(window_start, window_end)).all()
+
+        # Occurrences whose fields are identical share one key
+        wanted = {}
+        for occurrence in expand_events(events, window_start, window_end):
+            fields = summary_fields(occurrence)
+            wanted.setdefault(summary_key(*fields), fields)
+        existing = _existing_keys(wanted)
+        missing = [key for key in wanted if key not in existing]
+        # No transaction stays open across the upstream calls; each summary commits on its own
+        db.session.rollback()
+
+        generated = 0
+        for key in missing[:config['SUMMARY_PREGENERATE_LIMIT']]:
+            try:
+                summary = summariser.generate(build_prompt(*wanted[key]))
+            except SummariserBusy:
+                break  # Interactive requests have the slots; try again next run
+            except Exception as e:
+                print(f"❌ Could not pre-generate a summary: {e}")
+                continue
+            store_summary(key, summary)
+            db.session.commit()
+            generated += 1
+
+        evict_summaries()
+        print(f"✅ Pre-generated {generated} event summaries ({len(missing) - generated} still missing).")
+        return generated
+
+def init_summary_cache(app):
+    """Apply the summary cache defaults to app.config"""
+    for key, value in SUMMARY_CACHE_DEFAULTS.items():
+        app.config.setdefault(key, value)
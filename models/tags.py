@@ -0,0 +1,96 @@
+# Normalized tag index for events and users
+# Replaces substring matching on the comma-separated tag columns with indexed lookups
+from extensions import db
+from models.event import Event
+from models.event_exceptions import EventExceptions
+from sqlalchemy import delete, insert
+
+class EventTag(db.Model):
+    """
+    One row per (event, tag) pair
+    Mirrors Event.tags plus any tags set on the event's exceptions,
+    so an occurrence retagged through an exception is still found by tag
+    """
+    __tablename__ = 'event_tags'
+
+    event_id = db.Column(db.Integer, db.ForeignKey('events.id', ondelete='CASCADE'), primary_key=True)
+    tag = db.Column(db.String(100), primary_key=True)
+
+    # Lookup direction used by visibility queries: tag -> events
+    __table_args__ = (db.Index('ix_event_tags_tag_event_id', 'tag', 'event_id'),)
+
+class UserTag(db.Model):
+    """
+    One row per (user, tag) pair
+    Holds the user's effective tags (public, role and profile tags) as returned by User.tags
+    """
+    __tablename__ = 'user_tags'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    tag = db.Column(db.String(100), primary_key=True)
+
+    # Lookup direction used when finding recipients: tag -> users
+    __table_args__ = (db.Index('ix_user_tags_tag_user_id', 'tag', 'user_id'),)
+
+def split_tags(value):
+    """
+    Split a comma-separated tag string into a sorted list of unique tags
+    Tags are stripped and lower-cased so matching is exact and case-insensitive
+    """
+    if not value:
+        return []
+    return sorted({tag.strip().lower() for tag in value.split(',') if tag.strip()})
+
+def sync_event_tags(event_ids):
+    """
+    Rebuild the event_tags rows for the given events from their current tags
+    Must be called after any write to Event.tags or EventExceptions.tags
+
+    Args:
+        event_ids: Iterable of event IDs to resynchronise
+    """
+    event_ids = list(event_ids)
+    if not event_ids:
+        return
+
+    # Make pending ORM changes visible to the queries below
+    db.session.flush()
+
+    tags_by_event = {event_id: set() for event_id in event_ids}
+    for event_id, tags in db.session.query(Event.id, Event.tags).filter(Event.id.in_(event_ids)):
+        tags_by_event[event_id].update(split_tags(tags))
+    exception_tags = db.session.query(EventExceptions.original_event_id, EventExceptions.tags).filter(
+        EventExceptions.original_event_id.in_(event_ids),
+        EventExceptions.tags != None
+    )
+    for event_id, tags in exception_tags:
+        tags_by_event[event_id].update(split_tags(tags))
+
+    db.session.execute(delete(EventTag).where(EventTag.event_id.in_(event_ids)))
+    rows = [
+        {'event_id': event_id, 'tag': tag}
+        for event_id, tags in tags_by_event.items()
+        for tag in tags
+    ]
+    if rows:
+        db.session.execute(insert(EventTag), rows)
+
+def delete_event_tags(event_ids):
+    """Remove the event_tags rows of events that are being deleted"""
+    event_ids = list(event_ids)
+    if event_ids:
+        db.session.execute(delete(EventTag).where(EventTag.event_id.in_(event_ids)))
+
+def sync_user_tags(user):
+    """
+    Rebuild the user_tags rows for a user from User.tags
+    Must be called after registration and after any profile tag change
+
+    Args:
+        user: User instance (flushed so it has an ID)
+    """
+    db.session.flush()
+    tags = split_tags(','.join(user.tags))
+    db.session.execute(delete(UserTag).where(UserTag.user_id == user.id))
+    if tags:
+        db.session.execute(insert(UserTag), [{'user_id': user.id, 'tag': tag} for tag in tags])
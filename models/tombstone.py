@@ -0,0 +1,50 @@
+# Tombstones for deleted events
+# Lets clients that sync the calendar feed incrementally learn which events disappeared
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert
+from extensions import db
+
+# How long deletions are remembered; older sync cursors get a full reload instead
+TOMBSTONE_RETENTION_DAYS = 30
+
+class EventTombstone(db.Model):
+    """
+    One row per deleted event, kept for TOMBSTONE_RETENTION_DAYS
+    Delta responses list deletions before changes, so a reused event ID is still applied correctly
+    """
+    __tablename__ = 'event_tombstones'
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+def record_event_deletions(event_ids):
+    """
+    Write tombstones for events deleted in the current transaction
+
+    Args:
+        event_ids: IDs of the deleted events
+    """
+    now = datetime.utcnow()
+    rows = [{'event_id': event_id, 'deleted_at': now} for event_id in set(event_ids)]
+    if rows:
+        db.session.execute(insert(EventTombstone), rows)
+
+def deleted_event_ids(since):
+    """Return the IDs of events deleted after `since`"""
+    return [event_id for (event_id,) in
+            db.session.query(EventTombstone.event_id).filter(EventTombstone.deleted_at > since)]
+
+def tombstone_horizon():
+    """Oldest sync cursor that tombstones can still answer"""
+    return datetime.utcnow() - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+
+def prune_tombstones(app):
+    """
+    Delete tombstones older than the retention period
+    Called daily by the scheduler
+    """
+    with app.app_context():
+        result = db.session.execute(delete(EventTombstone).where(EventTombstone.deleted_at < tombstone_horizon()))
+        db.session.commit()
+        print(f"✅ Pruned {result.rowcount} event tombstones.")
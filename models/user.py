@@ -1,8 +1,7 @@
 # User model for authentication and profile management
 import secrets
-from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash, check_password_hash
 from extensions import db
+from utils.password_hashing import password_hasher
 
 class User(db.Model):
     """
@@ -20,9 +19,7 @@ class User(db.Model):
     # User-customizable profile tags (e.g., "chess-club,year-12")
     profile_tags = db.Column(db.String(255), nullable=True)
 
-    # Session management for security
-    session_token = db.Column(db.String(64), unique=True, index=True)
-    session_expiry = db.Column(db.DateTime, nullable=True)
+    # Login sessions live in their own table, one row per device (models.user_session)
     csrf_token = db.Column(db.String(64), unique=True, index=True)
 
     # Relationship to events created by this user
@@ -49,34 +46,33 @@ class User(db.Model):
         self.email = email.strip()
         self.set_password(password)
         self.role = role
-        # Generate security tokens for new user
-        self.regenerate_tokens()
+        # Generate security token for new user
+        self.generate_csrf_token()
 
     def set_password(self, password):
-        """Hash and store user password securely"""
-        self.password_hash = generate_password_hash(password)
+        """
+        Hash and store user password securely (on the hashing pool, see utils.password_hashing)
 
-    def check_password(self, password):
-        """Verify password against stored hash"""
-        return check_password_hash(self.password_hash, password)
+        Raises:
+            HashingBusy: Too many hashes are queued in this process
+        """
+        self.password_hash = password_hasher.hash(password)
 
-    def generate_session_token(self):
-        self.session_token = secrets.token_hex(32)
-        self.session_expiry = datetime.utcnow() + timedelta(hours=2)
+    def check_password(self, password):
+        """
+        Verify password against stored hash
+        A hash made with outdated parameters is replaced; the caller commits
 
-    def validate_session_token(self, token):
-        return (
-            self.session_token == token and
-            self.session_expiry and
-            self.session_expiry > datetime.utcnow()
-        )
+        Raises:
+            HashingBusy: Too many hashes are queued in this process
+        """
+        matches, new_hash = password_hasher.verify(self.password_hash, password)
+        if new_hash:
+            self.password_hash = new_hash
+        return matches
 
     def generate_csrf_token(self):
         self.csrf_token = secrets.token_hex(32)
 
     def validate_csrf_token(self, token):
         return self.csrf_token == token
-
-    def regenerate_tokens(self):
-        self.generate_session_token()
-        self.generate_csrf_token()
@@ -0,0 +1,202 @@
+# Server-side login sessions, one row per signed-in device
+# The session_token cookie holds a random token; only its sha256 is stored, so a
+# leaked database cannot be replayed as cookies. Validated tokens are cached per
+# process for a short TTL, and last_seen_at is written in batches rather than on
+# every request. Expired rows are purged by the worker (see scheduler.JOBS).
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import bindparam, delete, update
+from extensions import db
+
+# Session defaults - override through app.config
+SESSION_DEFAULTS = {
+    'SESSION_LIFETIME_HOURS': 2,            # A login lasts this long on each device
+    'SESSION_CACHE_TTL_SECONDS': 60,        # Bounds how long another process's revocation takes to apply here
+    'SESSION_CACHE_MAX_SIZE': 10000,        # Validated tokens kept per process
+    'SESSION_LAST_SEEN_FLUSH_SECONDS': 60   # Pending last_seen_at updates are written at most this often
+}
+
+class UserSession(db.Model):
+    """One signed-in device of a user"""
+    __tablename__ = 'sessions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    token_hash = db.Column(db.String(64), unique=True, nullable=False)  # sha256 hex of the cookie token
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # Range-scanned by the sweeper
+    last_seen_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    user_agent = db.Column(db.String(255), nullable=True)  # Tells a user's devices apart
+
+def hash_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+class SessionCache:
+    """
+    Thread-safe LRU cache of validated sessions: token hash -> (user_id, expires_at)
+    Entries live SESSION_CACHE_TTL_SECONDS at most, and never past the session's expiry
+    """
+
+    def __init__(self, max_size=10000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token_hash):
+        """Return the cached (user_id, expires_at), or None if missing or stale"""
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is None:
+                return None
+            user_id, expires_at, cached_until = entry
+            if cached_until < time.monotonic() or expires_at <= datetime.utcnow():
+                del self._entries[token_hash]
+                return None
+            self._entries.move_to_end(token_hash)
+            return user_id, expires_at
+
+    def put(self, token_hash, user_id, expires_at):
+        with self._lock:
+            self._entries[token_hash] = (user_id, expires_at, time.monotonic() + self.ttl)
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token_hashes):
+        with self._lock:
+            for token_hash in token_hashes:
+                self._entries.pop(token_hash, None)
+
+    def invalidate_user(self, user_id, keep=None):
+        """Drop every cached session of a user except the token hash `keep`"""
+        with self._lock:
+            for token_hash in [h for h, entry in self._entries.items() if entry[0] == user_id and h != keep]:
+                del self._entries[token_hash]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Shared by all requests handled by this process
+session_cache = SessionCache()
+
+class LastSeenBuffer:
+    """Latest request time per session, written to the database in one batch per interval"""
+
+    def __init__(self, interval=60):
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, token_hash):
+        with self._lock:
+            self._pending[token_hash] = datetime.utcnow()
+
+    def due(self):
+        return bool(self._pending) and time.monotonic() - self._last_flush >= self.interval
+
+    def take(self):
+        """Return and clear the pending {token_hash: seen_at}"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+            return pending
+
+# Shared by all requests handled by this process
+last_seen_buffer = LastSeenBuffer()
+
+def create_session(user_id, user_agent=None):
+    """
+    Start a session for a user on a new device; the caller commits and sets the cookie
+
+    Returns:
+        The raw token for the session_token cookie (only its hash is stored)
+    """
+    token = secrets.token_urlsafe(32)
+    expires_at = datetime.utcnow() + timedelta(hours=current_app.config['SESSION_LIFETIME_HOURS'])
+    db.session.add(UserSession(
+        token_hash=hash_token(token), user_id=user_id, expires_at=expires_at,
+        user_agent=(user_agent or '')[:255] or None
+    ))
+    return token
+
+def validate_token(token):
+    """
+    User ID of a live session token, or None
+    Served from the session cache when possible; records the request for last_seen_at
+    """
+    if not token:
+        return None
+    token_hash = hash_token(token)
+    cached = session_cache.get(token_hash)
+    if cached is None:
+        row = db.session.query(UserSession.user_id, UserSession.expires_at).filter(
+            UserSession.token_hash == token_hash, UserSession.expires_at > datetime.utcnow()
+        ).first()
+        if row is None:
+            return None
+        session_cache.put(token_hash, row.user_id, row.expires_at)
+        user_id = row.user_id
+    else:
+        user_id = cached[0]
+    last_seen_buffer.record(token_hash)
+    return user_id
+
+def revoke_session(token):
+    """End the session of a token (logout); the caller commits"""
+    if not token:
+        return
+    token_hash = hash_token(token)
+    db.session.execute(delete(UserSession).where(UserSession.token_hash == token_hash))
+    session_cache.invalidate([token_hash])
+
+def revoke_user_sessions(user_id, keep_token=None):
+    """End every session of a user except the one of keep_token, e.g. after a password change; the caller commits"""
+    keep = hash_token(keep_token) if keep_token else None
+    query = delete(UserSession).where(UserSession.user_id == user_id)
+    if keep:
+        query = query.where(UserSession.token_hash != keep)
+    db.session.execute(query)
+    session_cache.invalidate_user(user_id, keep)
+
+def flush_last_seen():
+    """Write the buffered last_seen_at times in one executemany UPDATE on its own connection"""
+    pending = last_seen_buffer.take()
+    if not pending:
+        return 0
+    statement = update(UserSession.__table__).where(
+        UserSession.__table__.c.token_hash == bindparam('hash'),
+        UserSession.__table__.c.last_seen_at < bindparam('seen')
+    ).values(last_seen_at=bindparam('seen'))
+    # Outside the request's session, so a failed request cannot roll it back
+    with db.engine.begin() as connection:
+        connection.execute(statement, [{'hash': token_hash, 'seen': seen} for token_hash, seen in pending.items()])
+    return len(pending)
+
+def purge_expired_sessions(app):
+    """
+    Delete expired sessions; called by the worker
+
+    Returns:
+        Number of sessions deleted
+    """
+    with app.app_context():
+        result = db.session.execute(delete(UserSession).where(UserSession.expires_at <= datetime.utcnow()))
+        db.session.commit()
+        print(f"✅ Purged {result.rowcount} expired sessions.")
+        return result.rowcount
+
+def init_sessions(app):
+    """Apply the session defaults to app.config and size the per-process cache and buffer"""
+    for key, value in SESSION_DEFAULTS.items():
+        app.config.setdefault(key, value)
+    session_cache.max_size = app.config['SESSION_CACHE_MAX_SIZE']
+    session_cache.ttl = app.config['SESSION_CACHE_TTL_SECONDS']
+    last_seen_buffer.interval = app.config['SESSION_LAST_SEEN_FLUSH_SECONDS']
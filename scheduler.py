@@ -1,29 +1,46 @@
-# Background scheduler for automated tasks
-# Handles periodic tasks like sending event reminder notifications
+# Schedule of the background jobs run by the standalone worker (see worker.py)
+# Triggers are APScheduler triggers; the worker only uses them to compute fire times
+# and leases each run through the job_runs table, so web processes never run jobs
 
-from apscheduler.schedulers.background import BackgroundScheduler
+from datetime import datetime
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from extensions import db
+from models.inbox import refresh_inbox
+from models.job import schedule_run
 from models.notifications import send_event_reminders
+from models.summary import pregenerate_summaries
+from models.tombstone import prune_tombstones
+from models.user_session import purge_expired_sessions
+from utils.email_utils import deliver_outbox, prune_outbox
 
-def start_scheduler(app):
+def daily_notification_job(app):
     """
-    Initialize and start the background scheduler for automated tasks
-    Sets up daily notification job to send event reminders
-
-    Args:
-        app: Flask application instance for database context
+    Queue the day's event reminders, then bring the next delivery run forward
+    Reminders are committed to the outbox before any SMTP traffic starts. Delivery only
+    runs as outbox_delivery_job, whose lease keeps two runs from sending at once.
     """
-    scheduler = BackgroundScheduler()
-
-    # Schedule daily notification job at 7:00 AM
-    # This sends reminder emails for upcoming events
-    scheduler.add_job(
-        func=lambda: send_event_reminders(app),  # Lambda preserves app context
-        trigger='cron',  # Cron-style scheduling
-        hour=7,          # Run at 7 AM
-        minute=0,        # At the top of the hour
-        id='daily_notification_job',  # Unique job identifier
-        replace_existing=True         # Replace if job already exists
-    )
+    send_event_reminders(app)
+    with app.app_context():
+        schedule_run('outbox_delivery_job', datetime.utcnow())
+        db.session.commit()
 
-    # Start the scheduler in background thread
-    scheduler.start()
+# Job name -> (trigger, function taking the Flask app)
+# Cron triggers fire in the server's local time zone; interval triggers are aligned
+# to a fixed start so every worker computes the same fire times
+JOBS = {
+    # Reminder emails for upcoming events at 7:00 AM
+    'daily_notification_job': (CronTrigger(hour=7, minute=0), daily_notification_job),
+    # Retry failed deliveries whose backoff has expired
+    'outbox_delivery_job': (IntervalTrigger(minutes=5, start_date=datetime(2024, 1, 1)), deliver_outbox),
+    # Forget deleted events once no sync cursor can still ask about them
+    'tombstone_prune_job': (CronTrigger(hour=3, minute=0), prune_tombstones),
+    # Summaries for the coming week's events, so popups rarely wait on the model
+    'summary_pregenerate_job': (CronTrigger(minute=15), pregenerate_summaries),
+    # Occurrences entering the inbox horizon, and past inbox items out
+    'inbox_refresh_job': (CronTrigger(minute=45), refresh_inbox),
+    # Sessions past their expiry; validation already ignores them
+    'session_sweep_job': (CronTrigger(minute=30), purge_expired_sessions),
+    # Delivered and dead-lettered emails past OUTBOX_RETENTION_DAYS
+    'outbox_prune_job': (CronTrigger(hour=3, minute=30), prune_outbox)
+}
@@ -39,7 +39,8 @@ async function loadSchedule() {
     const response = await fetch('/api/notifications');
 
     if (response.ok) {
-      const data = await response.json();
+      // First page of the inbox: {items, unread, next}
+      const data = (await response.json()).items;
 
       if (data.length === 0) {
         scheduleList.innerHTML = `
@@ -143,6 +144,42 @@ document.addEventListener('DOMContentLoaded', function() {
     }
   }
 
+  // Events already loaded per view and start date, with the sync cursor that goes with them
+  const eventFeedCache = new Map();
+
+  /**
+   * Fetch the events for one view, reusing what was loaded before
+   * A cached view only asks for events changed or deleted since its cursor
+   */
+  async function fetchViewEvents(view, startStr) {
+    const url = `/api/events?range=${view}&start=${startStr}`;
+    const key = `${view}|${startStr}`;
+    const cached = eventFeedCache.get(key);
+
+    if (cached) {
+      const response = await fetch(`${url}&since=${encodeURIComponent(cached.cursor)}`);
+      if (!response.ok) return null;
+      const delta = await response.json();
+
+      let events = delta.events;
+      if (!delta.reset) {
+        // Drop every occurrence of a changed or deleted event, then add the fresh ones
+        const stale = new Set(delta.removed);
+        delta.events.forEach(event => stale.add(event.id));
+        events = cached.events.filter(event => !stale.has(event.id)).concat(delta.events)
+          .sort((a, b) => a.start_time.localeCompare(b.start_time));
+      }
+      eventFeedCache.set(key, { cursor: delta.cursor, events });
+      return events;
+    }
+
+    const response = await fetch(url);
+    if (!response.ok) return null;
+    const events = await response.json();
+    eventFeedCache.set(key, { cursor: response.headers.get('X-Sync-Cursor'), events });
+    return events;
+  }
+
   // Function to load and display events based on current view
   async function loadEventsForCurrentView() {
     const view = document.getElementById('calendarView').value;
@@ -162,12 +199,9 @@ document.addEventListener('DOMContentLoaded', function() {
       const startStr = `${start.getFullYear()}-${String(start.getMonth() + 1).padStart(2, '0')}-${String(start.getDate()).padStart(2, '0')}`;
 
       
-      const response = await fetch(`/api/events?range=${view}&start=${startStr}`);
+      const events = await fetchViewEvents(view, startStr);
       
-      if (response.ok) {
-        const events = await response.json();
-
-        
+      if (events) {
         if (view === 'month') {
           renderMonthCalendar(currentDate, events);
         } else {
@@ -513,8 +547,10 @@ document.addEventListener('DOMContentLoaded', function() {
 
       try {
         const eventId = summariseBtn.getAttribute('data-event-id');
+        const occurrenceDate = summariseBtn.getAttribute('data-occurrence-date');
+        const occurrenceQuery = occurrenceDate ? `?date=${occurrenceDate}` : '';
 
-        const response = await fetch(`/api/event/${eventId}`);
+        const response = await fetch(`/api/event/${eventId}${occurrenceQuery}`);
         const eventData = await response.json();
 
         console.log('Sending summarise request');
@@ -543,6 +579,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const eventId = event.id;
     const summariseBtn = document.getElementById('summariseBtn');
     summariseBtn.setAttribute('data-event-id', eventId);
+    summariseBtn.setAttribute('data-occurrence-date', event.occurrence_date || '');
 
     document.getElementById('eventTitle').textContent = event.title;
     const priorityBadge = document.getElementById('eventPriority');
@@ -588,7 +625,9 @@ document.addEventListener('DOMContentLoaded', function() {
     if (canEdit) {
       editButton.style.display = 'inline-block';
       editButton.onclick = () => {
-        window.location.href = `/event/edit/${event.id}`;
+        // Recurring series share one ID, so pass the occurrence that was clicked
+        const occurrenceQuery = event.occurrence_date ? `?date=${event.occurrence_date}` : '';
+        window.location.href = `/event/edit/${event.id}${occurrenceQuery}`;
       };
     } else {
       editButton.style.display = 'none';
@@ -611,11 +650,13 @@ document.addEventListener('DOMContentLoaded', function() {
       // Handle toggle change
       notificationToggle.onchange = async () => {
         try {
+          // Recurring events are silenced for the whole series
           const response = await fetch(`/api/event/${event.id}/toggle-notifications`, {
             method: 'POST',
             headers: {
               'Content-Type': 'application/json'
-            }
+            },
+            body: JSON.stringify({ scope: event.is_recurring ? 'all' : 'single' })
           });
 
           const result = await response.json();
@@ -646,6 +687,49 @@ document.addEventListener('DOMContentLoaded', function() {
 
   updateDateDisplay();
   loadEventsForCurrentView();
+  connectLiveUpdates();
+
+  /**
+   * Listen on /api/stream for changes to events this user can see
+   * Messages only name the changed events; the open view reloads them through its
+   * sync cursor, so a burst of changes costs one small delta request
+   */
+  function connectLiveUpdates() {
+    if (!window.EventSource) return;
+
+    let refreshTimer = null;
+    function refreshSoon() {
+      // Coalesce bursts (e.g. a series edit) into one reload
+      clearTimeout(refreshTimer);
+      refreshTimer = setTimeout(() => {
+        loadEventsForCurrentView();
+        if (schedulePopout && schedulePopout.classList.contains('active')) {
+          loadSchedule();
+        }
+      }, 250);
+    }
+
+    const source = new EventSource('/api/stream');
+    let connectedBefore = false;
+
+    source.addEventListener('open', () => {
+      // Changes made while reconnecting were not pushed; the delta sync picks them up
+      if (connectedBefore) refreshSoon();
+      connectedBefore = true;
+    });
+    source.addEventListener('calendar', refreshSoon);
+    source.addEventListener('resync', () => {
+      // Fell behind, or our tags changed: cached views may hide or miss events
+      eventFeedCache.clear();
+      refreshSoon();
+    });
+    source.addEventListener('error', () => {
+      // Refused (e.g. the server is at its connection cap): try again later
+      if (source.readyState === EventSource.CLOSED) {
+        setTimeout(connectLiveUpdates, 60000);
+      }
+    });
+  }
 });
 
 function closeSummaryModal() {
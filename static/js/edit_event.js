@@ -142,7 +142,8 @@ document.addEventListener('DOMContentLoaded', () => {
     // --- DATA FETCHING AND FORM POPULATION ---
     async function populateForm() {
         try {
-            const response = await fetch(`/api/event/${eventId}`);
+            // Keep the ?date= of the selected occurrence for recurring series
+            const response = await fetch(`/api/event/${eventId}${window.location.search}`);
             if (!response.ok) {
                 throw new Error('Could not fetch event data.');
             }
@@ -206,7 +207,7 @@ document.addEventListener('DOMContentLoaded', () => {
                         hiddenOrigDate.id = 'original_date';
                         form.appendChild(hiddenOrigDate);
                     }
-                    hiddenOrigDate.value = startDate;
+                    hiddenOrigDate.value = eventData.occurrence_date || startDate;
                 }
             } else if (isMultiDay) {
                 // For multi-day events, show separate start/end date and time inputs
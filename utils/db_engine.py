@@ -0,0 +1,115 @@
+# SQLite engine profile: connection pragmas, busy timeout and pool settings, plus the
+# chunking every module uses to keep IN (...) lists within SQLite's parameter limit
+# The reminder and outbox jobs write from the scheduler thread while request threads read.
+# In rollback-journal mode a writer locks readers out; in WAL mode readers keep reading
+# the last committed snapshot while one writer appends to the log.
+from sqlalchemy import event as sa_event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from extensions import db
+
+# Pragmas applied to every new DBAPI connection, per profile
+# 'production' is the default; 'legacy' keeps SQLite's own defaults for comparison
+SQLITE_PROFILES = {
+    'production': {
+        'journal_mode': 'WAL',       # Readers never block on the writer (persistent, per database file)
+        'synchronous': 'NORMAL',     # Safe with WAL: a power loss can only drop the last commits
+        'busy_timeout': 5000,        # Milliseconds a writer waits for the write lock before "database is locked"
+        'cache_size': -32000,        # Negative = KiB of page cache per connection (32 MB)
+        'mmap_size': 268435456,      # Read pages through a 256 MB memory map instead of read() calls
+        'temp_store': 'MEMORY'       # Sorts and temporary indexes stay off disk
+    },
+    'legacy': {}
+}
+
+# Engine defaults - override through app.config
+DB_ENGINE_DEFAULTS = {
+    'SQLITE_PROFILE': 'production',
+    'SQLITE_PRAGMAS': {},        # Per-pragma overrides on top of the profile
+    'DB_POOL_SIZE': 10,          # Connections kept open, roughly one per request thread
+    'DB_MAX_OVERFLOW': 10,       # Extra connections allowed under bursts
+    'DB_POOL_TIMEOUT': 10        # Seconds to wait for a free connection
+}
+
+# Upper bound on bound parameters per IN (...) clause, well below SQLite's limit
+IN_CLAUSE_CHUNK = 500
+
+def chunks(items, size=IN_CLAUSE_CHUNK):
+    """Split items (any iterable) into consecutive lists of at most size items"""
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def sqlite_pragmas(config):
+    """
+    Pragmas for the configured profile, with SQLITE_PRAGMAS overrides applied
+
+    Args:
+        config: Flask app.config
+    """
+    profile = config['SQLITE_PROFILE']
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE {profile!r}, expected one of {sorted(SQLITE_PROFILES)}")
+    return {**SQLITE_PROFILES[profile], **config['SQLITE_PRAGMAS']}
+
+def _is_file_database(url):
+    # In-memory databases live in a single connection and cannot use WAL or a pool
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+def engine_options(config):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for the configured database
+    File-backed SQLite gets an explicit QueuePool sized for the request threads plus
+    the scheduler, and the driver-level lock timeout follows busy_timeout.
+    Other databases keep whatever options are already configured.
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    if not _is_file_database(config['SQLALCHEMY_DATABASE_URI']):
+        return options
+
+    pragmas = sqlite_pragmas(config)
+    connect_args = dict(options.get('connect_args', {}))
+    # Connections are handed between request and scheduler threads by the pool
+    connect_args.setdefault('check_same_thread', False)
+    if 'busy_timeout' in pragmas:
+        connect_args.setdefault('timeout', pragmas['busy_timeout'] / 1000)
+    options['connect_args'] = connect_args
+
+    options.setdefault('poolclass', QueuePool)
+    options.setdefault('pool_size', config['DB_POOL_SIZE'])
+    options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+    options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+    return options
+
+def _apply_pragmas(pragmas):
+    # connect listener: runs once per new DBAPI connection, before SQLAlchemy uses it
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+    return on_connect
+
+def init_database(app):
+    """
+    Configure the engine profile and initialize Flask-SQLAlchemy
+    Replaces a bare db.init_app(app): the pool options have to be in place before the
+    engine is created, and the pragma listener is attached to the engine right after.
+
+    Args:
+        app: Flask application instance with SQLALCHEMY_DATABASE_URI set
+    """
+    for key, value in DB_ENGINE_DEFAULTS.items():
+        app.config.setdefault(key, value)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+
+    if not _is_file_database(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+    pragmas = sqlite_pragmas(app.config)
+    if pragmas:
+        with app.app_context():
+            sa_event.listen(db.engine, 'connect', _apply_pragmas(pragmas))
@@ -1,31 +1,252 @@
 # Email utility functions for sending notifications
-from flask_mail import Mail, Message
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait as wait_futures
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, insert, or_, update
+from extensions import db
+from models.outbox import OutboxMessage
 
-# Initialize Mail extension without app context (prevents circular imports)
-mail = Mail()
+# Guards setting up Flask-Mail on an app the first time it sends
+_mail_lock = threading.Lock()
+
+# Outbox delivery defaults - override through app.config
+OUTBOX_DEFAULTS = {
+    'OUTBOX_WORKERS': 4,              # Worker threads, each holding one SMTP connection
+    'OUTBOX_BATCH_SIZE': 500,         # Messages claimed per round trip to the database
+    'OUTBOX_RATE_LIMIT': 0,           # Messages per second across all workers (0 = unlimited)
+    'OUTBOX_MAX_ATTEMPTS': 5,         # Failures before a message is dead-lettered
+    'OUTBOX_BACKOFF_SECONDS': 60,     # First retry delay, doubled after every failure
+    'OUTBOX_MAX_BACKOFF_SECONDS': 3600,
+    'OUTBOX_CLAIM_TIMEOUT_SECONDS': 900,  # Claims older than this belong to a dead run
+    'OUTBOX_RETENTION_DAYS': 30       # Sent and dead messages are deleted after this long
+}
 
 def init_mail(app):
     """
-    Initialize Flask-Mail with the application context
-    Called during app creation to configure email settings
+    Apply the outbox defaults to app.config
+    Called during app creation; Flask-Mail itself is set up by mail_for() when the app first sends
 
     Args:
         app: Flask application instance with email configuration
     """
-    mail.init_app(app)
+    for key, value in OUTBOX_DEFAULTS.items():
+        app.config.setdefault(key, value)
+
+def mail_for(app):
+    """
+    Flask-Mail state of an app, set up the first time it sends
+    Web processes only queue emails in the outbox, so they never import flask_mail.
+    """
+    with _mail_lock:
+        if 'mail' not in app.extensions:
+            from flask_mail import Mail
+            Mail().init_app(app)
+    return app.extensions['mail']
+
+def enqueue_emails(messages):
+    """
+    Queue many emails with one bulk insert in the caller's transaction
+
+    Args:
+        messages: Iterable of (to, subject, body) tuples
+    """
+    rows = [{'recipient': to, 'subject': subject, 'body': body} for to, subject, body in messages]
+    if rows:
+        db.session.execute(insert(OutboxMessage), rows)
+    return len(rows)
+
+class RateLimiter:
+    """
+    Token bucket shared by the delivery workers
+    Allows `rate` messages per second on average with bursts of up to one second's worth
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a message may be sent"""
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def _claim_batch(batch_size):
+    """
+    Claim up to batch_size due messages for this run in one short transaction
+    Returns the claim token and plain tuples, so no ORM state is used while the network is busy
+    """
+    token = str(uuid.uuid4())
+    now = datetime.utcnow()
+    due_ids = db.session.query(OutboxMessage.id).filter(
+        OutboxMessage.status == 'pending',
+        OutboxMessage.next_attempt_at <= now
+    ).order_by(OutboxMessage.next_attempt_at, OutboxMessage.id).limit(batch_size).subquery()
+    db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(db.select(due_ids.c.id)), OutboxMessage.status == 'pending')
+        .values(status='sending', claim_token=token, claimed_at=now)
+    )
+    claimed = db.session.query(
+        OutboxMessage.id, OutboxMessage.recipient, OutboxMessage.subject, OutboxMessage.body, OutboxMessage.attempts
+    ).filter(OutboxMessage.claim_token == token, OutboxMessage.status == 'sending').all()
+    db.session.commit()
+    return token, claimed
+
+def _renew_claims(token):
+    """Heartbeat: refresh claimed_at on the messages of a batch still being sent"""
+    db.session.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.claim_token == token, OutboxMessage.status == 'sending')
+        .values(claimed_at=datetime.utcnow())
+    )
+    db.session.commit()
+
+def _deliver_slice(app, messages, limiter):
+    """
+    Worker thread: send a slice of claimed messages over one reused SMTP connection
+    A failure is recorded against the message being sent and the rest of the slice
+    continues on a fresh connection. Returns a list of (message_id, error), error None on success.
+    """
+    from flask_mail import Message
+
+    results = []
+    remaining = deque(messages)
+    mail = mail_for(app)
+    with app.app_context():
+        while remaining:
+            try:
+                with mail.connect() as connection:
+                    while remaining:
+                        message_id, recipient, subject, body, _ = remaining[0]
+                        limiter.acquire()
+                        connection.send(Message(subject=subject, recipients=[recipient], body=body))
+                        results.append((message_id, None))
+                        remaining.popleft()
+            except Exception as e:
+                # Errors while closing an exhausted connection leave nothing to blame
+                if remaining:
+                    results.append((remaining.popleft()[0], str(e) or e.__class__.__name__))
+    return results
+
+def _record_results(messages, results, config):
+    """Write delivery outcomes back in one short transaction"""
+    now = datetime.utcnow()
+    attempts_by_id = {message[0]: message[4] for message in messages}
 
-def send_email(app, to, subject, body):
+    sent_ids = [message_id for message_id, error in results if error is None]
+    if sent_ids:
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(sent_ids))
+            .values(status='sent', sent_at=now, claim_token=None, last_error=None)
+        )
+
+    for message_id, error in results:
+        if error is None:
+            continue
+        attempts = attempts_by_id[message_id] + 1
+        if attempts >= config['OUTBOX_MAX_ATTEMPTS']:
+            status, next_attempt_at = 'dead', now
+        else:
+            # Exponential backoff: base, 2x base, 4x base ... capped
+            delay = min(config['OUTBOX_BACKOFF_SECONDS'] * 2 ** (attempts - 1), config['OUTBOX_MAX_BACKOFF_SECONDS'])
+            status, next_attempt_at = 'pending', now + timedelta(seconds=delay)
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id == message_id)
+            .values(status=status, attempts=attempts, next_attempt_at=next_attempt_at,
+                    last_error=error[:1000], claim_token=None)
+        )
+    db.session.commit()
+
+def deliver_outbox(app, max_batches=None):
     """
-    Send email notification to a user
-    Used for event reminders and system notifications
+    Deliver due outbox messages using a pool of worker threads
+    Each worker reuses one SMTP connection for its whole slice of a batch, sending is
+    rate limited across workers, failures are retried with exponential backoff and
+    messages that keep failing are dead-lettered. Database work happens in short
+    transactions before and after each batch - never while waiting on SMTP - plus a
+    heartbeat that keeps the batch's claims younger than OUTBOX_CLAIM_TIMEOUT_SECONDS.
+    The worker runs it only as outbox_delivery_job, so one run delivers at a time.
 
     Args:
-        app: Flask application instance for context
-        to: Recipient email address
-        subject: Email subject line
-        body: Email body content (plain text)
+        app: Flask application instance for context and configuration
+        max_batches: Stop after this many batches (None = until the outbox is drained)
+
+    Returns:
+        Tuple (sent, failed) with the number of messages delivered and not delivered
+    """
+    with app.app_context():
+        config = app.config
+        workers = max(1, config['OUTBOX_WORKERS'])
+        limiter = RateLimiter(config['OUTBOX_RATE_LIMIT'])
+
+        # Release messages claimed by a run that never finished
+        stale_before = datetime.utcnow() - timedelta(seconds=config['OUTBOX_CLAIM_TIMEOUT_SECONDS'])
+        db.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.status == 'sending', OutboxMessage.claimed_at < stale_before)
+            .values(status='pending', claim_token=None)
+        )
+        db.session.commit()
+
+        sent = failed = batches = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while max_batches is None or batches < max_batches:
+                token, messages = _claim_batch(config['OUTBOX_BATCH_SIZE'])
+                if not messages:
+                    break
+                batches += 1
+
+                # Round-robin the batch over the workers
+                slices = [messages[i::workers] for i in range(workers)]
+                futures = [executor.submit(_deliver_slice, app, chunk, limiter) for chunk in slices if chunk]
+
+                # Renew the claims as slices finish and at least every third of the timeout,
+                # so a slow (e.g. rate limited) batch is never released to another run mid-send
+                pending = set(futures)
+                while pending:
+                    _, pending = wait_futures(pending, timeout=config['OUTBOX_CLAIM_TIMEOUT_SECONDS'] / 3, return_when=FIRST_COMPLETED)
+                    if pending:
+                        _renew_claims(token)
+                results = [result for future in futures for result in future.result()]
+
+                _record_results(messages, results, config)
+                sent += sum(1 for _, error in results if error is None)
+                failed += sum(1 for _, error in results if error is not None)
+
+        print(f"✅ Outbox delivery finished: {sent} sent, {failed} failed.")
+        return sent, failed
+
+def prune_outbox(app):
+    """
+    Delete sent and dead messages older than OUTBOX_RETENTION_DAYS; called by the worker
+    Dead messages age from their last failed attempt, so recent dead letters stay inspectable
+
+    Returns:
+        Number of messages deleted
     """
     with app.app_context():
-        # Create and send email message
-        msg = Message(subject=subject, recipients=[to], body=body)
-        mail.send(msg)
+        cutoff = datetime.utcnow() - timedelta(days=app.config['OUTBOX_RETENTION_DAYS'])
+        result = db.session.execute(delete(OutboxMessage).where(or_(
+            and_(OutboxMessage.status == 'sent', OutboxMessage.sent_at < cutoff),
+            and_(OutboxMessage.status == 'dead', OutboxMessage.next_attempt_at < cutoff)
+        )))
+        db.session.commit()
+        print(f"✅ Pruned {result.rowcount} delivered and dead outbox messages.")
+        return result.rowcount
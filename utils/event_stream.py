@@ -0,0 +1,268 @@
+# In-process pub/sub bus behind the /api/stream Server-Sent Events endpoint
+# Committed event changes are published once per transaction; each connected user
+# only receives the IDs of changed events they can see, and reloads them through
+# the delta sync of /api/events. The bus lives in one process: a change committed
+# by another worker process (or the background worker) is not pushed, and clients
+# pick it up on their next reconnect, when they resync.
+import json
+import threading
+import time
+from collections import deque, namedtuple
+from models.event import Event
+from models.event_changes import subscribe
+from models.tags import EventTag, split_tags
+from models.user import User
+from utils.db_engine import chunks
+
+# Stream defaults - override through app.config
+# Every open stream holds one request thread for its whole life, so the cap must stay
+# well below the thread count of the WSGI server (e.g. gunicorn --threads) to leave
+# room for ordinary requests. Streams beyond the cap are refused with 503.
+STREAM_DEFAULTS = {
+    'STREAM_MAX_CONNECTIONS': 50,           # Open streams per worker process
+    'STREAM_QUEUE_SIZE': 100,               # Undelivered messages per stream before it must resync
+    'STREAM_HEARTBEAT_SECONDS': 15,         # Comment line sent when nothing else was, keeps proxies from timing out
+    'STREAM_MAX_SECONDS': 600,              # Streams are closed after this long; EventSource reconnects
+    'STREAM_RETRY_MS': 5000                 # Reconnect delay suggested to the browser
+}
+
+# Who can see an event, before and after a change
+# tags: every tag of the event and its exceptions; private: some occurrence is untagged,
+# so its creator sees it; creator_role decides whether teachers see it
+Audience = namedtuple('Audience', ['tags', 'creator_id', 'creator_role', 'private'])
+
+class StreamFull(Exception):
+    """Raised when a process already holds STREAM_MAX_CONNECTIONS streams"""
+
+class Subscription:
+    """
+    One open stream: the subscriber's identity and a bounded queue of messages
+    A subscriber that falls STREAM_QUEUE_SIZE messages behind loses its backlog and
+    is told to resync instead, so a slow client never blocks publishers or grows memory
+    """
+
+    def __init__(self, identity, queue_size):
+        self.identity = identity
+        self.queue_size = queue_size
+        self.overflowed = False
+        self._messages = deque()
+        self._ready = threading.Condition()
+
+    def offer(self, message):
+        """
+        Queue a message without blocking
+        Returns True if this message overflowed the queue
+        """
+        with self._ready:
+            if self.overflowed:
+                return False
+            if len(self._messages) >= self.queue_size:
+                self._messages.clear()
+                self.overflowed = True
+            else:
+                self._messages.append(message)
+            self._ready.notify()
+            return self.overflowed
+
+    def next_message(self, timeout):
+        """Next (kind, data), ('resync', {}) after an overflow, or None if nothing came within timeout"""
+        with self._ready:
+            self._ready.wait_for(lambda: self._messages or self.overflowed, timeout)
+            if self.overflowed:
+                self.overflowed = False
+                return ('resync', {})
+            if self._messages:
+                return self._messages.popleft()
+            return None
+
+class EventBus:
+    """Thread-safe registry of open streams with non-blocking fan-out"""
+
+    def __init__(self, max_connections=50, queue_size=100):
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._published = 0
+        self._delivered = 0
+        self._overflows = 0
+
+    def subscribe(self, identity):
+        """
+        Register a stream for a user
+
+        Raises:
+            StreamFull when max_connections streams are already open
+        """
+        subscription = Subscription(identity, self.queue_size)
+        with self._lock:
+            if len(self._subscriptions) >= self.max_connections:
+                raise StreamFull()
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def has_subscribers(self):
+        return bool(self._subscriptions)
+
+    def publish(self, kind, message_for):
+        """
+        Offer a message to every open stream
+
+        Args:
+            kind: SSE event name, e.g. 'calendar'
+            message_for: Function of an Identity returning the data for that user, or None to skip them
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        delivered = overflows = 0
+        for subscription in subscriptions:
+            data = message_for(subscription.identity)
+            if data is None:
+                continue
+            delivered += 1
+            if subscription.offer((kind, data)):
+                overflows += 1
+        with self._lock:
+            self._published += 1
+            self._delivered += delivered
+            self._overflows += overflows
+
+    def stats(self):
+        with self._lock:
+            return {
+                'connections': len(self._subscriptions),
+                'max_connections': self.max_connections,
+                'published': self._published,
+                'delivered': self._delivered,
+                'overflows': self._overflows
+            }
+
+# Shared by all requests handled by this process
+event_bus = EventBus()
+
+def can_see(identity, audience):
+    """Whether a user sees some occurrence of an event; mirrors the visibility rules of /api/events"""
+    if identity.role == 'teacher':
+        # Teachers see every event except those created by students
+        return audience.creator_role != 'student'
+    if audience.private and audience.creator_id == identity.id:
+        return True
+    return not identity.tags.isdisjoint(audience.tags)
+
+def event_audiences(session, event_ids):
+    """
+    {event_id: Audience} of the given events as currently stored
+    Tags come from the event_tags index, which includes the tags of exceptions
+    """
+    audiences = {}
+    for chunk in chunks(event_ids):
+        tags_by_event = {}
+        for event_id, tag in session.query(EventTag.event_id, EventTag.tag).filter(EventTag.event_id.in_(chunk)):
+            tags_by_event.setdefault(event_id, set()).add(tag)
+        rows = session.query(Event.id, Event.tags, Event.is_recurring, Event.creator_id, User.role).outerjoin(
+            User, User.id == Event.creator_id
+        ).filter(Event.id.in_(chunk))
+        for event_id, tags, is_recurring, creator_id, creator_role in rows:
+            # Exceptions can clear the tags of a series occurrence
+            private = not split_tags(tags) or bool(is_recurring)
+            audiences[event_id] = Audience(frozenset(tags_by_event.get(event_id, ())), creator_id, creator_role, private)
+    return audiences
+
+def _merge(first, second):
+    # Everyone who could see the event before or after the change
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return Audience(first.tags | second.tags, first.creator_id, first.creator_role or second.creator_role,
+                    first.private or second.private)
+
+def _remember_audiences(session, event_ids, state):
+    """before_change: who could see the events before the transaction changes them"""
+    if not event_bus.has_subscribers():
+        return
+    with session.no_autoflush:
+        state.setdefault('before', {}).update(event_audiences(session, event_ids))
+
+def _prepare_audiences(session, event_ids, state):
+    """before_commit: work out who can see the changed events now, while SQL can still run"""
+    if not event_bus.has_subscribers():
+        return
+    before = state.get('before', {})
+    after = event_audiences(session, event_ids)
+    audiences = {event_id: _merge(before.get(event_id), after.get(event_id)) for event_id in event_ids}
+    state['pending'] = {event_id: audience for event_id, audience in audiences.items() if audience}
+
+def _publish_committed(event_ids, state):
+    """after_commit: tell every connected user about the changed events they can see"""
+    if state.get('pending'):
+        publish_event_changes(state['pending'])
+
+def publish_event_changes(audiences):
+    """
+    Publish a 'calendar' message listing, per user, the changed events they can see
+
+    Args:
+        audiences: {event_id: Audience}
+    """
+    def message_for(identity):
+        event_ids = sorted(event_id for event_id, audience in audiences.items() if can_see(identity, audience))
+        return {'events': event_ids} if event_ids else None
+    event_bus.publish('calendar', message_for)
+
+def publish_to_user(user_id, kind, data=None):
+    """
+    Publish a message to every stream of one user
+    Data with 'reconnect' set closes the streams after delivery, so they reconnect with a
+    fresh identity - used when the user's role or tags change
+    """
+    event_bus.publish(kind, lambda identity: (data or {}) if identity.id == user_id else None)
+
+def format_message(kind, data):
+    """One SSE frame"""
+    return f"event: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+def stream_messages(subscription, heartbeat, max_seconds, retry_ms):
+    """
+    Generator of the SSE frames of one stream; unsubscribes when the client goes away
+
+    Args:
+        subscription: Subscription returned by event_bus.subscribe()
+        heartbeat: Seconds of silence before a keep-alive comment is sent
+        max_seconds: Lifetime of the stream; the browser reconnects afterwards
+        retry_ms: Reconnect delay suggested to the browser
+    """
+    deadline = time.monotonic() + max_seconds
+    try:
+        yield f"retry: {retry_ms}\n: connected\n\n"
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            message = subscription.next_message(min(heartbeat, remaining))
+            if message is None:
+                # Also how a vanished client is noticed: the write fails
+                yield ": keep-alive\n\n"
+                continue
+            kind, data = message
+            yield format_message(kind, data)
+            if data.get('reconnect'):
+                return  # The identity the stream filters on is out of date
+    finally:
+        event_bus.unsubscribe(subscription)
+
+def init_event_stream(app):
+    """
+    Configure the bus and subscribe it to event changes
+    Each committed change is published once, after the commit, to the users who could
+    see the event before or after it; rolled back changes are never sent.
+    """
+    for key, value in STREAM_DEFAULTS.items():
+        app.config.setdefault(key, value)
+    event_bus.max_connections = app.config['STREAM_MAX_CONNECTIONS']
+    event_bus.queue_size = app.config['STREAM_QUEUE_SIZE']
+    subscribe('event_stream', _remember_audiences, _prepare_audiences, _publish_committed)
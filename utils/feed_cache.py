@@ -0,0 +1,218 @@
+# Shared cache of rendered calendar feed windows
+# Users with the same role and tags see the same tagged events, so the serialized
+# JSON of a window is cached per visibility scope and reused across users.
+# Entries are dropped precisely when a committed write touches their tags and dates, and
+# each one carries the validator of the rows it was rendered from, so a write committed by
+# another process (which cannot reach this process's invalidations) is caught on the next read.
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from sqlalchemy import inspect
+from sqlalchemy.orm.util import identity_key
+from models.event import Event
+from models.event_changes import subscribe
+from models.event_exceptions import EventExceptions
+from models.tags import EventTag, split_tags
+from utils.db_engine import chunks
+
+# What a write to an event can change in the feed: the tags of the scopes that can see it
+# and the time span its occurrences cover (None = unbounded, used for series)
+Footprint = namedtuple('Footprint', ['tags', 'start', 'end'])
+
+class FeedCache:
+    """
+    Thread-safe LRU cache of serialized feed windows, bounded by total size in bytes
+    Keys are (scope, range, start); each entry remembers the tags of its scope and its
+    window so invalidate() only drops entries a change can actually affect, and the
+    validator of its rows so get() never returns a body the database has moved past.
+    The TTL bounds how long unused entries hold memory.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, ttl=300):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, validator):
+        """
+        Return the cached body for a key, or None if missing, expired or stale
+
+        Args:
+            key: (scope, range, start) cache key
+            validator: Current utils.feed_sync.part_validators() of the cached rows;
+                an entry rendered under any other validator is dropped
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] != validator or entry[5] < time.monotonic()):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, body, validator, scope_tags, window_start, window_end):
+        """
+        Store a serialized window, evicting least recently used entries to stay within max_bytes
+
+        Args:
+            key: (scope, range, start) cache key
+            body: Serialized JSON (bytes)
+            validator: part_validators() of the rows, taken before they were read
+            scope_tags: Tags that decide visibility in this scope, or None if every tag does
+            window_start, window_end: The window served (None = unbounded)
+        """
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (body, validator, scope_tags, window_start, window_end, time.monotonic() + self.ttl)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, footprints):
+        """Drop every entry whose scope and window overlap one of the footprints"""
+        with self._lock:
+            stale = [
+                key for key, (_, _, scope_tags, window_start, window_end, _) in self._entries.items()
+                if any(_affects(footprint, scope_tags, window_start, window_end) for footprint in footprints)
+            ]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """Counters for monitoring: hits, misses, invalidations, entries and bytes"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._size
+            }
+
+    def _remove(self, key):
+        # Caller holds the lock
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[0])
+
+def _affects(footprint, scope_tags, window_start, window_end):
+    # Untagged events are private to their creator and never part of a tag scope
+    if scope_tags is not None and scope_tags.isdisjoint(footprint.tags):
+        return False
+    if footprint.start is not None and window_end is not None and footprint.start >= window_end:
+        return False
+    if footprint.end is not None and window_start is not None and footprint.end <= window_start:
+        return False
+    return True
+
+# Shared by all requests handled by this process
+feed_cache = FeedCache()
+
+def _old_value(state, name):
+    # Value as last loaded from or flushed to the database
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.obj(), name)
+
+def event_footprints(session, event_ids):
+    """
+    Footprints of events as stored in the database
+    Tags come from the event_tags index, which includes the tags of exceptions; series get an unbounded span
+    """
+    footprints = []
+    for chunk in chunks(event_ids):
+        rows = session.query(Event.id, Event.start_time, Event.end_time, Event.is_recurring).filter(Event.id.in_(chunk)).all()
+        if not rows:
+            continue
+        tags_by_event = {}
+        for event_id, tag in session.query(EventTag.event_id, EventTag.tag).filter(EventTag.event_id.in_(chunk)):
+            tags_by_event.setdefault(event_id, set()).add(tag)
+        footprints.extend(
+            Footprint(frozenset(tags_by_event.get(event_id, ())), None, None) if is_recurring
+            else Footprint(frozenset(tags_by_event.get(event_id, ())), start_time, end_time)
+            for event_id, start_time, end_time, is_recurring in rows
+        )
+    return footprints
+
+def _footprints(session, event_ids, stored, stored_ids=()):
+    """
+    Footprints of events, read from the session where they are loaded and from the database otherwise
+
+    Args:
+        stored: True for the values last loaded from or flushed to the database,
+            False for the values the transaction is about to commit
+        stored_ids: Events that existed before the transaction; only their series can have exceptions
+    """
+    footprints, unloaded = [], []
+    with session.no_autoflush:
+        for event_id in event_ids:
+            event = session.identity_map.get(identity_key(Event, event_id))
+            if event is None:
+                unloaded.append(event_id)
+                continue
+            state = inspect(event)
+            value = (lambda name: _old_value(state, name)) if stored else (lambda name: getattr(event, name))
+            tags = frozenset(split_tags(value('tags')))
+            if value('recurrence_unit') is not None or value('is_recurring'):
+                # Exceptions can retag occurrences of a series, and a series spans many windows
+                if stored or event_id in stored_ids:
+                    tags |= {tag for (exception_tags,) in session.query(EventExceptions.tags).filter(
+                        EventExceptions.original_event_id == event_id
+                    ) for tag in split_tags(exception_tags)}
+                footprints.append(Footprint(tags, None, None))
+            else:
+                footprints.append(Footprint(tags, value('start_time'), value('end_time')))
+        footprints.extend(event_footprints(session, unloaded))
+    return footprints
+
+def _remember_footprints(session, event_ids, state):
+    """before_change: what the events cover before the transaction changes them"""
+    if not len(feed_cache):
+        return  # Nothing cached yet; anything cached meanwhile fails its validator after the commit
+    state.setdefault('stored_ids', set()).update(event_ids)
+    state.setdefault('footprints', []).extend(_footprints(session, event_ids, stored=True))
+
+def _add_committed_footprints(session, event_ids, state):
+    """before_commit: what the events cover once the transaction commits"""
+    if not len(feed_cache):
+        return
+    state.setdefault('footprints', []).extend(
+        _footprints(session, event_ids, stored=False, stored_ids=state.get('stored_ids', ()))
+    )
+
+def _invalidate_committed(event_ids, state):
+    """after_commit: drop the cached windows the committed changes affect"""
+    if state.get('footprints'):
+        feed_cache.invalidate(state['footprints'])
+
+def init_feed_cache(app):
+    """
+    Configure the feed cache and subscribe it to event changes
+    A committed change drops the cached windows whose scope and dates overlap the event
+    before or after it. Profile tag changes need nothing: the user's scope key changes
+    with their tags, and entries of the old scope stay valid for everyone else who still has it.
+    """
+    feed_cache.max_bytes = app.config.setdefault('FEED_CACHE_MAX_BYTES', 16 * 1024 * 1024)
+    feed_cache.ttl = app.config.setdefault('FEED_CACHE_TTL_SECONDS', 300)
+    subscribe('feed_cache', _remember_footprints, _add_committed_footprints, _invalidate_committed)
@@ -0,0 +1,185 @@
+# iCalendar (RFC 5545) rendering of the calendar feed for subscriptions
+# Events are read from a streaming cursor in batches and written out as they arrive, so
+# a feed is never held in memory whole. A series master becomes one VEVENT with an RRULE:
+# deleted (or, for this user, hidden) occurrences become EXDATEs and modified ones extra
+# VEVENTs with a RECURRENCE-ID. Times are floating, i.e. in the school's local time as stored.
+from datetime import datetime, time
+from extensions import db
+from models.event_exceptions import EventExceptions
+from models.recurrence import Occurrence, event_rule, is_series, split_weekdays
+from models.tags import split_tags
+
+PRODUCT_ID = '-//EventEase//School Calendar//EN'
+UID_DOMAIN = 'eventease'
+
+# App priorities (0=low ... 3=urgent) on the iCalendar scale, where 1 is highest
+ICAL_PRIORITIES = {0: 9, 1: 5, 2: 3, 3: 1}
+
+def escape_text(value):
+    """Escape a TEXT value: backslashes, separators and line breaks"""
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+def fold(line):
+    """
+    One content line with its CRLF, folded into lines of at most 75 octets
+    Continuation lines start with a space; multi-byte characters are never split
+    """
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    start, limit = 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1  # Back off to the first byte of a UTF-8 sequence
+        parts.append(encoded[start:end].decode('utf-8'))
+        start, limit = end, 74
+    return '\r\n '.join(parts) + '\r\n'
+
+def format_local(value):
+    return value.strftime('%Y%m%dT%H%M%S')
+
+def format_utc(value):
+    return value.strftime('%Y%m%dT%H%M%SZ')
+
+def recurrence_rule(event):
+    """RRULE value of a series master, matching models.recurrence.build_rule"""
+    parts = [f'FREQ={event.recurrence_unit.upper()}']
+    if (event.recurrence_interval or 1) > 1:
+        parts.append(f'INTERVAL={event.recurrence_interval}')
+    weekdays = split_weekdays(event.recurrence_weekdays)
+    if event.recurrence_unit == 'weekly' and weekdays:
+        parts.append(f"BYDAY={','.join(weekdays)}")
+    parts.append(f'UNTIL={format_local(datetime.combine(event.recurrence_until, time(23, 59, 59)))}')
+    return ';'.join(parts)
+
+def vevent(uid, occurrence, stamp, extra=()):
+    """
+    One VEVENT for an occurrence (or a whole series, given its first occurrence)
+
+    Args:
+        uid: UID of the event; overrides of a series share the series' UID
+        occurrence: models.recurrence.Occurrence supplying the times and fields
+        stamp: Last change to the event, as DTSTAMP and LAST-MODIFIED
+        extra: Further content lines, e.g. RRULE, EXDATE or RECURRENCE-ID
+    """
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{format_utc(stamp)}',
+        f'LAST-MODIFIED:{format_utc(stamp)}',
+        f'DTSTART:{format_local(occurrence.start_time)}',
+        f'DTEND:{format_local(occurrence.end_time)}',
+        *extra,
+        f'SUMMARY:{escape_text(occurrence.title or "")}'
+    ]
+    if occurrence.description:
+        lines.append(f'DESCRIPTION:{escape_text(occurrence.description)}')
+    tags = split_tags(occurrence.tags)
+    if tags:
+        lines.append(f"CATEGORIES:{','.join(escape_text(tag) for tag in tags)}")
+    if occurrence.priority in ICAL_PRIORITIES:
+        lines.append(f'PRIORITY:{ICAL_PRIORITIES[occurrence.priority]}')
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines)
+
+def exceptions_by_event(event_ids):
+    """{event_id: {exception_date: EventExceptions}} for the given recurring events, in one query"""
+    exceptions = {}
+    if event_ids:
+        for exception in EventExceptions.query.filter(EventExceptions.original_event_id.in_(event_ids)):
+            exceptions.setdefault(exception.original_event_id, {})[exception.exception_date] = exception
+    return exceptions
+
+def series_components(event, exceptions, is_visible):
+    """
+    VEVENTs of a series master: the series itself and one override per visible modified occurrence
+    When the user cannot see the series itself (only occurrences retagged for them), those
+    occurrences are sent as standalone events instead
+    """
+    rule = event_rule(event)
+    first_start = next(iter(rule), None)
+    if first_start is None:
+        return  # The rule generates no occurrence at all
+    duration = event.end_time - event.start_time
+    uid = f'event-{event.id}@{UID_DOMAIN}'
+    series_visible = is_visible(event.tags, event.creator_id)
+
+    excluded, overrides = [], []
+    if exceptions:
+        starts = set(rule)
+        for exception_date, exception in sorted(exceptions.items()):
+            original_start = datetime.combine(exception_date, event.start_time.time())
+            if original_start not in starts:
+                continue  # Left over from before the rule changed; not an occurrence
+            if exception.title is None:
+                excluded.append(original_start)  # Deleted occurrence
+                continue
+            occurrence = Occurrence(event, exception.start_time or original_start,
+                                    exception.end_time or original_start + duration, exception_date, exception)
+            if is_visible(occurrence.tags, event.creator_id):
+                overrides.append(occurrence)
+            else:
+                excluded.append(original_start)  # Retagged away from this user
+
+    if series_visible:
+        extra = [f'RRULE:{recurrence_rule(event)}']
+        if excluded:
+            extra.append(f"EXDATE:{','.join(format_local(start) for start in excluded)}")
+        yield vevent(uid, Occurrence(event, first_start, first_start + duration, first_start.date()),
+                     event.updated_at, extra)
+        for occurrence in overrides:
+            original_start = datetime.combine(occurrence.original_date, event.start_time.time())
+            yield vevent(uid, occurrence, event.updated_at, [f'RECURRENCE-ID:{format_local(original_start)}'])
+    else:
+        for occurrence in overrides:
+            yield vevent(f'event-{event.id}-{occurrence.original_date:%Y%m%d}@{UID_DOMAIN}', occurrence, event.updated_at)
+
+def event_components(event, exceptions, is_visible):
+    """VEVENTs of one feed row: a series master, or a single (or older one-row-per-occurrence) event"""
+    if event.start_time is None or event.end_time is None:
+        return
+    if is_series(event):
+        yield from series_components(event, exceptions, is_visible)
+        return
+    exception = exceptions.get(event.start_time.date()) if exceptions else None
+    if exception is not None:
+        if exception.title is None:
+            return  # Deleted occurrence
+        occurrence = Occurrence(event, exception.start_time or event.start_time, exception.end_time or event.end_time,
+                                event.start_time.date(), exception)
+    else:
+        occurrence = Occurrence(event, event.start_time, event.end_time, event.start_time.date())
+    # Single events were matched on their own tags in SQL already
+    if event.is_recurring and not is_visible(occurrence.tags, event.creator_id):
+        return
+    yield vevent(f'event-{event.id}@{UID_DOMAIN}', occurrence, event.updated_at)
+
+def calendar_stream(result, is_visible, name='EventEase', refresh_minutes=60):
+    """
+    Generate an iCalendar document from a streaming feed query result, one chunk per batch
+
+    Args:
+        result: Result of the feed query executed with yield_per, so rows arrive in
+            batches from an open cursor instead of being fetched all at once
+        is_visible: is_visible(tags, creator_id) for occurrences of recurring events
+        name: Calendar name shown by calendar apps
+        refresh_minutes: Polling interval suggested to calendar apps
+    """
+    yield ''.join(fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODUCT_ID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(name)}',
+        f'REFRESH-INTERVAL;VALUE=DURATION:PT{refresh_minutes}M',
+        f'X-PUBLISHED-TTL:PT{refresh_minutes}M'
+    ])
+    for batch in result.partitions():
+        exceptions = exceptions_by_event([event.id for event in batch if event.is_recurring])
+        yield ''.join(component for event in batch
+                      for component in event_components(event, exceptions.get(event.id), is_visible))
+    yield fold('END:VCALENDAR')
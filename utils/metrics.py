@@ -0,0 +1,263 @@
+# Request and database metrics, served in the Prometheus text format at /metrics
+# Every request records its latency in a per-endpoint histogram, and engine hooks add up
+# the queries it ran and the time spent in them. Recording is a few perf_counter() calls
+# and one short lock per request, so it stays on in production. Job durations come from
+# the job_runs table, since jobs run in the worker process rather than here; the caches
+# and the event stream report their own counters at scrape time.
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from flask import Response, request
+from sqlalchemy import event as sa_event
+from sqlalchemy.engine import Engine
+from extensions import db
+
+# Metrics defaults - override through app.config
+METRICS_DEFAULTS = {
+    'METRICS_ENABLED': True,
+    'METRICS_TOKEN': None,   # When set, /metrics requires "Authorization: Bearer <token>"
+    # Upper bounds of the latency buckets, in seconds (also used for DB time per request)
+    'METRICS_LATENCY_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    # Upper bounds of the queries-per-request buckets
+    'METRICS_QUERY_BUCKETS': (1, 2, 5, 10, 20, 50, 100, 250)
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class Histogram:
+    """Cumulative-on-render histogram with fixed bucket upper bounds; the caller locks"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        """Prometheus lines for this histogram: _bucket per bound, _sum and _count"""
+        lines, running = [], 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            running += count
+            lines.append(f'{name}_bucket{_labels(labels, le=bound)} {running}')
+        lines.append(f'{name}_sum{_labels(labels)} {self.sum:.6f}')
+        lines.append(f'{name}_count{_labels(labels)} {self.count}')
+        return lines
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(labels, **extra):
+    pairs = {**labels, **extra}
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs.items()) + '}'
+
+class RequestMetrics:
+    """Per-endpoint request counters and histograms of one process"""
+
+    def __init__(self, latency_buckets, query_buckets):
+        self.latency_buckets = latency_buckets
+        self.query_buckets = query_buckets
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._requests = {}   # (endpoint, method, status) -> count
+        self._latency = {}    # (endpoint, method) -> Histogram
+        self._queries = {}    # endpoint -> Histogram of queries per request
+        self._db_time = {}    # endpoint -> Histogram of DB seconds per request
+
+    def configure(self, latency_buckets, query_buckets):
+        with self._lock:
+            self.latency_buckets = tuple(latency_buckets)
+            self.query_buckets = tuple(query_buckets)
+            self._requests, self._latency, self._queries, self._db_time = {}, {}, {}, {}
+
+    def record(self, endpoint, method, status, seconds, queries, db_seconds):
+        with self._lock:
+            key = (endpoint, method, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            histogram = self._latency.get((endpoint, method))
+            if histogram is None:
+                histogram = self._latency[(endpoint, method)] = Histogram(self.latency_buckets)
+            histogram.observe(seconds)
+            if endpoint not in self._queries:
+                self._queries[endpoint] = Histogram(self.query_buckets)
+                self._db_time[endpoint] = Histogram(self.latency_buckets)
+            self._queries[endpoint].observe(queries)
+            self._db_time[endpoint].observe(db_seconds)
+
+    def render(self):
+        """Prometheus lines for everything recorded so far"""
+        with self._lock:
+            lines = [
+                '# HELP eventease_http_requests_total Requests handled, by endpoint, method and status code.',
+                '# TYPE eventease_http_requests_total counter'
+            ]
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append(f'eventease_http_requests_total{_labels({"endpoint": endpoint, "method": method, "status": status})} {count}')
+            lines += [
+                '# HELP eventease_http_request_duration_seconds Request latency, from the first hook to teardown.',
+                '# TYPE eventease_http_request_duration_seconds histogram'
+            ]
+            for (endpoint, method), histogram in sorted(self._latency.items()):
+                lines += histogram.samples('eventease_http_request_duration_seconds', {'endpoint': endpoint, 'method': method})
+            lines += [
+                '# HELP eventease_http_request_queries SQL statements executed per request.',
+                '# TYPE eventease_http_request_queries histogram'
+            ]
+            for endpoint, histogram in sorted(self._queries.items()):
+                lines += histogram.samples('eventease_http_request_queries', {'endpoint': endpoint})
+            lines += [
+                '# HELP eventease_http_request_db_seconds Time spent executing SQL per request.',
+                '# TYPE eventease_http_request_db_seconds histogram'
+            ]
+            for endpoint, histogram in sorted(self._db_time.items()):
+                lines += histogram.samples('eventease_http_request_db_seconds', {'endpoint': endpoint})
+            lines += [
+                '# HELP eventease_process_start_time_seconds Start time of the process since the epoch.',
+                '# TYPE eventease_process_start_time_seconds gauge',
+                f'eventease_process_start_time_seconds {self.started_at:.3f}'
+            ]
+        return lines
+
+# Shared by all requests handled by this process
+request_metrics = RequestMetrics(METRICS_DEFAULTS['METRICS_LATENCY_BUCKETS'], METRICS_DEFAULTS['METRICS_QUERY_BUCKETS'])
+
+class _Tally:
+    # Queries and DB time of the request running on this thread
+    __slots__ = ('queries', 'db_seconds', 'query_started')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.query_started = None
+
+# The tally of the current request; unset outside requests, so scripts and jobs pay nothing
+_current = threading.local()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    tally = getattr(_current, 'tally', None)
+    if tally is not None:
+        tally.query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    tally = getattr(_current, 'tally', None)
+    if tally is not None and tally.query_started is not None:
+        tally.queries += 1
+        tally.db_seconds += time.perf_counter() - tally.query_started
+        tally.query_started = None
+
+def _simple_metric(lines, name, kind, help_text, value, labels=None):
+    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name}{_labels(labels or {})} {value}']
+
+def component_metrics():
+    """Counters the feed cache, the event stream and the connection pool keep themselves"""
+    from utils.event_stream import event_bus
+    from utils.feed_cache import feed_cache
+
+    lines = []
+    cache = feed_cache.stats()
+    _simple_metric(lines, 'eventease_feed_cache_hits_total', 'counter', 'Feed windows served from the cache.', cache['hits'])
+    _simple_metric(lines, 'eventease_feed_cache_misses_total', 'counter', 'Feed windows rendered from the database.', cache['misses'])
+    _simple_metric(lines, 'eventease_feed_cache_invalidations_total', 'counter', 'Cached feed windows dropped by writes.', cache['invalidations'])
+    _simple_metric(lines, 'eventease_feed_cache_entries', 'gauge', 'Feed windows currently cached.', cache['entries'])
+    _simple_metric(lines, 'eventease_feed_cache_bytes', 'gauge', 'Size of the cached feed windows.', cache['bytes'])
+
+    stream = event_bus.stats()
+    _simple_metric(lines, 'eventease_stream_connections', 'gauge', 'Open /api/stream connections.', stream['connections'])
+    _simple_metric(lines, 'eventease_stream_max_connections', 'gauge', 'Stream connections allowed per process.', stream['max_connections'])
+    _simple_metric(lines, 'eventease_stream_published_total', 'counter', 'Changes published to the event bus.', stream['published'])
+    _simple_metric(lines, 'eventease_stream_delivered_total', 'counter', 'Messages queued for stream connections.', stream['delivered'])
+    _simple_metric(lines, 'eventease_stream_overflows_total', 'counter', 'Stream queues that overflowed into a resync.', stream['overflows'])
+
+    pool = db.engine.pool
+    if hasattr(pool, 'checkedout'):
+        _simple_metric(lines, 'eventease_db_pool_checked_out', 'gauge', 'Database connections in use.', pool.checkedout())
+    return lines
+
+def job_metrics():
+    """
+    Last run of every background job, read from job_runs
+    Jobs run in the worker process, so their durations are taken from the started_at
+    and finished_at it records rather than from this process's memory.
+    """
+    from models.job import JobRun
+
+    lines = []
+    newest = db.session.query(JobRun.name, db.func.max(JobRun.id).label('id')).filter(
+        JobRun.status.in_(['done', 'failed']), JobRun.started_at != None, JobRun.finished_at != None
+    ).group_by(JobRun.name).subquery()
+    last_runs = db.session.query(JobRun.name, JobRun.status, JobRun.started_at, JobRun.finished_at).join(
+        newest, JobRun.id == newest.c.id
+    ).order_by(JobRun.name).all()
+    by_status = db.session.query(JobRun.name, JobRun.status, db.func.count(JobRun.id)).group_by(
+        JobRun.name, JobRun.status
+    ).order_by(JobRun.name, JobRun.status).all()
+
+    lines += ['# HELP eventease_job_last_duration_seconds Duration of the last finished run of a job.',
+              '# TYPE eventease_job_last_duration_seconds gauge']
+    for name, status, started_at, finished_at in last_runs:
+        seconds = (finished_at - started_at).total_seconds()
+        lines.append(f'eventease_job_last_duration_seconds{_labels({"job": name, "status": status})} {seconds:.3f}')
+    lines += ['# HELP eventease_job_last_finished_timestamp_seconds When the last run of a job finished.',
+              '# TYPE eventease_job_last_finished_timestamp_seconds gauge']
+    for name, status, _, finished_at in last_runs:
+        # job_runs stores naive UTC
+        finished = (finished_at - datetime(1970, 1, 1)).total_seconds()
+        lines.append(f'eventease_job_last_finished_timestamp_seconds{_labels({"job": name, "status": status})} {finished:.0f}')
+    lines += ['# HELP eventease_job_runs Runs of a job kept in job_runs, by status.',
+              '# TYPE eventease_job_runs gauge']
+    for name, status, count in by_status:
+        lines.append(f'eventease_job_runs{_labels({"job": name, "status": status})} {count}')
+    return lines
+
+def init_metrics(app):
+    """
+    Apply the metrics defaults, register the request hooks and the /metrics route
+    Call before the other init_* functions that add request hooks, so the latency
+    covers them too.
+    """
+    for key, value in METRICS_DEFAULTS.items():
+        app.config.setdefault(key, value)
+    if not app.config['METRICS_ENABLED']:
+        return
+    request_metrics.configure(app.config['METRICS_LATENCY_BUCKETS'], app.config['METRICS_QUERY_BUCKETS'])
+    if not sa_event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        sa_event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        sa_event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_request_timer():
+        _current.tally = _Tally()
+        _current.started = time.perf_counter()
+        _current.status = 500  # Replaced by after_request unless the view raised
+
+    @app.after_request
+    def record_status(response):
+        _current.status = response.status_code
+        return response
+
+    @app.teardown_request
+    def record_request(error=None):
+        # Registered first, so it runs after every other teardown hook
+        tally = getattr(_current, 'tally', None)
+        if tally is None:
+            return
+        _current.tally = None
+        # Unmatched URLs share one label so scanners cannot grow the label set
+        endpoint = request.endpoint or 'unmatched'
+        request_metrics.record(endpoint, request.method, _current.status,
+                               time.perf_counter() - _current.started, tally.queries, tally.db_seconds)
+
+    @app.route('/metrics')
+    def metrics():
+        token = app.config['METRICS_TOKEN']
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        lines = request_metrics.render() + component_metrics() + job_metrics()
+        return Response('\n'.join(lines) + '\n', content_type=CONTENT_TYPE)
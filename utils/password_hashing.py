@@ -0,0 +1,128 @@
+# Password hashing off the request threads
+# Hashes are computed on a small process pool, so a burst of logins costs CPU in the
+# pool's processes instead of holding the GIL of the web process, and the number of
+# hashes queued per process is capped so a burst is shed quickly instead of making
+# every login wait. Stored hashes made with other parameters are upgraded on login.
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Password hashing defaults - override through app.config
+PASSWORD_HASHING_DEFAULTS = {
+    # werkzeug method string with every parameter spelled out, as it appears before the
+    # first '$' of a stored hash (e.g. 'pbkdf2:sha256:600000'); hashes made with any
+    # other method are rehashed on the user's next successful login
+    'PASSWORD_HASH_METHOD': 'scrypt:32768:8:1',
+    'PASSWORD_HASH_WORKERS': max(1, (os.cpu_count() or 2) // 2),  # Pool processes; 0 hashes on the request thread
+    'PASSWORD_HASH_MAX_PENDING': 32,    # Hashes queued or running per web process
+    'PASSWORD_HASH_QUEUE_TIMEOUT': 1    # Seconds a request waits for room in the queue before giving up
+}
+
+class HashingBusy(Exception):
+    """The hashing queue stayed full for the whole queue timeout"""
+
+def _hash(password, method):
+    # Runs in a pool process
+    return generate_password_hash(password, method=method)
+
+def _verify(password_hash, password, method):
+    # Runs in a pool process: check, and rehash with the current method if it changed
+    if not check_password_hash(password_hash, password):
+        return False, None
+    if password_hash.split('$', 1)[0] != method:
+        return True, generate_password_hash(password, method=method)
+    return True, None
+
+class PasswordHasher:
+    """
+    Process-wide hashing service
+    The pool is started on first use, so processes that never hash (the worker,
+    scripts) never start one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = None
+        self.configure(PASSWORD_HASHING_DEFAULTS)
+
+    def configure(self, config):
+        """
+        Apply settings; a running pool is shut down and restarted on next use
+
+        Args:
+            config: Mapping with the PASSWORD_HASH_* keys
+        """
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+            self.method = config['PASSWORD_HASH_METHOD']
+            self.workers = config['PASSWORD_HASH_WORKERS']
+            self.queue_timeout = config['PASSWORD_HASH_QUEUE_TIMEOUT']
+            self.slots = threading.BoundedSemaphore(config['PASSWORD_HASH_MAX_PENDING'])
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # Not fork: the pool starts (and restarts) while request threads are running,
+                # and a forked child would inherit whatever locks they hold at that moment.
+                # forkserver children come from a clean single-threaded server instead; like
+                # spawn it imports the entry script once, so entry points keep a __main__ guard.
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('forkserver'))
+            return self._pool
+
+    def _run(self, function, *args):
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            raise HashingBusy('The password hashing queue is full')
+        try:
+            if not self.workers:
+                return function(*args)
+            try:
+                return self._executor().submit(function, *args).result()
+            except BrokenProcessPool:
+                # A pool process died (e.g. killed for memory); start a new pool and retry once
+                with self._lock:
+                    self._pool = None
+                return self._executor().submit(function, *args).result()
+        finally:
+            self.slots.release()
+
+    def hash(self, password):
+        """
+        Hash a password with the configured method
+
+        Raises:
+            HashingBusy: The queue stayed full for PASSWORD_HASH_QUEUE_TIMEOUT seconds
+        """
+        return self._run(_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """
+        Check a password against a stored hash
+
+        Returns:
+            (matches, new_hash) - new_hash is set when the password matched but the stored
+            hash used other parameters, and should replace it
+
+        Raises:
+            HashingBusy: The queue stayed full for PASSWORD_HASH_QUEUE_TIMEOUT seconds
+        """
+        return self._run(_verify, password_hash, password, self.method)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+# Shared by all requests handled by this process
+password_hasher = PasswordHasher()
+
+def init_password_hashing(app):
+    """Apply the password hashing defaults to app.config and configure the shared hasher"""
+    for key, value in PASSWORD_HASHING_DEFAULTS.items():
+        app.config.setdefault(key, value)
+    password_hasher.configure(app.config)
@@ -0,0 +1,114 @@
+# Database schema version check and migration helpers
+# The schema is created and changed only by the Alembic migrations in migrations/versions.
+# At startup a process checks that the database is at the migrations' head with one query;
+# the head is read from the revision files themselves, so neither Alembic nor Flask-Migrate
+# is imported unless a `flask` command (e.g. `flask db upgrade`) is running.
+import ast
+import os
+import re
+import click
+from sqlalchemy import inspect, text
+from extensions import db
+
+# Schema defaults - override through app.config
+SCHEMA_DEFAULTS = {
+    # 'error' refuses to start on a database that is not at the head revision,
+    # 'warn' prints a warning and starts anyway, 'off' skips the check
+    'SCHEMA_CHECK': 'error',
+    'MIGRATIONS_DIRECTORY': None   # Defaults to migrations/ next to the app
+}
+
+class SchemaOutOfDate(RuntimeError):
+    """The database is not at the revision the code expects"""
+
+_REVISION = re.compile(r'^revision\s*=\s*(.+)$', re.MULTILINE)
+_DOWN_REVISION = re.compile(r'^down_revision\s*=\s*(.+)$', re.MULTILINE)
+
+def head_revisions(migrations_directory):
+    """
+    Head revision(s) of the migration scripts, found without importing Alembic:
+    every revision that no other revision names as its down_revision
+
+    Args:
+        migrations_directory: The Flask-Migrate directory (holding versions/)
+    """
+    revisions, parents = set(), set()
+    versions = os.path.join(migrations_directory, 'versions')
+    for name in os.listdir(versions):
+        if not name.endswith('.py'):
+            continue
+        with open(os.path.join(versions, name), encoding='utf-8') as handle:
+            source = handle.read()
+        revision = _REVISION.search(source)
+        if revision is None:
+            continue
+        revisions.add(ast.literal_eval(revision.group(1)))
+        down_revision = ast.literal_eval(_DOWN_REVISION.search(source).group(1))
+        if isinstance(down_revision, (tuple, list)):
+            parents.update(down_revision)  # Merge revisions have several parents
+        elif down_revision is not None:
+            parents.add(down_revision)
+    return revisions - parents
+
+def current_revisions():
+    """Revision(s) recorded in alembic_version; empty for a database never migrated"""
+    with db.engine.connect() as connection:
+        if not inspect(connection).has_table('alembic_version'):
+            return set()
+        return {row[0] for row in connection.execute(text('SELECT version_num FROM alembic_version'))}
+
+def running_flask_command():
+    """Whether the app is being created for a `flask` CLI command (db, run, shell...)"""
+    return click.get_current_context(silent=True) is not None
+
+def migrations_directory(app):
+    return app.config['MIGRATIONS_DIRECTORY'] or os.path.join(app.root_path, 'migrations')
+
+def init_migrations(app):
+    """Register Flask-Migrate on the app; imports Alembic, so only done when migrations run"""
+    from flask_migrate import Migrate
+
+    if 'migrate' not in app.extensions:
+        Migrate(app, db, directory=migrations_directory(app))
+
+def upgrade_schema(app):
+    """Apply every pending migration to the app's database, as `flask db upgrade` does"""
+    from flask_migrate import upgrade
+
+    init_migrations(app)
+    with app.app_context():
+        upgrade()
+
+def check_schema(app):
+    """
+    Verify the database is at the migrations' head
+
+    Raises:
+        SchemaOutOfDate: SCHEMA_CHECK is 'error' and the database is behind (or ahead)
+    """
+    mode = app.config['SCHEMA_CHECK']
+    if mode == 'off':
+        return
+    expected = head_revisions(migrations_directory(app))
+    with app.app_context():
+        current = current_revisions()
+    if current == expected:
+        return
+    message = (f"The database is at revision {', '.join(sorted(current)) or '(none)'} but the code expects "
+               f"{', '.join(sorted(expected))}. Run `flask db upgrade`.")
+    # A flask command may be the very `flask db upgrade` that fixes it
+    if mode == 'warn' or running_flask_command():
+        print(f"⚠️ {message}")
+        return
+    raise SchemaOutOfDate(message)
+
+def init_schema(app):
+    """
+    Apply the schema defaults, register Flask-Migrate for `flask` commands and check the schema version
+    Nothing is created here: run `flask db upgrade` to create or update the schema.
+    """
+    for key, value in SCHEMA_DEFAULTS.items():
+        app.config.setdefault(key, value)
+    if running_flask_command():
+        init_migrations(app)
+    check_schema(app)
@@ -0,0 +1,212 @@
+# Opt-in slow query log with EXPLAIN QUERY PLAN capture
+# Engine hooks time every statement; one that takes longer than SLOW_QUERY_THRESHOLD_MS is
+# logged with its redacted parameters, the route or job that ran it and SQLite's query
+# plan. Logging is rate-limited per process, and every slow statement - logged or not - is
+# added to a per-statement summary that admins can read at /admin/slow-queries.
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from flask import has_request_context, request
+from sqlalchemy import event as sa_event
+from sqlalchemy.engine import Engine
+
+# Slow query log defaults - override through app.config
+SLOW_QUERY_DEFAULTS = {
+    'SLOW_QUERY_LOG_ENABLED': False,
+    'SLOW_QUERY_THRESHOLD_MS': 200,       # Statements slower than this are slow
+    'SLOW_QUERY_LOG_PER_MINUTE': 10,      # Log lines per process per minute; the rest are only summarised
+    'SLOW_QUERY_MAX_STATEMENTS': 200,     # Distinct statements kept in the summary
+    'SLOW_QUERY_EXPLAIN': True            # Capture EXPLAIN QUERY PLAN for logged statements (SQLite only)
+}
+
+# Runs of placeholders in IN (...) lists collapse, so one statement with different list
+# lengths is summarised once
+_PLACEHOLDER_RUN = re.compile(r'\?(?:\s*,\s*\?)+')
+
+def normalize_statement(statement):
+    return _PLACEHOLDER_RUN.sub('?, ...', ' '.join(statement.split()))
+
+def redact(value):
+    """Stand-in for a bound parameter that keeps its type and size but not its content"""
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, (str, bytes)):
+        return f'<{type(value).__name__} len={len(value)}>'
+    return f'<{type(value).__name__}>'
+
+def redact_parameters(parameters):
+    if isinstance(parameters, dict):
+        return {key: redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) for value in parameters]
+    return redact(parameters)
+
+# Name of the job running on this thread, for statements outside requests
+_origin = threading.local()
+
+@contextmanager
+def query_origin(name):
+    """Attribute slow statements run inside the block to `name`, e.g. a background job"""
+    previous = getattr(_origin, 'name', None)
+    _origin.name = name
+    try:
+        yield
+    finally:
+        _origin.name = previous
+
+def current_origin():
+    """The route or job running the current statement"""
+    if has_request_context():
+        return f"{request.method} {request.endpoint or 'unmatched'}"
+    return getattr(_origin, 'name', None) or threading.current_thread().name
+
+def explain(connection, statement, parameters):
+    """SQLite's EXPLAIN QUERY PLAN for a statement as indented lines, or None"""
+    if connection.dialect.name != 'sqlite':
+        return None
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        rows = cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    except Exception as e:
+        return [f'(no plan: {e})']
+    finally:
+        cursor.close()
+    # Rows are (id, parent, notused, detail); indent each step under its parent
+    depth = {0: -1}
+    lines = []
+    for step_id, parent, _, detail in rows:
+        depth[step_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[step_id] + detail)
+    return lines
+
+class SlowQueryLog:
+    """Rate limiter and per-statement summary of slow statements in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        self.configure(SLOW_QUERY_DEFAULTS)
+
+    def configure(self, config):
+        with self._lock:
+            self.threshold = config['SLOW_QUERY_THRESHOLD_MS'] / 1000
+            self.per_minute = config['SLOW_QUERY_LOG_PER_MINUTE']
+            self.max_statements = config['SLOW_QUERY_MAX_STATEMENTS']
+            self.explain = config['SLOW_QUERY_EXPLAIN']
+            self.started_at = datetime.utcnow()
+            self._statements = {}
+            self._tokens = float(self.per_minute)
+            self._refilled = time.monotonic()
+            self._suppressed = 0
+
+    def _take_token(self):
+        # Token bucket refilled at per_minute per minute; the caller holds the lock
+        now = time.monotonic()
+        self._tokens = min(self.per_minute, self._tokens + (now - self._refilled) * self.per_minute / 60)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        self._suppressed += 1
+        return False
+
+    def record(self, statement, seconds, origin):
+        """
+        Add a slow statement to the summary
+
+        Returns:
+            (log it, statements suppressed by the rate limit since the last logged one)
+        """
+        key = normalize_statement(statement)
+        with self._lock:
+            entry = self._statements.get(key)
+            if entry is None:
+                if len(self._statements) >= self.max_statements:
+                    # Make room by forgetting the statement that cost least in total
+                    del self._statements[min(self._statements, key=lambda k: self._statements[k]['total_ms'])]
+                entry = self._statements[key] = {'statement': key, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                                 'origins': {}, 'plan': None}
+            entry['count'] += 1
+            entry['total_ms'] += seconds * 1000
+            entry['max_ms'] = max(entry['max_ms'], seconds * 1000)
+            entry['origins'][origin] = entry['origins'].get(origin, 0) + 1
+            if not self._take_token():
+                return False, 0
+            suppressed, self._suppressed = self._suppressed, 0
+            return True, suppressed
+
+    def set_plan(self, statement, plan):
+        with self._lock:
+            entry = self._statements.get(normalize_statement(statement))
+            if entry is not None:
+                entry['plan'] = plan
+
+    def top(self, limit=20):
+        """The statements with the most total time, worst first"""
+        with self._lock:
+            entries = sorted(self._statements.values(), key=lambda entry: entry['total_ms'], reverse=True)[:limit]
+            return [{
+                **entry,
+                'total_ms': round(entry['total_ms'], 3),
+                'max_ms': round(entry['max_ms'], 3),
+                'mean_ms': round(entry['total_ms'] / entry['count'], 3),
+                'origins': dict(sorted(entry['origins'].items(), key=lambda item: -item[1]))
+            } for entry in entries]
+
+# Shared by all threads of this process
+slow_query_log = SlowQueryLog()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('slow_query_started', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['slow_query_started'].pop()
+    seconds = time.perf_counter() - started
+    if seconds < slow_query_log.threshold:
+        return
+    origin = current_origin()
+    should_log, suppressed = slow_query_log.record(statement, seconds, origin)
+    if not should_log:
+        return
+
+    # executemany: the first parameter set stands for all of them
+    sample = parameters[0] if executemany and parameters else parameters
+    plan = None
+    if slow_query_log.explain and not executemany:
+        plan = explain(conn, statement, sample)
+        slow_query_log.set_plan(statement, plan)
+    message = [f'Slow query ({seconds * 1000:.1f} ms) from {origin}: {" ".join(statement.split())}',
+               f'  parameters: {redact_parameters(sample)}']
+    if executemany:
+        message.append(f'  executemany with {len(parameters)} parameter sets')
+    if plan:
+        message.append('  plan:')
+        message.extend(f'    {line}' for line in plan)
+    if suppressed:
+        message.append(f'  ({suppressed} slow queries were not logged since the previous one)')
+    slow_query_log.logger.warning('\n'.join(message))
+
+def _clear_timer(exception_context):
+    # A statement that raised never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('slow_query_started'):
+        connection.info['slow_query_started'].pop()
+
+def init_slow_query_log(app):
+    """
+    Apply the slow query log defaults and, if enabled, hook it into every engine
+    Log lines go to a child of the app's logger, so they reach Flask's handler (stderr by default).
+    """
+    for key, value in SLOW_QUERY_DEFAULTS.items():
+        app.config.setdefault(key, value)
+    if not app.config['SLOW_QUERY_LOG_ENABLED']:
+        return
+    slow_query_log.configure(app.config)
+    slow_query_log.logger = app.logger.getChild('slow_queries')
+    if not sa_event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        sa_event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        sa_event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        sa_event.listen(Engine, 'handle_error', _clear_timer)
@@ -0,0 +1,179 @@
+# Client for the Gemini API behind /api/summarise
+# One process-wide client keeps the service-account credentials and a pooled HTTP
+# session, bounds every call with connect/read timeouts, and caps how many request
+# threads can wait on the upstream at once so a slow API cannot exhaust them.
+import threading
+from datetime import datetime, timedelta
+
+# Summariser defaults - override through app.config
+SUMMARISER_DEFAULTS = {
+    'SUMMARISER_KEY_FILE': 'secrets/gemkey.json',
+    'SUMMARISER_URL': 'https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent',
+    'SUMMARISER_CONNECT_TIMEOUT': 3.05,     # Seconds to establish a connection
+    'SUMMARISER_READ_TIMEOUT': 30,          # Seconds to wait for the response
+    'SUMMARISER_MAX_CONCURRENT': 4,         # Upstream calls in flight per process
+    'SUMMARISER_QUEUE_TIMEOUT': 2,          # Seconds a request waits for a free slot before giving up
+    'SUMMARISER_TOKEN_MARGIN_SECONDS': 300  # Refresh the access token this long before it expires
+}
+
+SCOPES = ['https://www.googleapis.com/auth/generative-language']
+
+# Bump whenever build_prompt() changes so cached summaries of the old prompt are not reused
+PROMPT_VERSION = 1
+
+def build_prompt(title, description, start_time, end_time):
+    """
+    Prompt asking for a markdown summary of an event
+
+    Args:
+        title, description, start_time, end_time: Sanitized event fields as strings
+    """
+    # Extract "items to bring" if mentioned (basic heuristic)
+    items_to_bring = []
+    for line in description.splitlines():
+        if 'bring' in line.lower():
+            parts = line.lower().split('bring', 1)[1].strip()
+            items_to_bring = [item.strip() for item in parts.split(',') if item.strip()]
+            break
+
+    prompt_text = f"""
+            Please summarise the following event, formatting your response using markdown.
+            Use bold headings for the Title and Time and Date sections.
+            List the items to bring as bullet points under an 'Items to bring' heading.
+
+            **Title:** {title}
+
+            **Time and Date:**
+            Start: {start_time}
+            End: {end_time}
+
+            **Description:**
+            {description}
+
+            """
+
+    if items_to_bring:
+        prompt_text += "**Items to bring:**\n"
+        for item in items_to_bring:
+            prompt_text += f"- {item}\n"
+    else:
+        prompt_text += "**Items to bring:** None specified\n"
+    return prompt_text
+
+class SummariserError(Exception):
+    """The upstream call failed or returned something unusable"""
+
+class SummariserBusy(SummariserError):
+    """Every upstream slot stayed taken for the whole queue timeout"""
+
+class SummariserTimeout(SummariserError):
+    """The upstream did not connect or answer within the timeouts"""
+
+class SummariserClient:
+    """
+    Thread-safe Gemini client shared by all requests of a process
+    Credentials are loaded once and refreshed shortly before they expire; calls reuse
+    keep-alive connections from a pool sized to the concurrency cap.
+    """
+
+    def __init__(self):
+        self.configure(SUMMARISER_DEFAULTS)
+
+    def configure(self, config, credentials=None):
+        """
+        Apply settings and reset cached state
+
+        Args:
+            config: Mapping with the SUMMARISER_* keys
+            credentials: google.auth credentials to use instead of SUMMARISER_KEY_FILE
+        """
+        self.key_file = config['SUMMARISER_KEY_FILE']
+        self.url = config['SUMMARISER_URL']
+        self.timeout = (config['SUMMARISER_CONNECT_TIMEOUT'], config['SUMMARISER_READ_TIMEOUT'])
+        self.queue_timeout = config['SUMMARISER_QUEUE_TIMEOUT']
+        self.token_margin = timedelta(seconds=config['SUMMARISER_TOKEN_MARGIN_SECONDS'])
+        self.slots = threading.BoundedSemaphore(config['SUMMARISER_MAX_CONCURRENT'])
+        self.max_concurrent = config['SUMMARISER_MAX_CONCURRENT']
+
+        self._credentials = credentials
+        self._credentials_lock = threading.Lock()
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """HTTP session of the client, created on first use so requests is not imported at startup"""
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                # One connection per slot; retries would multiply the time a slot is held
+                self._session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrent, max_retries=0)
+                self._session.mount('https://', adapter)
+                self._session.mount('http://', adapter)
+            return self._session
+
+    def _token(self):
+        # Loading the key file and refreshing both happen under the lock, once, not per request
+        with self._credentials_lock:
+            # google-auth is imported on first use, not when the web process starts
+            if self._credentials is None:
+                from google.oauth2 import service_account
+                self._credentials = service_account.Credentials.from_service_account_file(self.key_file, scopes=SCOPES)
+            credentials = self._credentials
+            expiry = credentials.expiry  # Naive UTC, None before the first refresh
+            if not credentials.token or expiry is None or expiry - datetime.utcnow() < self.token_margin:
+                import google.auth.transport.requests
+                credentials.refresh(google.auth.transport.requests.Request(session=self.session))
+            return credentials.token
+
+    def generate(self, prompt_text):
+        """
+        Send a prompt and return the text of the first candidate
+
+        Raises:
+            SummariserBusy: No upstream slot became free within the queue timeout
+            SummariserTimeout: The upstream did not connect or answer in time
+            SummariserError: Any other upstream or credential failure
+        """
+        import requests
+
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            raise SummariserBusy('All summariser slots are busy')
+        try:
+            headers = {
+                'Authorization': f'Bearer {self._token()}',
+                'Content-Type': 'application/json'
+            }
+            payload = {'contents': [{'parts': [{'text': prompt_text}]}]}
+            response = self.session.post(self.url, headers=headers, json=payload, timeout=self.timeout)
+        except requests.Timeout as e:
+            raise SummariserTimeout(str(e)) from e
+        except Exception as e:
+            raise SummariserError(str(e)) from e
+        finally:
+            self.slots.release()
+
+        if response.status_code != 200:
+            raise SummariserError(f'Upstream returned HTTP {response.status_code}')
+        try:
+            candidates = response.json().get('candidates', [])
+            return candidates[0]['content']['parts'][0]['text'] if candidates else 'No summary available.'
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            raise SummariserError('Unexpected upstream response') from e
+
+# Shared by all requests handled by this process
+summariser = SummariserClient()
+
+def init_summariser(app):
+    """
+    Configure the shared summariser client from app.config
+    Called during app creation; credentials are loaded lazily on the first call
+
+    Args:
+        app: Flask application instance
+    """
+    for key, value in SUMMARISER_DEFAULTS.items():
+        app.config.setdefault(key, value)
+    summariser.configure(app.config)
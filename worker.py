@@ -0,0 +1,186 @@
+# Standalone background worker
+# Runs the jobs in scheduler.JOBS outside the web processes: python -m worker
+# Any number of workers can run at once. Each run of a job is a row in job_runs
+# that exactly one worker leases and keeps alive with heartbeats; a run whose
+# worker dies is picked up by another once the lease expires, and runs missed
+# while no worker was up are caught up with a single run per job.
+
+import argparse
+import os
+import signal
+import socket
+import threading
+import traceback
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from extensions import db
+from models.job import (
+    JobRun, last_scheduled, schedule_run, claimable_runs, claim_run, renew_lease,
+    finish_run, prune_job_runs
+)
+from utils.slow_query_log import query_origin
+
+# Worker defaults - override through app.config
+WORKER_DEFAULTS = {
+    'WORKER_POLL_SECONDS': 30,     # How often to look for due runs
+    'JOB_LEASE_SECONDS': 300,      # A run whose heartbeat stops is taken over after this long
+    'JOB_MAX_ATTEMPTS': 3,         # Failures (or lost leases) before a run is marked failed
+    'JOB_CATCH_UP_DAYS': 7         # How far back missed runs are looked for
+}
+
+def _to_utc(fire_time):
+    # Trigger fire times are aware; job_runs stores naive UTC like the rest of the schema
+    return fire_time.astimezone(timezone.utc).replace(tzinfo=None)
+
+def latest_due(trigger, after, now):
+    """
+    Latest fire time of a trigger after `after` and not after `now`, or None
+    Missed fire times collapse into this one run.
+
+    Args:
+        trigger: APScheduler trigger
+        after, now: Aware datetimes
+    """
+    due = None
+    fire_time = trigger.get_next_fire_time(None, after + timedelta(microseconds=1))
+    while fire_time is not None and fire_time <= now:
+        due = fire_time
+        fire_time = trigger.get_next_fire_time(None, fire_time + timedelta(microseconds=1))
+    return due
+
+def schedule_jobs(jobs, config):
+    """
+    Make sure every job has a row for its latest due run
+    A job that never ran gets a row for its next fire time, which anchors its schedule
+    """
+    now = datetime.now(timezone.utc)
+    for name, (trigger, _) in jobs.items():
+        last = last_scheduled(name)
+        if last is None:
+            schedule_run(name, _to_utc(trigger.get_next_fire_time(None, now)))
+            continue
+        after = max(last.replace(tzinfo=timezone.utc), now - timedelta(days=config['JOB_CATCH_UP_DAYS']))
+        due = latest_due(trigger, after, now)
+        if due is not None:
+            schedule_run(name, _to_utc(due))
+    db.session.commit()
+
+class Heartbeat(threading.Thread):
+    """Renews the lease of a running job until stopped; `lost` is set if another worker took it"""
+
+    def __init__(self, app, run_id, owner, lease_seconds):
+        super().__init__(daemon=True)
+        self.app = app
+        self.run_id = run_id
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self.stopped = threading.Event()
+
+    def run(self):
+        with self.app.app_context():
+            while not self.stopped.wait(self.lease_seconds / 3):
+                try:
+                    self.lost = not renew_lease(self.run_id, self.owner, self.lease_seconds)
+                    db.session.commit()
+                except Exception:
+                    # A missed beat is harmless while the lease has time left
+                    db.session.rollback()
+                if self.lost:
+                    return
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+def run_job(app, run_id, name, function, owner, config):
+    """Run a leased job with a heartbeat and record the outcome"""
+    heartbeat = Heartbeat(app, run_id, owner, config['JOB_LEASE_SECONDS'])
+    heartbeat.start()
+    error = None
+    try:
+        with query_origin(f'job {name}'):
+            function(app)
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        heartbeat.stop()
+
+    finish_run(run_id, owner, config['JOB_MAX_ATTEMPTS'], error)
+    db.session.commit()
+    if heartbeat.lost:
+        print(f"⚠️ Lost the lease on {name} run {run_id} while it ran.")
+    elif error is not None:
+        print(f"❌ {name} run {run_id} failed:\n{error}")
+    else:
+        print(f"✅ {name} run {run_id} finished.")
+
+def run_pending(app, jobs, owner):
+    """
+    One pass of the worker: schedule due runs, then claim and run whatever is claimable
+
+    Returns:
+        Number of runs this worker executed
+    """
+    config = app.config
+    executed = 0
+    with app.app_context():
+        schedule_jobs(jobs, config)
+        prune_job_runs()
+        db.session.commit()
+
+        for run_id in claimable_runs(config['JOB_MAX_ATTEMPTS']):
+            claimed = claim_run(run_id, owner, config['JOB_LEASE_SECONDS'], config['JOB_MAX_ATTEMPTS'])
+            db.session.commit()
+            if not claimed:
+                continue  # Another worker got there first
+            name = db.session.get(JobRun, run_id).name
+            if name not in jobs:
+                finish_run(run_id, owner, config['JOB_MAX_ATTEMPTS'], f"Unknown job {name!r}")
+                db.session.commit()
+                continue
+            run_job(app, run_id, name, jobs[name][1], owner, config)
+            executed += 1
+    return executed
+
+def run_worker(app, jobs, stop, once=False):
+    """
+    Poll for due runs until `stop` is set
+
+    Args:
+        app: Flask application instance
+        jobs: {name: (trigger, function)}, normally scheduler.JOBS
+        stop: threading.Event that ends the loop after the current job
+        once: Run a single pass and return
+    """
+    for key, value in WORKER_DEFAULTS.items():
+        app.config.setdefault(key, value)
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+    print(f"✅ Worker {owner} started with jobs: {', '.join(jobs)}")
+    while not stop.is_set():
+        run_pending(app, jobs, owner)
+        if once:
+            break
+        stop.wait(app.config['WORKER_POLL_SECONDS'])
+    print(f"✅ Worker {owner} stopped.")
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the background jobs (reminders, outbox delivery, pruning)')
+    parser.add_argument('--once', action='store_true', help='Run one pass and exit, e.g. from cron')
+    args = parser.parse_args()
+
+    from app import create_app
+    from scheduler import JOBS
+
+    app = create_app()
+    app.config['WORKER_POLL_SECONDS'] = int(os.getenv('WORKER_POLL_SECONDS', WORKER_DEFAULTS['WORKER_POLL_SECONDS']))
+
+    # Finish the job in progress on SIGTERM/SIGINT, then exit
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+    run_worker(app, JOBS, stop, once=args.once)
+
+if __name__ == '__main__':
+    main()